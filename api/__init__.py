@@ -4,5 +4,6 @@ API模块
 """
 
 from .api_client import FinanceAPIClient, APIResponse
+from .async_client import AsyncFinanceAPIClient, FetchResult
 
-__all__ = ['FinanceAPIClient', 'APIResponse']
+__all__ = ['FinanceAPIClient', 'APIResponse', 'AsyncFinanceAPIClient', 'FetchResult']
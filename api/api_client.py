@@ -1,14 +1,29 @@
+import base64
 import json
+import os
 import re
+import threading
 import time
-from typing import Dict, List, Optional, Any, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 
 import requests
 from fake_useragent import UserAgent
 from loguru import logger
 from pydantic import BaseModel
 from requests import RequestException
+from requests.adapters import HTTPAdapter
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from api.json_stream import StreamingJSONArrayParser, iter_record_chunks
+from api.response_cache import ResponseCache
+from common.config import config_manager
+from utils.process_pool import run_cpu_bound
 from core.automate_chrome import get_automation_data
 
 
@@ -20,12 +35,53 @@ class APIResponse(BaseModel):
     timestamp: Optional[int] = None
 
 
-class FinanceAPIClient:
+def decode_json(content: bytes) -> Any:
+    """解码响应体字节；安装了 orjson 时使用 orjson，否则使用标准库 json"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def build_api_response(mapped_data: Dict[str, Any], validate_result: bool = False) -> APIResponse:
+    """
+    由归一化后的响应数据构建 APIResponse
+
+    validate_result 为 False 时只校验信封字段（success、code、message、timestamp），
+    result 列表原样传入，不逐条校验和复制记录；result 不是列表时仍走完整校验并抛出校验错误。
+    """
+    result = mapped_data.get("result")
+    if validate_result or not (result is None or isinstance(result, list)):
+        return APIResponse(**mapped_data)
+
+    api_response = APIResponse(**{**mapped_data, "result": None})
+    api_response.result = result
+    return api_response
 
-    def __init__(self, base_url: str, app_key: str, app_secret: str):
+
+class FinanceAPIClient:
+    # 按期间获取的数据类型 -> 接口路径，供流式获取使用
+    PERIOD_ENDPOINTS = {
+        'voucher_list': "/Cw6Api/Get_Voucher",
+        'voucher_detail': "/Cw6Api/Get_Voucher_Detail",
+        'voucher_dim_detail': "/Cw6Api/Get_Voucher_Dim_Detail",
+        'balance': "/Cw6Api/Get_Balance",
+        'aux_balance': "/Cw6Api/Get_Aux_Balance",
+    }
+    # 流式读取响应体时每次读取的字节数
+    STREAM_READ_SIZE = 64 * 1024
+    # 按年度或长期不变的字典接口，配置了响应缓存时命中缓存不再请求
+    CACHEABLE_ENDPOINTS = ("/Cw6Api/GetAcc", "/Cw6Api/Subject_Dimension_Relationship", "/Cw6Api/Get_PC")
+
+    def __init__(self, base_url: str, app_key: str, app_secret: str, validate_result: bool = None,
+                 response_cache: ResponseCache = None):
         self.base_url = base_url.rstrip('/')
         self.app_key = app_key
         self.app_secret = app_secret
+        self.response_cache = response_cache
+        # 是否逐条校验 result 记录，默认关闭，只校验信封字段
+        if validate_result is None:
+            validate_result = bool(config_manager.get('api.validate_result', False))
+        self.validate_result = validate_result
         self.session = requests.Session()
         self.session.headers.update({
             'Content-Type': 'application/json',
@@ -55,11 +111,11 @@ class FinanceAPIClient:
             response = self.session.post(url, json=request_data, timeout=30)
             response.raise_for_status()
 
-            raw_data = response.json()
+            raw_data = decode_json(response.content)
 
             mapped_data = self._normalize_api_response(raw_data)
 
-            api_response = APIResponse(**mapped_data)
+            api_response = build_api_response(mapped_data, self.validate_result)
 
             if api_response.success:
                 logger.info(f"API调用成功: {endpoint}, 返回数据条数: {len(api_response.result or [])}")
@@ -78,28 +134,97 @@ class FinanceAPIClient:
             logger.error(f"未知错误: {endpoint}, 错误: {str(e)}")
             raise
 
-    def get_account_structure(self, year: str, company_code: str) -> List[Dict[str, Any]]:
+    def _cached_request(self, endpoint: str, params: Dict[str, Any], refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        调用字典类接口：先查响应缓存，未命中时请求并缓存成功且非空的结果
+
+        refresh 为 True 时（重新检查模式）先使该请求的缓存失效，总是向接口请求最新数据。
+        缓存在入库之前写入，入库失败后的重试与重启后的重放直接命中缓存，见 ResponseCache
+        """
+        if self.response_cache is not None and endpoint in self.CACHEABLE_ENDPOINTS:
+            if refresh:
+                self.response_cache.invalidate(endpoint, params)
+            else:
+                cached = self.response_cache.get(endpoint, params)
+                if cached is not None:
+                    logger.debug(f"接口响应缓存命中: {endpoint}, 参数: {params}")
+                    return cached
+
+        response = self._make_request(endpoint, params)
+        result = response.result or []
+        if result and response.success and self.response_cache is not None and endpoint in self.CACHEABLE_ENDPOINTS:
+            try:
+                self.response_cache.put(endpoint, params, result)
+            except Exception as e:
+                logger.warning(f"写入接口响应缓存失败: {endpoint}, 错误: {e}")
+        return result
+
+    def stream_request(self, endpoint: str, params: Dict[str, Any], chunk_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        流式调用接口：边下载边增量解析 result（或 data）数组，每 chunk_size 条产出一个记录块
+
+        峰值内存取决于 chunk_size 与读取块大小，与响应总大小无关。接口返回失败时记录错误并停止产出，
+        与 _make_request 失败时各 get_* 方法返回空列表的语义一致。
+        """
+        chunk_size = chunk_size or int(config_manager.get('api.stream_chunk_size', 5000) or 5000)
+        url = f"{self.base_url}{endpoint}"
+        request_data = {
+            "appkey": self.app_key,
+            "appSecret": self.app_secret,
+            **params
+        }
+
+        try:
+            logger.info(f"流式请求API: {endpoint}, 参数: {request_data}")
+            with self.session.post(url, json=request_data, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                parser = StreamingJSONArrayParser(response.iter_content(self.STREAM_READ_SIZE))
+                for chunk in iter_record_chunks(parser, chunk_size):
+                    yield chunk
+
+            status = self._normalize_api_response(parser.envelope)
+            if status["success"]:
+                logger.info(f"API流式调用成功: {endpoint}, 返回数据条数: {parser.record_count}")
+            else:
+                logger.error(f"API调用失败: {endpoint}, 错误: {status['message']}")
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"网络请求失败: {endpoint}, 错误: {str(e)}")
+            raise
+        except ValueError as e:
+            logger.error(f"JSON解析失败: {endpoint}, 错误: {str(e)}")
+            raise
+
+    def iter_period_data_chunks(self, data_type: str, company_code: str, period_code: str,
+                                chunk_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+        """按块流式获取期间数据（凭证目录、凭证明细、余额等）"""
+        if data_type not in self.PERIOD_ENDPOINTS:
+            raise ValueError(f"不支持流式获取的数据类型: {data_type}")
+        return self.stream_request(self.PERIOD_ENDPOINTS[data_type], {
+            "companyCode": company_code,
+            "periodCode": period_code
+        }, chunk_size)
+
+    def get_account_structure(self, year: str, company_code: str, refresh: bool = False) -> List[Dict[str, Any]]:
         """获取某年度会计科目结构"""
-        response = self._make_request("/Cw6Api/GetAcc", {
+        return self._cached_request("/Cw6Api/GetAcc", {
             "year": year,
             "companyCode": company_code
-        })
-        return response.result or []
+        }, refresh=refresh)
 
-    def get_subject_dimension_relationship(self, year: str, company_code: str) -> List[Dict[str, Any]]:
+    def get_subject_dimension_relationship(self, year: str, company_code: str,
+                                           refresh: bool = False) -> List[Dict[str, Any]]:
         """获取科目辅助核算对应关系"""
-        response = self._make_request("/Cw6Api/Subject_Dimension_Relationship", {
+        return self._cached_request("/Cw6Api/Subject_Dimension_Relationship", {
             "year": year,
             "companyCode": company_code
-        })
-        return response.result or []
+        }, refresh=refresh)
 
-    def get_customer_vendor_dict(self, company_code: str) -> List[Dict[str, Any]]:
+    def get_customer_vendor_dict(self, company_code: str, refresh: bool = False) -> List[Dict[str, Any]]:
         """获取客商字典"""
-        response = self._make_request("/Cw6Api/Get_PC", {
+        return self._cached_request("/Cw6Api/Get_PC", {
             "companyCode": company_code
-        })
-        return response.result or []
+        }, refresh=refresh)
 
     def get_voucher_list(self, company_code: str, period_code: str) -> List[Dict[str, Any]]:
         """获取凭证目录"""
@@ -147,13 +272,133 @@ class FinanceAPIClient:
             self.session.close()
 
 
+class ReportCatalogCache:
+    """
+    报表目录缓存：同一任务、期间、父单位下各单位的报表目录通常相同
+
+    以 (task_id, period_detail_id, parent_id) 为键保存报表目录模板。模板中等于单位代码的字段值
+    （companyCode、dataCompanyCode 等）替换为占位符，签名覆盖报表的全部字段，
+    因此只有除单位代码外完全一致的目录才会共享，复用时把占位符改写为当前单位代码。
+    连续 verify_count 个单位的目录签名一致后才开始共享，之后每复用 revalidate_every 次
+    重新实际查询一次进行抽样校验；任一单位的目录与模板不同，或目录通过 dataCompanyCode
+    绑定到具体单位时，该键永久回退为逐单位查询。
+    hasData 等单位级标志参与签名比较，但复用的目录中不包含这些字段：抽样校验之间的单位
+    即使标志不同也不会得到其他单位的旧值，需要准确标志时应关闭缓存。
+    """
+
+    COMPANY_PLACEHOLDER = "\x00companyCode\x00"
+    # 各单位各自的状态标志，只能通过实际查询获得，不随共享目录下发
+    UNIT_FLAG_FIELDS = frozenset({"hasData"})
+
+    def __init__(self, max_size: int = 256, verify_count: int = 2, revalidate_every: int = 20):
+        self.max_size = max_size
+        self.verify_count = verify_count
+        self.revalidate_every = revalidate_every
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @classmethod
+    def normalize(cls, reports: List[Dict[str, Any]], company_code: str) -> List[Dict[str, Any]]:
+        """把报表中等于单位代码的字段值替换为占位符"""
+        company_code = str(company_code)
+        return [{field: cls.COMPANY_PLACEHOLDER if isinstance(value, str) and value == company_code else value
+                 for field, value in report.items()}
+                for report in reports]
+
+    @staticmethod
+    def signature(normalized: List[Dict[str, Any]]) -> tuple:
+        return tuple(sorted(json.dumps(report, sort_keys=True, ensure_ascii=False, default=str)
+                            for report in normalized))
+
+    @staticmethod
+    def is_company_specific(reports: List[Dict[str, Any]], company_code: str) -> bool:
+        """目录中的 dataCompanyCode 指向当前单位时，说明目录与单位绑定，不能共享"""
+        return any(report.get("dataCompanyCode") and str(report.get("dataCompanyCode")) == str(company_code)
+                   for report in reports)
+
+    def get(self, key: tuple, company_code: str) -> Optional[List[Dict[str, Any]]]:
+        """获取可共享的目录（已改写为当前单位），不可共享或需要抽样校验时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or not entry["shareable"]:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["served"] += 1
+            if self.revalidate_every and entry["served"] % self.revalidate_every == 0:
+                # 抽样校验：由调用方实际查询并通过 record 与模板比较
+                self.revalidations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            template = entry["reports"]
+
+        company_code = str(company_code)
+        return [{field: company_code if value == self.COMPANY_PLACEHOLDER else value
+                 for field, value in report.items() if field not in self.UNIT_FLAG_FIELDS}
+                for report in template]
+
+    def record(self, key: tuple, company_code: str, reports: List[Dict[str, Any]]):
+        """记录某个单位实际查询到的目录，用于校验模板是否可以共享"""
+        normalized = self.normalize(reports, company_code)
+        signature = self.signature(normalized)
+        company_specific = self.is_company_specific(reports, company_code)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = {
+                    "signature": signature,
+                    "reports": normalized,
+                    "verified": 1,
+                    "served": 0,
+                    "shareable": self.verify_count <= 1 and not company_specific,
+                    "divergent": company_specific
+                }
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                return
+
+            self._entries.move_to_end(key)
+            if entry["divergent"]:
+                return
+            if company_specific or entry["signature"] != signature:
+                entry["divergent"] = True
+                entry["shareable"] = False
+                logger.info(f"报表目录在单位间存在差异，{key} 回退为逐单位查询")
+                return
+
+            entry["verified"] += 1
+            if entry["verified"] >= self.verify_count:
+                entry["shareable"] = True
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "revalidations": self.revalidations}
+
+
 class AutoFinancialReportAPI:
-    def __init__(self, username: str, password: str):
+    def __init__(self, username: str, password: str, max_workers: int = None):
         self.username = username
         self.password = password
         self.base_url = "http://10.3.102.141/shj/vue/api/rp/query_output/query_report_new"
         self.report_url = "http://10.3.102.141/shj/vue/api/rp"
+        # 并发获取单位报表的线程数，1 表示逐个单位串行获取
+        self.max_workers = max(1, int(max_workers or config_manager.get('financial_api.max_workers', 4) or 1))
+        # 单次报表请求合并的单位数，1 表示每个单位单独请求
+        self.company_batch_size = max(1, int(config_manager.get('financial_api.company_batch_size', 1) or 1))
+        # 报表目录缓存，按 (任务, 期间, 父单位) 保存，容量为 0 时每个单位都单独查询目录
+        catalog_cache_size = int(config_manager.get('financial_api.catalog_cache_size', 256) or 0)
+        self.catalog_cache = ReportCatalogCache(catalog_cache_size) if catalog_cache_size > 0 else None
         self.session = requests.Session()
+        # 连接池大小与并发数一致，避免并发请求时连接被反复丢弃重建
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, self.max_workers * 2))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
         self.access_token = None
         self.token = None
@@ -169,8 +414,120 @@ class AutoFinancialReportAPI:
             'Accept-Language': 'zh-CN,zh;q=0.9'
         }
 
+        # 登录凭证的磁盘缓存与过期估计，避免每次检测都启动浏览器
+        self.token_cache_path = config_manager.get(
+            'financial_api.token_cache_path',
+            os.path.join(os.path.expanduser('~'), '.dwh_builder', 'financial_api_tokens.json'))
+        self.token_ttl = int(config_manager.get('financial_api.token_ttl_seconds', 8 * 3600) or 8 * 3600)
+        self.token_expires_at = 0.0
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+
         logger.info(f"初始化自动化财务报表API客户端, 用户: {username}")
 
+    def ensure_logged_in(self, force_refresh: bool = False) -> bool:
+        """
+        确保持有可用的登录凭证
+
+        依次尝试：内存中未过期的凭证、磁盘缓存中通过探测的凭证、浏览器自动化登录。
+        多个线程同时发现凭证失效时只执行一次刷新，其余线程等待并复用刷新结果。
+        :param force_refresh: 当前凭证已被服务端拒绝，跳过内存凭证直接刷新
+        """
+        generation = self._login_generation
+        with self._login_lock:
+            # 等待期间其他线程已完成刷新
+            if generation != self._login_generation and self.access_token:
+                return True
+
+            if not force_refresh and self.access_token and time.time() < self.token_expires_at:
+                return True
+
+            if not force_refresh and self._load_cached_tokens():
+                if self._probe_tokens():
+                    logger.info("使用缓存的登录凭证，跳过浏览器登录")
+                    self._login_generation += 1
+                    return True
+                logger.info("缓存的登录凭证已失效，重新登录")
+
+            if self.login_and_get_tokens():
+                self._login_generation += 1
+                return True
+            return False
+
+    def _probe_tokens(self) -> bool:
+        """用任务列表接口探测当前凭证是否仍然有效"""
+        try:
+            resp = self.session.post(f"{self.report_url}/current_task/list", headers=self._get_request_headers(),
+                                     json={}, verify=False, timeout=15)
+            if resp.status_code != 200:
+                return False
+            body = resp.json()
+            return isinstance(body, dict) and body.get("success", True) is not False \
+                and isinstance(body.get("result"), list)
+        except Exception as e:
+            logger.debug(f"登录凭证探测失败: {e}")
+            return False
+
+    def _estimate_token_expiry(self, saved_at: float) -> float:
+        """优先使用 JWT 的 exp 声明估计过期时间（提前5分钟），否则按默认有效期"""
+        try:
+            payload = self.access_token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+            if exp:
+                return float(exp) - 300
+        except Exception:
+            pass
+        return saved_at + self.token_ttl
+
+    def _load_cached_tokens(self) -> bool:
+        """从磁盘加载未过期的登录凭证"""
+        try:
+            if not os.path.exists(self.token_cache_path):
+                return False
+            with open(self.token_cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+
+            if cached.get('username') != self.username or time.time() >= cached.get('expires_at', 0):
+                return False
+
+            self.access_token = cached.get('access_token')
+            self.token = cached.get('token')
+            self.cookies = cached.get('cookies')
+            self.user_agent = cached.get('user_agent')
+            self.token_expires_at = cached.get('expires_at', 0)
+            if not self.access_token:
+                return False
+            self._update_session_config()
+            return True
+
+        except Exception as e:
+            logger.warning(f"读取登录凭证缓存失败: {e}")
+            return False
+
+    def _save_cached_tokens(self):
+        """将登录凭证原子写入磁盘缓存（仅当前用户可读写）"""
+        try:
+            cache_dir = os.path.dirname(self.token_cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            cached = {
+                'username': self.username,
+                'access_token': self.access_token,
+                'token': self.token,
+                'cookies': self.cookies,
+                'user_agent': self.user_agent,
+                'saved_at': time.time(),
+                'expires_at': self.token_expires_at
+            }
+            tmp_path = f"{self.token_cache_path}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(cached, f, ensure_ascii=False)
+            os.replace(tmp_path, self.token_cache_path)
+        except Exception as e:
+            logger.warning(f"保存登录凭证缓存失败: {e}")
+
     def login_and_get_tokens(self) -> bool:
         logger.info("开始执行自动化登录...")
 
@@ -196,6 +553,8 @@ class AutoFinancialReportAPI:
             self.user_agent = user_agent
 
             self._update_session_config()
+            self.token_expires_at = self._estimate_token_expiry(time.time())
+            self._save_cached_tokens()
 
             logger.info(f"自动化登录成功，获取到access_token: {self.access_token[:50]}...")
             return True
@@ -255,6 +614,15 @@ class AutoFinancialReportAPI:
         :param company_parent_code: 单位的父ID，默认值为"2SH0000001"
         :return:
         """
+        return self._make_batch_api_request(report_ids, [(company_code, company_parent_code)])
+
+    def _make_batch_api_request(self, report_ids: List[str], companies: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        一次请求获取多个单位的报表数据
+        :param report_ids: 报表的ID列表（各单位相同）
+        :param companies: (单位ID, 父单位ID) 列表
+        :return:
+        """
         if not self.access_token:
             raise ValueError("未获取到access_token请先执行登录")
 
@@ -274,11 +642,12 @@ class AutoFinancialReportAPI:
 
         data = {
             "reportIds": report_ids,
-            "companies": [{"companyCode": company_code, "companyParentCode": company_parent_code}]
+            "companies": [{"companyCode": company_code, "companyParentCode": company_parent_code}
+                          for company_code, company_parent_code in companies]
         }
 
         try:
-            logger.info(f"发送API请求，报表ID: {report_ids}")
+            logger.info(f"发送API请求，报表ID: {report_ids}, 单位数: {len(companies)}")
             response = self.session.post(
                 self.base_url,
                 params=params,
@@ -373,6 +742,22 @@ class AutoFinancialReportAPI:
             logger.error(f"获取报表列表失败: {e}")
             raise
 
+    def get_reports_cached(self, company_code: str, period_detail_id: str, task_id: str,
+                           parent_id: str = "") -> List[Dict[str, Any]]:
+        """获取报表列表，同一任务/期间/父单位下目录一致时复用已验证的目录"""
+        if self.catalog_cache is None:
+            return self.get_reports(company_code, period_detail_id, task_id)
+
+        key = (task_id, period_detail_id, parent_id)
+        reports = self.catalog_cache.get(key, company_code)
+        if reports is not None:
+            return reports
+
+        reports = self.get_reports(company_code, period_detail_id, task_id)
+        if reports:
+            self.catalog_cache.record(key, company_code, reports)
+        return reports
+
     def get_companies(self, task_id: str, period_detail_id: str) -> List[Dict[str, Any]]:
         """获取单位树结构"""
         url = f"{self.report_url}/company/all_for_parent_tree"
@@ -434,17 +819,7 @@ class AutoFinancialReportAPI:
             all_rows = []
 
             for item in result:
-                data = item.get("formatData", {}).get("data", {})
-                data_table = data.get("dataTable", {})
-
-                if not data_table:
-                    continue
-
-                rows = [data_table[key] for key in sorted(data_table.keys(), key=int)]
-
-                for row in rows:
-                    cols = [str(row[col_key]["value"]) for col_key in sorted(row.keys(), key=int)]
-                    all_rows.append(cols)
+                all_rows.extend(self._parse_item_rows(item))
 
             logger.info(f"成功解析表格数据，共{len(all_rows)}行")
             return all_rows
@@ -453,15 +828,51 @@ class AutoFinancialReportAPI:
             logger.error(f"解析表格数据时出错: {e}")
             return []
 
+    def parse_table_data_by_company(self, api_response: Dict[str, Any]) -> Optional[Dict[str, List[List[str]]]]:
+        """
+        将多单位请求的响应按单位拆分
+        :return: 单位代码 -> 表格行；有报表项缺少单位代码而无法拆分时返回 None
+        """
+        try:
+            result = api_response.get("result", []) or []
+            rows_by_company = {}
+
+            for item in result:
+                company_code = item.get("companyCode") or item.get("dataCompanyCode")
+                if not company_code:
+                    logger.warning("报表项缺少单位代码，无法按单位拆分批量响应")
+                    return None
+                rows_by_company.setdefault(str(company_code), []).extend(self._parse_item_rows(item))
+
+            logger.info(f"成功按单位拆分表格数据，共{len(rows_by_company)}个单位")
+            return rows_by_company
+
+        except Exception as e:
+            logger.error(f"按单位解析表格数据时出错: {e}")
+            return None
+
+    def _parse_item_rows(self, item: Dict[str, Any]) -> List[List[str]]:
+        """解析单个报表项的 dataTable 为行列表"""
+        data = item.get("formatData", {}).get("data", {})
+        data_table = data.get("dataTable", {})
+
+        if not data_table:
+            return []
+
+        rows = [data_table[key] for key in sorted(data_table.keys(), key=int)]
+        return [[str(row[col_key]["value"]) for col_key in sorted(row.keys(), key=int)] for row in rows]
+
     def get_all_data_by_task(self, task_name_filter: str = None, filter_quarterly_monthly: bool = True,
                              tasks_list: List[Dict[str, Any]] = None,
-                             save_callback: callable = None) -> Dict[str, Any]:
+                             save_callback: callable = None,
+                             existing_table: str = "raw_financial_reports") -> Dict[str, Any]:
         """
         根据任务名称获取所有相关数据，支持逐个单位处理和存储
         :param task_name_filter: 任务名称筛选条件，如果为None则使用第一个任务
         :param filter_quarterly_monthly: 是否筛选季报月报任务，默认为True
         :param tasks_list: 预先获取的任务列表，如果提供则不会重复获取
         :param save_callback: 获取到单位数据后的回调函数，用于立即处理和存储数据
+        :param existing_table: 用于判断单位数据是否已存在的表名
         :return: 包含处理统计信息的字典
         """
         try:
@@ -569,8 +980,16 @@ class AutoFinancialReportAPI:
                 except Exception as e:
                     logger.error(f"保存基础元数据失败: {e}")
 
-            # 为每个月份和每个公司获取报表数据并立即处理
-            logger.info("开始逐个获取和处理报表数据...")
+            # 一次性加载已存储的 (单位, 期间) 组合，用于跳过已处理的单位
+            db_manager = None
+            existing_pairs = set()
+            if save_callback:
+                from database.database_manager import DataBaseManager
+                db_manager = DataBaseManager()
+                existing_pairs = self._load_existing_report_pairs(db_manager, existing_table)
+
+            # 过滤已存在的单位，得到需要获取报表的单位列表
+            pending_units = []
             for period in periods:
                 period_detail_id = period["id"]
                 period_name = period.get("periodDetailName", "未知月份")
@@ -578,57 +997,56 @@ class AutoFinancialReportAPI:
                 for company_id, parent_id in company_pairs:
                     processed_count += 1
 
-                    try:
-                        if save_callback:
-                            try:
-                                from database.database_manager import DataBaseManager
-                                db_manager = DataBaseManager()
-
-                                if db_manager.check_financial_report_data_exists(company_id, period_detail_id,
-                                                                                 "raw_financial_reports"):
-                                    logger.info(
-                                        f"财务报表数据已存在，跳过处理 - 单位: {company_id}, 期间: {period_name}")
-                                    success_count += 1
-                                    continue
-                            except Exception as check_error:
-                                logger.warning(f"检查数据存在性时发生错误: {check_error}，继续处理")
-
-                        reports = self.get_reports(company_id, period_detail_id, task_id)
-
-                        if reports:
-                            report_ids = [report.get("reportId") for report in reports if report.get("reportId")]
-
-                            if report_ids:
-                                report_data = self._make_api_request(report_ids, company_id, parent_id)
-                                report_result = self.parse_table_data(report_data)
-
-                                # 构建单个单位的报表数据
-                                single_unit_data = {
-                                    "period_name": period_name,
-                                    "period_detail_id": period_detail_id,
-                                    "company_id": company_id,
-                                    "parent_id": parent_id,
-                                    "reports": reports,
-                                    "report_data": report_result
-                                }
-
-                                if save_callback:
-                                    try:
-                                        save_callback(single_unit_data, data_type="report_data")
-                                        success_count += 1
-                                        logger.info(f"成功处理并保存 {period_name} - {company_id} 的报表数据")
-                                    except Exception as callback_error:
-                                        error_count += 1
-                                        logger.error(
-                                            f"回调函数处理 {period_name} - {company_id} 数据失败: {callback_error}")
-                                else:
-                                    success_count += 1
-                                    logger.info(f"成功获取 {period_name} - {company_id} 的报表数据")
+                    if save_callback:
+                        try:
+                            if existing_pairs is None:
+                                # 批量加载失败时回退为逐个单位查询
+                                exists = db_manager.check_financial_report_data_exists(
+                                    company_id, period_detail_id, existing_table)
+                            else:
+                                exists = (str(company_id), str(period_detail_id)) in existing_pairs
+
+                            if exists:
+                                logger.info(f"财务报表数据已存在，跳过处理 - 单位: {company_id}, 期间: {period_name}")
+                                success_count += 1
+                                continue
+                        except Exception as check_error:
+                            logger.warning(f"检查数据存在性时发生错误: {check_error}，继续处理")
+
+                    pending_units.append({
+                        "period_name": period_name,
+                        "period_detail_id": period_detail_id,
+                        "company_id": company_id,
+                        "parent_id": parent_id
+                    })
+
+            # 并发获取报表，结果在当前线程逐个交给回调处理
+            logger.info(f"开始获取和处理报表数据，待处理单位 {len(pending_units)} 个，并发数 {self.max_workers}...")
+            for unit, single_unit_data, fetch_error in self._iter_unit_reports(pending_units, task_id):
+                period_name = unit["period_name"]
+                company_id = unit["company_id"]
+
+                if fetch_error is not None:
+                    error_count += 1
+                    logger.warning(f"获取 {period_name} - {company_id} 的报表数据失败: {fetch_error}")
+                    continue
 
-                    except Exception as e:
+                if single_unit_data is None:
+                    continue
+
+                if save_callback:
+                    try:
+                        save_callback(single_unit_data, data_type="report_data")
+                        success_count += 1
+                        if existing_pairs is not None:
+                            existing_pairs.add((str(company_id), str(unit["period_detail_id"])))
+                        logger.info(f"成功处理并保存 {period_name} - {company_id} 的报表数据")
+                    except Exception as callback_error:
                         error_count += 1
-                        logger.warning(f"获取 {period_name} - {company_id} 的报表数据失败: {e}")
-                        continue
+                        logger.error(f"回调函数处理 {period_name} - {company_id} 数据失败: {callback_error}")
+                else:
+                    success_count += 1
+                    logger.info(f"成功获取 {period_name} - {company_id} 的报表数据")
 
             result = {
                 "task": final_task,
@@ -644,12 +1062,166 @@ class AutoFinancialReportAPI:
 
             logger.info(
                 f"完成所有数据获取和处理，共处理 {processed_count} 个单位，成功 {success_count} 个，失败 {error_count} 个")
+            if self.catalog_cache is not None:
+                logger.info(f"报表目录缓存统计: {self.catalog_cache.get_statistics()}")
             return result
 
         except Exception as e:
             logger.error(f"获取所有数据失败: {e}")
             raise Exception(f"获取所有数据失败: {e}")
 
+    def _fetch_unit_report(self, unit: Dict[str, Any], task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取单个单位的报表列表和报表数据
+        :return: 单位报表数据，单位没有报表时返回 None
+        """
+        company_id = unit["company_id"]
+        reports = self.get_reports_cached(company_id, unit["period_detail_id"], task_id, unit["parent_id"])
+        if not reports:
+            return None
+
+        report_ids = [report.get("reportId") for report in reports if report.get("reportId")]
+        if not report_ids:
+            return None
+
+        report_data = self._make_api_request(report_ids, company_id, unit["parent_id"])
+        return {
+            **unit,
+            "reports": reports,
+            "report_data": self.parse_table_data(report_data)
+        }
+
+    def _iter_unit_reports(self, units: List[Dict[str, Any]], task_id: str):
+        """
+        以有限并发获取各单位报表，按完成顺序产出 (单位, 报表数据, 异常)
+
+        同时在途的请求不超过 max_workers 个；单个单位失败只影响自身。
+        生成器在调用方线程中消费，保证回调始终串行执行。
+        company_batch_size 大于 1 时，同一期间、同一父单位且报表集合相同的单位合并为一次报表请求。
+        """
+        if self.company_batch_size <= 1:
+            yield from self._run_bounded(units, lambda unit: self._fetch_unit_report(unit, task_id))
+            return
+
+        # 1. 获取各单位的报表目录，按 (期间, 父单位, 报表集合) 分组
+        groups = {}
+        for unit, reports, error in self._run_bounded(
+                units, lambda unit: self.get_reports_cached(unit["company_id"], unit["period_detail_id"], task_id,
+                                                            unit["parent_id"])):
+            if error is not None:
+                yield unit, None, error
+                continue
+
+            report_ids = [report.get("reportId") for report in reports or [] if report.get("reportId")]
+            if not report_ids:
+                yield unit, None, None
+                continue
+
+            key = (unit["period_detail_id"], unit["parent_id"], tuple(sorted(report_ids)))
+            groups.setdefault(key, []).append({**unit, "reports": reports, "report_ids": report_ids})
+
+        # 2. 按批次大小切分后批量请求报表数据
+        batches = []
+        for members in groups.values():
+            for start in range(0, len(members), self.company_batch_size):
+                batches.append(members[start:start + self.company_batch_size])
+        logger.info(f"{sum(len(batch) for batch in batches)} 个单位合并为 {len(batches)} 个报表请求")
+
+        for batch, unit_results, error in self._run_bounded(batches, self._fetch_batch_reports):
+            if error is not None:
+                for member in batch:
+                    yield self._unit_key_fields(member), None, error
+                continue
+            yield from unit_results
+
+    def _fetch_batch_reports(self, batch: List[Dict[str, Any]]) -> List[tuple]:
+        """
+        一次请求获取一批单位的报表数据并按单位拆分
+        :return: [(单位, 报表数据, 异常), ...]
+        """
+        report_ids = batch[0]["report_ids"]
+        by_company = None
+        if len(batch) > 1:
+            response = self._make_batch_api_request(
+                report_ids, [(member["company_id"], member["parent_id"]) for member in batch])
+            by_company = self.parse_table_data_by_company(response)
+            if by_company is None:
+                logger.warning(f"批量响应无法按单位拆分，{len(batch)} 个单位改为逐个请求")
+
+        results = []
+        for member in batch:
+            unit = self._unit_key_fields(member)
+            try:
+                if by_company is not None and str(member["company_id"]) in by_company:
+                    report_result = by_company[str(member["company_id"])]
+                else:
+                    # 批量响应中缺少的单位不视为无数据，改为单独请求；单独请求失败时作为该单位的异常上报
+                    if by_company is not None:
+                        logger.warning(f"批量响应中缺少单位 {member['company_id']}，改为单独请求")
+                    report_result = self.parse_table_data(
+                        self._make_api_request(report_ids, member["company_id"], member["parent_id"]))
+                results.append((unit, {**unit, "reports": member["reports"], "report_data": report_result}, None))
+            except Exception as e:
+                results.append((unit, None, e))
+        return results
+
+    def _unit_key_fields(self, member: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: member[key] for key in ("period_name", "period_detail_id", "company_id", "parent_id")}
+
+    def _run_bounded(self, items: List[Any], func):
+        """
+        以不超过 max_workers 的并发执行 func，按完成顺序产出 (输入, 结果, 异常)
+        max_workers 为 1 时在当前线程中依次执行
+        """
+        if self.max_workers <= 1:
+            for item in items:
+                try:
+                    yield item, func(item), None
+                except Exception as e:
+                    yield item, None, e
+            return
+
+        item_iter = iter(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="report-fetch") as executor:
+            in_flight = {}
+
+            def submit_next() -> bool:
+                item = next(item_iter, None)
+                if item is None:
+                    return False
+                in_flight[executor.submit(func, item)] = item
+                return True
+
+            while len(in_flight) < self.max_workers and submit_next():
+                pass
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    submit_next()
+                    try:
+                        yield item, future.result(), None
+                    except Exception as e:
+                        yield item, None, e
+
+    def _load_existing_report_pairs(self, db_manager, table_name: str) -> Optional[set]:
+        """
+        加载表中已存储的 (company_id, period_detail_id) 组合
+        :return: 组合集合，加载失败时返回 None（调用方回退为逐个单位查询）
+        """
+        try:
+            pairs = db_manager.get_distinct_keys(table_name, ['company_id', 'period_detail_id'])
+        except Exception as e:
+            logger.warning(f"加载已存在的财务报表单位失败: {e}")
+            pairs = None
+
+        if pairs is None:
+            logger.warning(f"无法批量加载表 {table_name} 中已存在的单位，回退为逐个单位检查")
+        else:
+            logger.info(f"表 {table_name} 中已存在 {len(pairs)} 个单位期间组合")
+        return pairs
+
     def get_quarterly_monthly_tasks(self) -> List[Dict[str, Any]]:
         """
         专门获取季报月报任务列表
@@ -657,11 +1229,17 @@ class AutoFinancialReportAPI:
         """
         if not self.access_token:
             logger.info("未登录，开始自动登录...")
-        if not self.login_and_get_tokens():
+        if not self.ensure_logged_in():
             raise ValueError("自动登录失败")
         try:
             logger.info("开始获取季报月报任务...")
-            tasks = self.get_tasks()
+            try:
+                tasks = self.get_tasks()
+            except Exception as e:
+                logger.warning(f"获取任务列表失败，刷新登录凭证后重试: {e}")
+                if not self.ensure_logged_in(force_refresh=True):
+                    raise ValueError("自动登录失败")
+                tasks = self.get_tasks()
 
             if not tasks:
                 logger.warning("未获取到任何任务")
@@ -685,8 +1263,8 @@ class AutoFinancialReportAPI:
             return []
 
 
-def create_auto_financial_api(username: str, password: str) -> AutoFinancialReportAPI:
-    return AutoFinancialReportAPI(username, password)
+def create_auto_financial_api(username: str, password: str, max_workers: int = None) -> AutoFinancialReportAPI:
+    return AutoFinancialReportAPI(username, password, max_workers=max_workers)
 
 
 # ==================== 统一的登录客户端 ====================
@@ -1002,7 +1580,6 @@ class BoeAPIClient:
             raise ValueError("未登录，请先调用login_client.login()")
 
         from datetime import datetime, timedelta
-        from bs4 import BeautifulSoup
 
         # 如果没有提供日期，默认查询最近3个月的数据
         if not start_date or not end_date:
@@ -1038,14 +1615,8 @@ class BoeAPIClient:
                                                            timeout=30)
             response.raise_for_status()
 
-            # 解析HTML响应
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 提取分页信息
-            page_info = self.extract_page_info(soup)
-
-            # 提取表格数据
-            table_data = self.extract_table_data(soup)
+            # 解析HTML响应并提取分页信息与表格数据；页面较大时在进程池中解析
+            page_info, table_data = run_cpu_bound(parse_report_page, response.text, size=len(response.text))
 
             result = {
                 "page_info": page_info,
@@ -1225,7 +1796,8 @@ class BoeAPIClient:
             logger.error(f"解析单据详情失败 boeNo={boe_no}: {e}")
             return None
 
-    def extract_page_info(self, soup) -> Dict:
+    @staticmethod
+    def extract_page_info(soup) -> Dict:
         """提取分页信息"""
 
         page_info = {
@@ -1252,7 +1824,8 @@ class BoeAPIClient:
 
         return page_info
 
-    def extract_table_data(self, soup) -> List[Dict]:
+    @staticmethod
+    def extract_table_data(soup) -> List[Dict]:
         """提取表格数据"""
 
         table_data = []
@@ -1298,3 +1871,11 @@ class BoeAPIClient:
             logger.error(f"提取表格数据时发生错误: {e}")
 
         return table_data
+
+
+def parse_report_page(html: str) -> Tuple[Dict, List[Dict]]:
+    """解析报表预览页面，返回 (分页信息, 表格数据)；纯函数，可在进程池中执行"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    return BoeAPIClient.extract_page_info(soup), BoeAPIClient.extract_table_data(soup)
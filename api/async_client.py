@@ -0,0 +1,142 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from api.api_client import FinanceAPIClient
+from common.config import config_manager
+
+# 数据类型 -> (FinanceAPIClient 方法名, 参数类型)；参数类型决定调用时传入年份、期间还是仅公司代码
+DATA_TYPE_METHODS = {
+    'account_structure': ('get_account_structure', 'year'),
+    'subject_dimension': ('get_subject_dimension_relationship', 'year'),
+    'customer_vendor': ('get_customer_vendor_dict', 'company'),
+    'voucher_list': ('get_voucher_list', 'period'),
+    'voucher_detail': ('get_voucher_detail', 'period'),
+    'voucher_dim_detail': ('get_voucher_dim_detail', 'period'),
+    'balance': ('get_balance', 'period'),
+    'aux_balance': ('get_aux_balance', 'period'),
+}
+
+
+@dataclass
+class FetchResult:
+    """一次批量获取中单个 (数据类型, 公司, 期间) 的结果"""
+    data_type: str
+    company_code: str
+    period_code: Optional[str]
+    data: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+class AsyncFinanceAPIClient(FinanceAPIClient):
+    """
+    FinanceAPIClient 的异步版本
+
+    请求仍通过 requests 会话发送（沿用 _make_request 的 _normalize_api_response/APIResponse 语义），
+    由有界线程池执行，事件循环负责调度：连接池大小与线程数为 max_connections，
+    同一主机同时在途的请求数不超过 per_host_limit。fetch_many 对大量 (数据类型, 公司, 期间)
+    组合扇出并按完成先后产出结果。
+    """
+
+    def __init__(self, base_url: str, app_key: str, app_secret: str, max_connections: int = None,
+                 per_host_limit: int = None, response_cache=None):
+        super().__init__(base_url, app_key, app_secret, response_cache=response_cache)
+        self.max_connections = max_connections or int(config_manager.get('api.max_connections', 32) or 32)
+        self.per_host_limit = per_host_limit or int(config_manager.get('api.per_host_limit', 16) or 16)
+
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="finance-api")
+        # 事件循环 -> {主机: 信号量}；asyncio.Semaphore 绑定所在的事件循环，因此按循环分别创建
+        self._host_semaphores = weakref.WeakKeyDictionary()
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._host_semaphores.setdefault(loop, {})
+        host = urlparse(url).netloc
+        if host not in semaphores:
+            semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphores[host]
+
+    async def _run_limited(self, func, *args):
+        async with self._host_semaphore(self.base_url):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def make_request_async(self, endpoint: str, params: Dict[str, Any]):
+        """异步调用任意接口，返回 APIResponse"""
+        return await self._run_limited(self._make_request, endpoint, params)
+
+    async def fetch(self, data_type: str, company_code: str, period_code: str = None,
+                    year: str = None) -> List[Dict[str, Any]]:
+        """异步获取单个数据类型的数据；year 默认取期间代码的年份部分"""
+        if data_type not in DATA_TYPE_METHODS:
+            raise ValueError(f"不支持的数据类型: {data_type}")
+
+        method_name, param_kind = DATA_TYPE_METHODS[data_type]
+        method = getattr(self, method_name)
+        if param_kind == 'year':
+            year = year or (period_code.split('-')[0] if period_code else None)
+            args = (year, company_code)
+        elif param_kind == 'period':
+            args = (company_code, period_code)
+        else:
+            args = (company_code,)
+        return await self._run_limited(method, *args)
+
+    async def _fetch_result(self, data_type: str, company_code: str, period_code: Optional[str]) -> FetchResult:
+        try:
+            data = await self.fetch(data_type, company_code, period_code)
+            return FetchResult(data_type, company_code, period_code, data=data)
+        except Exception as e:
+            logger.error(f"获取 {data_type} 数据失败 - 公司: {company_code}, 期间: {period_code}, 错误: {e}")
+            return FetchResult(data_type, company_code, period_code, error=str(e))
+
+    async def fetch_many(self, requests_: Iterable[Tuple[str, str, Optional[str]]]) -> AsyncIterator[FetchResult]:
+        """
+        对 (data_type, company_code, period_code) 组合扇出请求，按完成先后产出 FetchResult
+
+        同时创建的协程不超过 max_connections 的两倍，输入可以是很长的生成器。
+        单个请求失败不影响其他请求，错误记录在 FetchResult.error 中。
+        """
+        window = self.max_connections * 2
+        pending = set()
+        iterator = iter(requests_)
+
+        def fill():
+            for data_type, company_code, period_code in iterator:
+                pending.add(asyncio.ensure_future(self._fetch_result(data_type, company_code, period_code)))
+                if len(pending) >= window:
+                    break
+
+        fill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                yield task.result()
+            fill()
+
+    def fetch_all(self, requests_: Iterable[Tuple[str, str, Optional[str]]]) -> List[FetchResult]:
+        """fetch_many 的同步入口，在新的事件循环中运行并返回全部结果（按完成先后）"""
+
+        async def collect():
+            return [result async for result in self.fetch_many(requests_)]
+
+        return asyncio.run(collect())
+
+    def close(self):
+        """关闭线程池与会话"""
+        self._executor.shutdown(wait=False)
+        super().close()
@@ -0,0 +1,126 @@
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+# 缓冲区中已解析部分超过该字符数时丢弃，避免缓冲区随响应增长
+_COMPACT_THRESHOLD = 1 << 20
+_WHITESPACE = ' \t\r\n'
+
+
+class JSONStreamError(ValueError):
+    """流式解析时遇到不完整或不符合预期结构的 JSON"""
+
+
+class StreamingJSONArrayParser:
+    """
+    增量解析形如 {"code": 200, ..., "result": [{...}, {...}]} 的顶层 JSON 对象
+
+    以字节块为输入，逐条产出数组字段中的记录，数组之外的字段（信封字段）保存在 envelope 中。
+    内存占用只与单条记录和读取块大小有关，与响应总大小无关。信封字段出现在数组之后时，
+    迭代结束后 envelope 才完整。
+    """
+
+    def __init__(self, chunks: Iterable[bytes], array_keys: Sequence[str] = ('result', 'data'),
+                 encoding: str = 'utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.array_keys = tuple(array_keys)
+        self.array_key = None
+        self.envelope: Dict[str, Any] = {}
+        self.record_count = 0
+
+    def _fill(self) -> bool:
+        """读取下一块数据，已无数据时返回 False"""
+        if self._eof:
+            return False
+        if self._pos > _COMPACT_THRESHOLD:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._decoder.decode(chunk)
+                return True
+        self._buffer += self._decoder.decode(b'', final=True)
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        """跳过空白并返回下一个字符，输入结束时返回空字符串"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char == '' or char not in chars:
+            raise JSONStreamError(f"期望 {chars!r}，实际为 {char or '输入结束'!r} (位置 {self._pos})")
+        self._pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        """
+        解析下一个完整的 JSON 值；值可能跨越读取块边界，解析失败时读入更多数据后重试。
+        值恰好结束于缓冲区末尾时（如数字）也先读入更多数据，确认值没有被截断。
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise JSONStreamError(f"JSON 不完整或格式错误: {e}") from e
+            # 输入已结束时 _fill 返回 False 并置 _eof，下一轮解析要么成功要么抛出
+            self._fill()
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self._decode_value()
+            if not isinstance(key, str):
+                raise JSONStreamError(f"对象键必须为字符串: {key!r}")
+            self._expect(':')
+
+            if key in self.array_keys and self.array_key is None and self._peek() == '[':
+                self.array_key = key
+                self._pos += 1
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        record = self._decode_value()
+                        self.record_count += 1
+                        yield record
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.envelope[key] = self._decode_value()
+
+            if self._expect(',}') == '}':
+                break
+
+
+def iter_record_chunks(records: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """将记录流按固定条数分块"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# 不参与缓存键计算的鉴权参数
+_CREDENTIAL_PARAMS = ('appkey', 'appSecret')
+
+
+class ResponseCache:
+    """
+    接口响应缓存：内存 LRU 在前，SQLite 磁盘存储在后
+
+    用于科目结构、科目维度关系、客商字典这类按年度或长期不变的字典数据。缓存键为
+    (接口路径, 去掉鉴权参数后的请求参数) 的哈希，条目超过 ttl_seconds 后失效。
+    磁盘上的响应内容按内容哈希去重压缩保存：多个公司返回相同的客商字典时只保存一份；
+    内容总大小超过 max_disk_bytes 时按最近访问时间淘汰。
+
+    缓存键包含公司代码，每个公司首次获取仍需一次请求。数据已入库的 (公司, 年度) 由
+    check_traditional_data_exists 跳过，不会再查询接口，因此命中来自同一请求的重复获取：
+    获取成功但入库失败后的任务重试，以及进程重启后重放的未完成任务，这些情况下不再重新下载大体积字典。
+    重新检查模式会使条目失效并重新请求。
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 24 * 3600, memory_size: int = 32,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.memory_size = memory_size
+        self.max_disk_bytes = max_disk_bytes
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 缓存键 -> (过期时间, 记录列表)
+        self._memory: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_bytes = 0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                params TEXT NOT NULL,
+                payload_hash TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS payloads (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_endpoint ON entries(endpoint)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_payload ON entries(payload_hash)")
+        with self._lock:
+            self._purge_expired()
+            self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM payloads").fetchone()[0]
+        logger.info(f"接口响应缓存已打开: {db_path}, 磁盘占用 {self._disk_bytes} 字节")
+
+    @staticmethod
+    def _normalize_params(params: Dict[str, Any]) -> str:
+        return json.dumps({k: v for k, v in params.items() if k not in _CREDENTIAL_PARAMS},
+                          sort_keys=True, ensure_ascii=False, default=str)
+
+    @classmethod
+    def make_key(cls, endpoint: str, params: Dict[str, Any]) -> str:
+        """缓存键：接口路径与规范化请求参数的 SHA-256"""
+        return hashlib.sha256(f"{endpoint}\n{cls._normalize_params(params)}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _copy(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # 调用方（如 DataProcessor._save_raw_data）会就地补充公司代码等字段，每次命中返回记录的浅拷贝
+        return [dict(record) if isinstance(record, dict) else record for record in records]
+
+    def _remember(self, key: str, expires_at: float, records: List[Dict[str, Any]]) -> None:
+        self._memory[key] = (expires_at, records)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, endpoint: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """查询缓存，未命中或已过期时返回 None"""
+        key = self.make_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return self._copy(cached[1])
+                del self._memory[key]
+
+            row = self._conn.execute("""
+                SELECT e.expires_at, p.hash, p.data FROM entries e JOIN payloads p ON p.hash = e.payload_hash
+                WHERE e.key = ?
+            """, (key,)).fetchone()
+            if row is None or row[0] <= now:
+                self.misses += 1
+                return None
+
+            expires_at, payload_hash, data = row
+            self._conn.execute("UPDATE payloads SET last_access = ? WHERE hash = ?", (now, payload_hash))
+            records = json.loads(zlib.decompress(data))
+            self._remember(key, expires_at, records)
+            self.disk_hits += 1
+            return self._copy(records)
+
+    def put(self, endpoint: str, params: Dict[str, Any], records: List[Dict[str, Any]]) -> None:
+        """写入缓存；内容已存在时只新增键到内容的映射"""
+        key = self.make_key(endpoint, params)
+        raw = json.dumps(records, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        payload_hash = hashlib.sha256(raw).hexdigest()
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM payloads WHERE hash = ?", (payload_hash,)).fetchone()
+            if exists:
+                self._conn.execute("UPDATE payloads SET last_access = ? WHERE hash = ?", (now, payload_hash))
+            else:
+                data = zlib.compress(raw, 1)
+                self._conn.execute("INSERT INTO payloads (hash, data, size, last_access) VALUES (?, ?, ?, ?)",
+                                   (payload_hash, data, len(data), now))
+                self._disk_bytes += len(data)
+            self._conn.execute("""
+                INSERT OR REPLACE INTO entries (key, endpoint, params, payload_hash, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, endpoint, self._normalize_params(params), payload_hash, expires_at))
+            self._remember(key, expires_at, self._copy(records))
+            self._purge_orphans()
+            self._evict_to_size()
+
+    def invalidate(self, endpoint: str = None, params: Dict[str, Any] = None) -> int:
+        """
+        使缓存失效：同时给出 endpoint 与 params 时删除单个条目，只给出 endpoint 时删除该接口的全部条目，
+        均不给出时清空缓存。返回删除的条目数。
+        """
+        with self._lock:
+            if endpoint is not None and params is not None:
+                key = self.make_key(endpoint, params)
+                self._memory.pop(key, None)
+                removed = self._conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount
+            elif endpoint is not None:
+                keys = [row[0] for row in self._conn.execute("SELECT key FROM entries WHERE endpoint = ?",
+                                                             (endpoint,))]
+                for key in keys:
+                    self._memory.pop(key, None)
+                removed = self._conn.execute("DELETE FROM entries WHERE endpoint = ?", (endpoint,)).rowcount
+            else:
+                self._memory.clear()
+                removed = self._conn.execute("DELETE FROM entries").rowcount
+            self._purge_orphans()
+        logger.info(f"接口响应缓存已失效 {removed} 条 - 接口: {endpoint or '全部'}")
+        return removed
+
+    def _purge_expired(self) -> None:
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        self._purge_orphans()
+
+    def _purge_orphans(self) -> None:
+        """删除没有条目引用的响应内容"""
+        freed = self._conn.execute("""
+            SELECT COALESCE(SUM(size), 0) FROM payloads
+            WHERE hash NOT IN (SELECT payload_hash FROM entries)
+        """).fetchone()[0]
+        if freed:
+            self._conn.execute("DELETE FROM payloads WHERE hash NOT IN (SELECT payload_hash FROM entries)")
+            self._disk_bytes -= freed
+
+    def _evict_to_size(self) -> None:
+        """磁盘占用超过上限时先清理过期条目，再按最近访问时间淘汰响应内容"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        self._purge_expired()
+        while self._disk_bytes > self.max_disk_bytes:
+            row = self._conn.execute("SELECT hash, size FROM payloads ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            payload_hash, size = row
+            keys = [key for (key,) in self._conn.execute("SELECT key FROM entries WHERE payload_hash = ?",
+                                                         (payload_hash,))]
+            for key in keys:
+                self._memory.pop(key, None)
+            self._conn.execute("DELETE FROM entries WHERE payload_hash = ?", (payload_hash,))
+            self._conn.execute("DELETE FROM payloads WHERE hash = ?", (payload_hash,))
+            self._disk_bytes -= size
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                'entries': entries,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.warning(f"关闭接口响应缓存失败: {e}")
+
+
+def create_response_cache(db_path: Optional[str], ttl_seconds: float = 24 * 3600, memory_size: int = 32,
+                          max_disk_bytes: int = 256 * 1024 * 1024) -> Optional[ResponseCache]:
+    """按配置创建接口响应缓存，路径为空时不启用缓存"""
+    if not db_path:
+        return None
+    try:
+        return ResponseCache(db_path, ttl_seconds=ttl_seconds, memory_size=memory_size,
+                             max_disk_bytes=max_disk_bytes)
+    except Exception as e:
+        logger.error(f"打开接口响应缓存 {db_path} 失败，不使用缓存: {e}")
+        return None
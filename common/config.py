@@ -30,10 +30,23 @@ class ConfigManager:
             'API_BASE_URL': 'api.base_url',
             'APP_KEY': 'api.app_key',
             'APP_SECRET': 'api.app_secret',
+            'API_MAX_CONNECTIONS': 'api.max_connections',
+            'API_PER_HOST_LIMIT': 'api.per_host_limit',
+            'API_STREAM_CHUNK_SIZE': 'api.stream_chunk_size',
+            'API_VALIDATE_RESULT': 'api.validate_result',
+            'API_RESPONSE_CACHE_PATH': 'api.response_cache_path',
+            'API_RESPONSE_CACHE_TTL': 'api.response_cache_ttl_seconds',
+            'API_RESPONSE_CACHE_MEMORY_SIZE': 'api.response_cache_memory_size',
+            'API_RESPONSE_CACHE_MAX_BYTES': 'api.response_cache_max_bytes',
 
             # 财务报表API配置
             'USERNAME': 'financial_api.username',
             'PASSWORD': 'financial_api.password',
+            'FINANCIAL_API_MAX_WORKERS': 'financial_api.max_workers',
+            'FINANCIAL_API_COMPANY_BATCH_SIZE': 'financial_api.company_batch_size',
+            'FINANCIAL_API_CATALOG_CACHE_SIZE': 'financial_api.catalog_cache_size',
+            'FINANCIAL_API_TOKEN_CACHE_PATH': 'financial_api.token_cache_path',
+            'FINANCIAL_API_TOKEN_TTL': 'financial_api.token_ttl_seconds',
 
             # 数据库配置
             'DB_HOST': 'database.host',
@@ -42,14 +55,56 @@ class ConfigManager:
             'DB_PASSWORD': 'database.password',
             'DB_TENANT': 'database.tenant',
             'DB_DATABASE': 'database.database',
+
+            # 数据库会话池配置
+            'DB_POOL_MIN': 'database.pool_min',
+            'DB_POOL_MAX': 'database.pool_max',
+            'DB_POOL_INCREMENT': 'database.pool_increment',
+            'DB_POOL_TIMEOUT': 'database.pool_timeout',
+            'DB_POOL_PING_INTERVAL': 'database.pool_ping_interval',
+            'DB_STMT_CACHE_SIZE': 'database.stmt_cache_size',
+            'DB_METADATA_TTL': 'database.metadata_ttl_seconds',
+            'DB_WRITE_BUFFER_ROWS': 'database.write_buffer_rows',
+            'DB_WRITE_BUFFER_BYTES': 'database.write_buffer_bytes',
+            'DB_WRITE_BUFFER_INTERVAL': 'database.write_buffer_interval',
+
+            # 系统任务队列配置
+            'TASK_STORE_PATH': 'system.task_store_path',
+            'TASK_COMPLETED_RETENTION_HOURS': 'system.completed_retention_hours',
+            'TASK_RESULT_CACHE_SIZE': 'system.result_cache_size',
+            'PROCESS_POOL_WORKERS': 'system.process_pool_workers',
+            'PROCESS_POOL_MIN_SIZE': 'system.process_pool_min_size',
+            'FINGERPRINT_STORE_PATH': 'system.fingerprint_store_path',
+            'REFRESH_OPEN_PERIODS': 'system.refresh_open_periods',
+        }
+
+        int_keys = {
+            'database.port', 'server1.port', 'server2.port', 'api.max_connections', 'api.per_host_limit',
+            'api.stream_chunk_size', 'api.response_cache_ttl_seconds', 'api.response_cache_memory_size',
+            'api.response_cache_max_bytes',
+            'database.pool_min', 'database.pool_max', 'database.pool_increment',
+            'database.pool_timeout', 'database.pool_ping_interval', 'database.stmt_cache_size',
+            'database.metadata_ttl_seconds', 'database.write_buffer_rows', 'database.write_buffer_bytes',
+            'financial_api.max_workers',
+            'financial_api.company_batch_size', 'financial_api.catalog_cache_size',
+            'financial_api.token_ttl_seconds', 'system.completed_retention_hours',
+            'system.result_cache_size', 'system.process_pool_workers', 'system.process_pool_min_size',
+            'system.refresh_open_periods',
         }
 
+        float_keys = {'database.write_buffer_interval'}
+        bool_keys = {'api.validate_result'}
+
         for env_key, config_key in env_mappings.items():
             env_value = os.getenv(env_key)
             if env_value is not None:
                 # 类型转换
-                if config_key in ['database.port', 'server1.port', 'server2.port']:
+                if config_key in int_keys:
                     env_value = int(env_value)
+                elif config_key in float_keys:
+                    env_value = float(env_value)
+                elif config_key in bool_keys:
+                    env_value = env_value.strip().lower() in ('1', 'true', 'yes', 'on')
 
                 self._set_nested_value(config_key, env_value)
 
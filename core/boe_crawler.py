@@ -6,6 +6,7 @@ from typing import Dict, List, Optional
 from bs4 import BeautifulSoup
 
 from api.api_client import UnifiedLoginClient, BoeAPIClient
+from database.batch_writer import BufferedTableWriter, FlushResult
 from database.database_manager import DataBaseManager
 
 # 配置日志
@@ -36,6 +37,9 @@ class BoeCrawler:
 
         # 初始化数据库管理器
         self.db_manager = DataBaseManager()
+        # 单据数据先进入写缓冲，按批次合并写入数据库
+        self.writer = BufferedTableWriter(self.db_manager, on_flush=self._on_rows_flushed)
+        self.flush_stats = {}
 
         # 使用统一的登录客户端和API客户端
         self.login_client = UnifiedLoginClient(base_url, login_key, password)
@@ -118,7 +122,7 @@ class BoeCrawler:
         return self.api_client.get_boe_detail(boe_no, boe_header_id, key)
 
     def process_bills_with_details(self):
-        """从 self.reports 提取 boeNo -> 全量单据 -> boeHeaderId -> 单据详情，获取一条数据就写入一条。"""
+        """从 self.reports 提取 boeNo -> 全量单据 -> boeHeaderId -> 单据详情，获取的数据进入写缓冲分批写入。"""
         if not self.reports:
             logger.warning("没有可处理的报账单记录（列表页数据为空）")
             return
@@ -169,8 +173,21 @@ class BoeCrawler:
 
             processed += 1
             time.sleep(0.5)
+        # 写出缓冲中剩余的数据
+        self.writer.flush(reason='finish')
         logger.info(
-            f"串联处理完成，共处理 {processed} 条单据，成功写入 {saved_full_reports} 条全量单据，{saved_details} 条单据详情")
+            f"串联处理完成，共处理 {processed} 条单据，提交 {saved_full_reports} 条全量单据，{saved_details} 条单据详情，"
+            f"写入统计: {self.flush_stats}")
+
+    def _on_rows_flushed(self, result: FlushResult):
+        """写缓冲每次批量写入后的回调，按表统计保存结果"""
+        stats = self.flush_stats.setdefault(result.table_name, {'saved': 0, 'failed': 0})
+        # 放回缓冲区等待重试的记录在之后的写入中再统计
+        stats['saved'] += result.written_count
+        stats['failed'] += result.failed_count
+        if result.failed_count:
+            logger.error(f"{result.failed_count} 条数据写入数据库表 {result.table_name} 失败: "
+                         f"{result.error or '写入返回失败'}")
 
     def _is_empty_full_report(self, full_item: Dict) -> bool:
         """
@@ -207,14 +224,14 @@ class BoeCrawler:
 
     def save_single_full_report_to_database(self, full_item: Dict, table_name: str = "row_boe_full_reports") -> bool:
         """
-        将单条全量单据数据立即写入数据库
+        将单条全量单据数据加入写缓冲，按批次写入数据库
         
         Args:
             full_item: 单条全量单据数据
             table_name: 表名，默认为 "row_boe_full_reports"
             
         Returns:
-            bool: 写入成功返回True，失败返回False
+            bool: 已接收返回True，失败返回False（批量写入结果见 flush_stats）
         """
         try:
             # 过滤空数据
@@ -223,14 +240,10 @@ class BoeCrawler:
                 logger.info(f"跳过空数据：boeNo={boe_no} 全量单据数据为空，不写入数据库")
                 return False
 
-            success = self.db_manager.auto_create_and_save_data(
-                [full_item],
-                table_name,
-                if_exists='append'
-            )
+            success = self.writer.add(table_name, full_item)
             if success:
                 logger.debug(
-                    f"成功写入单条全量单据数据 boeNo={full_item.get('boeNo', 'unknown')} 到数据库表 {table_name}")
+                    f"已缓冲单条全量单据数据 boeNo={full_item.get('boeNo', 'unknown')}，待写入数据库表 {table_name}")
             else:
                 logger.error(
                     f"写入单条全量单据数据 boeNo={full_item.get('boeNo', 'unknown')} 到数据库表 {table_name} 失败")
@@ -271,14 +284,14 @@ class BoeCrawler:
 
     def save_single_detail_to_database(self, detail_item: Dict, table_name: str = "row_boe_details") -> bool:
         """
-        将单条单据详情数据立即写入数据库，只包含 id 和 report 两个字段
+        将单条单据详情数据加入写缓冲，只包含 id 和 report 两个字段
         
         Args:
             detail_item: 单条单据详情数据
             table_name: 表名，默认为 "row_boe_details"
             
         Returns:
-            bool: 写入成功返回True，失败返回False
+            bool: 已接收返回True，失败返回False（批量写入结果见 flush_stats）
         """
         try:
             # 过滤空数据或无效数据
@@ -299,15 +312,11 @@ class BoeCrawler:
                 "report": detail_json
             }
 
-            success = self.db_manager.auto_create_and_save_data(
-                [detail_data],  # 将单条数据包装成列表
-                table_name,
-                if_exists='append'
-            )
+            success = self.writer.add(table_name, detail_data)
 
             if success:
                 logger.debug(
-                    f"成功写入单条单据详情数据 boeNo={detail_item.get('boeNo', 'unknown')} 到数据库表 {table_name}")
+                    f"已缓冲单条单据详情数据 boeNo={detail_item.get('boeNo', 'unknown')}，待写入数据库表 {table_name}")
             else:
                 logger.error(
                     f"写入单条单据详情数据 boeNo={detail_item.get('boeNo', 'unknown')} 到数据库表 {table_name} 失败")
@@ -412,8 +421,8 @@ class BoeCrawler:
                 logger.error("数据爬取失败")
                 return
 
-            # 串联处理全量单据与详情，获取一条数据就写入一条
-            logger.info("开始处理全量单据与详情数据（逐条写入）...")
+            # 串联处理全量单据与详情，获取的数据经写缓冲分批写入
+            logger.info("开始处理全量单据与详情数据（缓冲批量写入）...")
             self.process_bills_with_details()
 
             end_time = time.time()
@@ -430,6 +439,8 @@ class BoeCrawler:
         except Exception as e:
             logger.error(f"爬取过程中发生错误: {e}")
             raise
+        finally:
+            self.writer.close()
 
 
 def main():
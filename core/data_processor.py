@@ -1,13 +1,19 @@
 import json
 import logging
 import time
+from contextlib import closing
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Tuple
 from api.api_client import FinanceAPIClient, create_auto_financial_api
-from core.system_manager import SystemManager
+from api.async_client import AsyncFinanceAPIClient
+from api.response_cache import ResponseCache
+from common.config import config_manager
+from core.fingerprint_store import PayloadFingerprint, SQLiteFingerprintStore
+from core.system_manager import SystemManager, TaskHandle
 from database.database_manager import DataBaseManager
 from utils.monitor import execution_monitor
+from utils.process_pool import run_cpu_bound
 
 
 @dataclass
@@ -21,12 +27,91 @@ class ProcessingResult:
     processing_time: float
     error_message: Optional[str] = None
     timestamp: datetime = None
+    # 失败时是否值得重试；API 返回空数据等结果重试也不会改变，任务调度器不再重试
+    retryable: bool = True
 
     def __post_init__(self):
         if self.timestamp is None:
             self.timestamp = datetime.now()
 
 
+def build_financial_report_json_records(unit_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    将单个单位的报表数据转换为 JSON 存储记录（每个报表一条）
+
+    纯函数，输入输出均可 pickle，大矩阵时由 DataProcessor 提交到进程池执行。
+    """
+    period_name = unit_data.get('period_name', '')
+    period_detail_id = unit_data.get('period_detail_id', '')
+    company_id = unit_data.get('company_id', '')
+    parent_id = unit_data.get('parent_id', '')
+    reports = unit_data.get('reports', []) or []
+    report_data_matrix = unit_data.get('report_data', []) or []
+
+    # 报表矩阵对该单位的所有报表相同，只序列化一次
+    report_data_json = json.dumps(report_data_matrix, ensure_ascii=False)
+    raw_records = []
+
+    # 为每个报表创建一条记录
+    for report in reports:
+        # 提取主要字段
+        report_id = report.get('reportId', '')
+        report_name = report.get('reportName', '')
+        report_code = report.get('reportCode', '')
+
+        # 将报表的完整信息和报表数据矩阵存储在raw_data字段中
+        # 等价于 json.dumps({'report_info': report, 'report_data': report_data_matrix})
+        raw_data_json = ('{"report_info": ' + json.dumps(report, ensure_ascii=False)
+                         + ', "report_data": ' + report_data_json + '}')
+
+        record = {
+            'report_id': report_id,
+            'report_name': report_name,
+            'report_code': report_code,
+            'company_id': company_id,
+            'parent_id': parent_id,
+            'period_name': period_name,
+            'period_detail_id': period_detail_id,
+            'raw_data': raw_data_json,  # 其余数据存储在raw_data字段中
+            'data_source': 'financial_report_api',
+            'processing_status': 'raw',
+            'created_at': datetime.now().isoformat()
+        }
+        raw_records.append(record)
+
+    # 如果没，有报表信息，但存在报表数据仍然保存一条记录
+    if not reports and report_data_matrix:
+        raw_data_dict = {
+            'report_data': report_data_matrix
+        }
+        raw_data_json = json.dumps(raw_data_dict, ensure_ascii=False)
+
+        record = {
+            'report_id': '',
+            'report_name': '',
+            'report_code': '',
+            'company_id': company_id,
+            'parent_id': parent_id,
+            'period_name': period_name,
+            'period_detail_id': period_detail_id,
+            'raw_data': raw_data_json,
+            'data_source': 'financial_report_api',
+            'processing_status': 'raw',
+            'created_at': datetime.now().isoformat()
+        }
+        raw_records.append(record)
+
+    return raw_records
+
+
+# 期间组合任务默认处理的数据类型
+PERIOD_BUNDLE_DATA_TYPES = ['voucher_list', 'voucher_detail', 'voucher_dim_detail', 'balance', 'aux_balance']
+# 默认流式获取、按块保存的数据类型（单期间响应可达数十万条）
+STREAMING_DATA_TYPES = ['voucher_detail', 'voucher_dim_detail']
+# 重新检查模式下新写入、尚未替换旧分区的数据行的 processing_status
+STAGED_STATUS = 'staging'
+
+
 class DataProcessor:
     """
     数据处理组件 - 整合API调用、数据库存储和任务队列管理
@@ -41,7 +126,8 @@ class DataProcessor:
 
     def __init__(self, api_config: Dict[str, str], db_manager: DataBaseManager = None,
                  auto_report_config: Dict[str, str] = None,
-                 financial_report_storage_mode: str = 'json'):
+                 financial_report_storage_mode: str = 'json', response_cache: ResponseCache = None,
+                 fingerprint_store: SQLiteFingerprintStore = None):
         """
         初始化数据处理器
 
@@ -50,14 +136,26 @@ class DataProcessor:
             db_manager: 数据库管理器实例，如果为None则创建新实例
             auto_report_config: 自动财务报表API配置，包含username, password
             financial_report_storage_mode: 财务报表存储模式，'legacy' 或 'json'
+            response_cache: 字典类接口的响应缓存，两个API客户端共用
+            fingerprint_store: 数据指纹存储，重新检查模式下用于跳过未变化的数据
         """
         self.logger = logging.getLogger(__name__)
 
         # 初始化各个组件
+        self.response_cache = response_cache
+        self.fingerprint_store = fingerprint_store
         self.api_client = FinanceAPIClient(
             base_url=api_config['base_url'],
             app_key=api_config['app_key'],
-            app_secret=api_config['app_secret']
+            app_secret=api_config['app_secret'],
+            response_cache=response_cache
+        )
+        # 组合任务并发获取多个数据类型时使用的异步客户端
+        self.async_api_client = AsyncFinanceAPIClient(
+            base_url=api_config['base_url'],
+            app_key=api_config['app_key'],
+            app_secret=api_config['app_secret'],
+            response_cache=response_cache
         )
 
         # 初始化自动财务报表API客户端
@@ -89,11 +187,18 @@ class DataProcessor:
             'aux_balance': self.api_client.get_aux_balance
         }
 
+        # 流式获取并按块保存的数据类型，只支持按期间获取的类型
+        self.streaming_data_types = {
+            data_type for data_type in config_manager.get('api.streaming_data_types', STREAMING_DATA_TYPES) or []
+            if data_type in FinanceAPIClient.PERIOD_ENDPOINTS
+        }
+
         # 注意：已移除数据清洗方法映射，不再进行数据清洗
         # self.cleaning_methods = {...}
 
     @execution_monitor(stage="data_processing", track_memory=True)
-    def process_data(self, data_type: str, company_code: str, **kwargs) -> ProcessingResult:
+    def process_data(self, data_type: str, company_code: str, prefetched_data: List[Dict[str, Any]] = None,
+                     refresh: bool = False, **kwargs) -> ProcessingResult:
         """
         处理单个数据类型的完整流程
 
@@ -102,6 +207,11 @@ class DataProcessor:
         Args:
             data_type: 数据类型
             company_code: 公司代码
+            prefetched_data: 已获取的原始数据，提供时不再调用API
+            refresh: 重新检查模式，分区已有数据时也重新获取；数据指纹与上次入库一致时不替换分区，
+                不一致时新数据先写为暂存行，全部写入成功后在一个事务中替换旧分区。
+                非流式类型在写入前比较指纹，未变化时跳过全部数据库写入；流式类型只下载一次，边写暂存行边计算指纹，
+                未变化时删除暂存行
             **kwargs: 其他参数（如年份、期间等）
 
         Returns:
@@ -116,38 +226,86 @@ class DataProcessor:
             year = kwargs.get('year')
             period_code = kwargs.get('period_code')
 
-            if self.db_manager.check_traditional_data_exists(data_type, company_code, year, period_code):
-                self.logger.info(
-                    f"数据已存在，跳过处理 - 数据类型: {data_type}, 公司: {company_code}, 年份: {year}, 期间: {period_code}")
+            if not refresh and self.db_manager.check_traditional_data_exists(data_type, company_code, year,
+                                                                             period_code):
+                return self._existing_result(data_type, company_code, year, period_code)
+
+            streaming = prefetched_data is None and data_type in self.streaming_data_types
+            if streaming:
+                period_code = period_code or f"{datetime.now().year}01"
+            partition = self._fingerprint_partition(data_type, year, period_code)
+            fingerprint = PayloadFingerprint()
+            saved = False
+
+            # 1. 通过API获取原始数据；大数据量类型边下载边按块保存，不在内存中保留完整响应。
+            #    重新检查模式下新数据先写为暂存行，全部写入成功且数据有变化时才在一个事务中替换旧数据
+            status = STAGED_STATUS if refresh else 'raw'
+            if streaming:
+                # 只下载一次：边保存边计算指纹
+                try:
+                    original_count, saved = self._stream_raw_data(data_type, company_code, year=year,
+                                                                  period_code=period_code,
+                                                                  fingerprint=fingerprint, status=status)
+                except Exception:
+                    self._discard_partial_partition(data_type, company_code, year, period_code, partition,
+                                                    staged=refresh)
+                    raise
+                if not saved:
+                    self._discard_partial_partition(data_type, company_code, year, period_code, partition,
+                                                    staged=refresh)
+                elif refresh and original_count:
+                    if self._is_unchanged(data_type, company_code, partition, fingerprint):
+                        self._discard_partial_partition(data_type, company_code, year, period_code, partition,
+                                                        staged=True)
+                        return self._unchanged_result(data_type, fingerprint, start_time)
+                    saved = self._promote_staged_partition(data_type, company_code, year, period_code, partition)
+            else:
+                if prefetched_data is not None:
+                    raw_data = prefetched_data
+                else:
+                    raw_data = self._fetch_api_data(data_type, company_code, refresh=refresh, **kwargs)
+                original_count = len(raw_data or [])
+                if original_count:
+                    self.logger.info(f"从API获取到 {original_count} 条原始数据")
+                    # 指纹需在 _save_raw_data 补充元数据之前计算
+                    fingerprint.update(raw_data)
+                    if refresh and self._is_unchanged(data_type, company_code, partition, fingerprint):
+                        return self._unchanged_result(data_type, fingerprint, start_time)
+                    # 2. 存储原始数据到数据库 (加入 year / period_code 元数据)
+                    saved = self._save_raw_data(raw_data, data_type, company_code, year=year,
+                                                period_code=period_code, status=status)
+                    if refresh:
+                        if saved:
+                            saved = self._promote_staged_partition(data_type, company_code, year, period_code,
+                                                                   partition)
+                        else:
+                            self._discard_partial_partition(data_type, company_code, year, period_code, partition,
+                                                            staged=True)
+
+            if not original_count:
                 return ProcessingResult(
-                    success=True,
+                    success=False,
                     data_type=data_type,
                     original_count=0,
                     cleaned_count=0,
                     saved_count=0,
                     processing_time=0,
-                    error_message="数据已存在，已跳过"
+                    error_message="API返回空数据",
+                    retryable=False
                 )
-
-            # 1. 通过API获取原始数据
-            raw_data = self._fetch_api_data(data_type, company_code, **kwargs)
-            if not raw_data:
+            if not saved:
                 return ProcessingResult(
                     success=False,
                     data_type=data_type,
-                    original_count=0,
+                    original_count=original_count,
                     cleaned_count=0,
                     saved_count=0,
-                    processing_time=0,
-                    error_message="API返回空数据"
+                    processing_time=(datetime.now() - start_time).total_seconds(),
+                    error_message="保存原始数据失败"
                 )
-
-            original_count = len(raw_data)
-            self.logger.info(f"从API获取到 {original_count} 条原始数据")
-
-            # 2. 存储原始数据到数据库 (加入 year / period_code 元数据)
-            self._save_raw_data(raw_data, data_type, company_code, year=year, period_code=period_code)
             self.logger.info(f"原始数据已保存到数据库")
+            if self.fingerprint_store is not None:
+                self.fingerprint_store.record(data_type, company_code, partition, fingerprint)
 
             # 注意：已移除数据清洗逻辑，只保存原始数据
             saved_count = original_count
@@ -178,6 +336,67 @@ class DataProcessor:
                 error_message=error_msg
             )
 
+    def process_period_bundle(self, company_code: str, period_code: str, year: str = None,
+                              data_types: List[str] = None, refresh: bool = False) -> ProcessingResult:
+        """
+        组合任务：依次处理同一公司、同一期间的多个期间数据类型
+
+        各数据类型先通过异步客户端并发获取，再在当前线程固定的一个数据库连接上依次保存，
+        省去逐类型任务的调度、判重与取还连接开销。并发获取失败的类型在保存时单独重新获取；
+        流式类型不参与并发获取，在保存时边下载边按块保存；非重新检查模式下已存在的类型先行判重跳过，不再获取。
+
+        Args:
+            company_code: 公司代码
+            period_code: 期间代码
+            year: 年份，默认取期间代码的年份部分
+            data_types: 需要处理的数据类型，默认全部期间数据类型
+            refresh: 重新检查模式，见 process_data
+
+        Returns:
+            ProcessingResult: 汇总结果，data_type 为 period_bundle
+        """
+        start_time = datetime.now()
+        year = year or period_code.split('-')[0]
+        data_types = data_types or PERIOD_BUNDLE_DATA_TYPES
+        results = []
+
+        with self.db_manager.pinned_connection():
+            # 非重新检查模式下已存在的类型直接跳过，不参与并发获取
+            existing = set() if refresh else {
+                data_type for data_type in data_types
+                if self.db_manager.check_traditional_data_exists(data_type, company_code, year, period_code)}
+
+        to_fetch = [(data_type, company_code, period_code) for data_type in data_types
+                    if data_type not in existing and data_type not in self.streaming_data_types]
+        fetched = {result.data_type: result
+                   for result in self.async_api_client.fetch_all(to_fetch)} if to_fetch else {}
+
+        with self.db_manager.pinned_connection():
+            for data_type in data_types:
+                if data_type in existing:
+                    results.append(self._existing_result(data_type, company_code, year, period_code))
+                    continue
+                fetch_result = fetched.get(data_type)
+                prefetched = fetch_result.data if fetch_result and fetch_result.success else None
+                results.append(self.process_data(data_type, company_code, prefetched_data=prefetched,
+                                                 refresh=refresh, year=year, period_code=period_code))
+
+        failed = [result for result in results if not result.success]
+        if failed:
+            self.logger.warning(f"期间组合任务部分失败 - 公司: {company_code}, 期间: {period_code}, "
+                                f"失败类型: {[result.data_type for result in failed]}")
+
+        return ProcessingResult(
+            success=not failed,
+            data_type='period_bundle',
+            original_count=sum(result.original_count for result in results),
+            cleaned_count=0,
+            saved_count=sum(result.saved_count for result in results),
+            processing_time=(datetime.now() - start_time).total_seconds(),
+            error_message="; ".join(f"{result.data_type}: {result.error_message}" for result in failed) or None,
+            retryable=any(result.retryable for result in failed)
+        )
+
     def _fetch_api_data(self, data_type: str, company_code: str, **kwargs) -> List[Dict[str, Any]]:
         """从API获取数据"""
         if data_type not in self.api_methods:
@@ -185,14 +404,15 @@ class DataProcessor:
 
         api_method = self.api_methods[data_type]
 
-        # 根据不同的API构建参数
+        # 根据不同的API构建参数；重新检查模式下字典类接口跳过响应缓存，否则指纹总与缓存的旧数据一致
+        refresh = kwargs.get('refresh', False)
         if data_type in ['account_structure', 'subject_dimension']:
             # 需要年份参数
             year = kwargs.get('year', str(datetime.now().year))
-            return api_method(year, company_code)
+            return api_method(year, company_code, refresh=refresh)
         elif data_type == 'customer_vendor':
             # 只需要公司代码
-            return api_method(company_code)
+            return api_method(company_code, refresh=refresh)
         elif data_type in ['voucher_list', 'voucher_detail', 'voucher_dim_detail', 'balance', 'aux_balance']:
             # 需要期间参数
             period_code = kwargs.get('period_code', f"{datetime.now().year}01")
@@ -200,9 +420,103 @@ class DataProcessor:
         else:
             return api_method(company_code)
 
+    def _stream_raw_data(self, data_type: str, company_code: str, year: str = None, period_code: str = None,
+                         fingerprint: PayloadFingerprint = None, status: str = 'raw') -> Tuple[int, bool]:
+        """
+        流式获取期间数据并逐块保存，同时累加数据指纹；返回 (记录总数, 是否全部保存成功)
+
+        任一块保存失败时立即停止：关闭响应、不再下载和写入剩余数据，由调用方删除残缺分区
+        """
+        total = 0
+        with closing(self.api_client.iter_period_data_chunks(data_type, company_code, period_code)) as chunks:
+            for chunk in chunks:
+                if fingerprint is not None:
+                    fingerprint.update(chunk)
+                if not self._save_raw_data(chunk, data_type, company_code, year=year, period_code=period_code,
+                                           status=status):
+                    self.logger.error(f"{data_type} 数据块保存失败，停止流式获取（已处理 {total} 条）")
+                    return total + len(chunk), False
+                total += len(chunk)
+                self.logger.info(f"已流式保存 {data_type} 数据 {total} 条")
+        return total, True
+
+    @staticmethod
+    def _fingerprint_partition(data_type: str, year: str = None, period_code: str = None) -> str:
+        """数据指纹的分区键，与 check_traditional_data_exists 的判重粒度一致"""
+        if data_type in PERIOD_BUNDLE_DATA_TYPES:
+            return period_code or ''
+        if data_type in ('account_structure', 'subject_dimension'):
+            return year or ''
+        return ''
+
+    def _is_unchanged(self, data_type: str, company_code: str, partition: str,
+                      fingerprint: PayloadFingerprint) -> bool:
+        if self.fingerprint_store is None:
+            return False
+        return self.fingerprint_store.matches(data_type, company_code, partition, fingerprint)
+
+    def _existing_result(self, data_type: str, company_code: str, year: str = None,
+                         period_code: str = None) -> ProcessingResult:
+        self.logger.info(
+            f"数据已存在，跳过处理 - 数据类型: {data_type}, 公司: {company_code}, 年份: {year}, 期间: {period_code}")
+        return ProcessingResult(
+            success=True,
+            data_type=data_type,
+            original_count=0,
+            cleaned_count=0,
+            saved_count=0,
+            processing_time=0,
+            error_message="数据已存在，已跳过"
+        )
+
+    def _unchanged_result(self, data_type: str, fingerprint: PayloadFingerprint, start_time: datetime) -> ProcessingResult:
+        self.logger.info(f"{data_type} 数据未变化（{fingerprint.count} 条），跳过写入")
+        return ProcessingResult(
+            success=True,
+            data_type=data_type,
+            original_count=fingerprint.count,
+            cleaned_count=0,
+            saved_count=0,
+            processing_time=(datetime.now() - start_time).total_seconds(),
+            error_message="数据未变化，已跳过"
+        )
+
+    def _promote_staged_partition(self, data_type: str, company_code: str, year: str, period_code: str,
+                                  partition: str) -> bool:
+        """数据变化时用暂存行整体替换旧分区；替换失败时删除暂存行，旧数据与旧指纹保持不变"""
+        deleted = self.db_manager.promote_staged_traditional_data(data_type, company_code, year, period_code,
+                                                                  staged_status=STAGED_STATUS)
+        if deleted is None:
+            self.logger.error(f"替换 {data_type} 分区数据失败 - 公司: {company_code}, 分区: {partition}")
+            self._discard_partial_partition(data_type, company_code, year, period_code, partition, staged=True)
+            return False
+        if deleted:
+            self.logger.info(f"{data_type} 数据已变化，替换旧分区数据 {deleted} 行 - 公司: {company_code}, 分区: {partition}")
+        return True
+
+    def _discard_partial_partition(self, data_type: str, company_code: str, year: str, period_code: str,
+                                   partition: str, staged: bool = False) -> None:
+        """
+        保存中途失败时删除已写入的部分数据，避免残缺分区被判重为已存在
+
+        staged 为 True（重新检查模式）时只删除暂存行，分区原有数据与指纹保持不变
+        """
+        if staged:
+            deleted = self.db_manager.delete_traditional_data(data_type, company_code, year, period_code,
+                                                              processing_status=STAGED_STATUS)
+        else:
+            if self.fingerprint_store is not None:
+                self.fingerprint_store.remove(data_type, company_code, partition)
+            deleted = self.db_manager.delete_traditional_data(data_type, company_code, year, period_code)
+        if deleted is None:
+            self.logger.error(f"删除 {data_type} 残缺分区数据失败 - 公司: {company_code}, 分区: {partition}")
+        else:
+            self.logger.warning(f"{data_type} 已删除{'暂存' if staged else '残缺分区'}数据 {deleted} 行 - "
+                                f"公司: {company_code}, 分区: {partition}")
+
     def _save_raw_data(self, data: List[Dict[str, Any]], data_type: str, company_code: str, year: str = None,
-                       period_code: str = None):
-        """保存原始数据到数据库，并附加判重所需元数据(year / period_code)"""
+                       period_code: str = None, status: str = 'raw') -> bool:
+        """保存原始数据到数据库，并附加判重所需元数据(year / period_code)；返回是否保存成功"""
         table_name = f"raw_{data_type}"
 
         for record in data:
@@ -214,18 +528,18 @@ class DataProcessor:
                 record['year'] = year
             record['created_at'] = datetime.now().isoformat()
             record['data_source'] = 'api'
-            record['processing_status'] = 'raw'
+            record['processing_status'] = status
 
-        self._save_to_database(data, table_name)
+        return self._save_to_database(data, table_name)
 
-    def _save_to_database(self, data: List[Dict[str, Any]], table_name: str):
+    def _save_to_database(self, data: List[Dict[str, Any]], table_name: str) -> bool:
         """
-        保存数据到数据库，增强的错误处理和重试机制
+        保存数据到数据库，增强的错误处理和重试机制；返回是否保存成功
         """
         try:
             if not data:
                 self.logger.warning(f"数据列表为空，跳过保存到表 {table_name}")
-                return
+                return True
 
             # 使用增强的自动创建表并保存数据的方法
             max_retries = 3
@@ -239,7 +553,7 @@ class DataProcessor:
 
                     if success:
                         self.logger.info(f"成功自动创建表并保存 {len(data)} 条数据到表 {table_name}")
-                        return
+                        return True
                     else:
                         if attempt == max_retries - 1:
                             raise Exception(f"自动创建表并保存数据到表 {table_name} 失败")
@@ -258,6 +572,49 @@ class DataProcessor:
             self.logger.error(f"保存数据到表 {table_name} 时发生错误: {str(e)}")
             # 不再抛出异常，而是记录错误并返回，避免整个任务失败
             self.logger.warning(f"数据保存失败，但任务将继续执行后续步骤")
+            return False
+
+    def register_task_handlers(self, system_manager: SystemManager) -> None:
+        """向系统管理器注册可持久化的任务处理器"""
+        system_manager.register_handler('process_data', self.process_data)
+        system_manager.register_handler('process_period_bundle', self.process_period_bundle)
+        system_manager.register_handler('process_financial_reports', self.process_financial_reports)
+
+    @staticmethod
+    def build_task_name(task_config: Dict[str, Any]) -> str:
+        """
+        传统数据任务名：process_{数据类型}_{公司}_{期间或年份}，期间组合任务为 process_period_bundle_{公司}_{期间}；
+        重新检查模式（refresh）的任务以 refresh_ 开头，与首次获取任务互不冲突
+        """
+        suffix = task_config.get('period_code') or task_config.get('year') or 'all'
+        prefix = 'refresh' if task_config.get('refresh') else 'process'
+        return f"{prefix}_{task_config['data_type']}_{task_config['company_code']}_{suffix}"
+
+    def build_processing_task_spec(self, task_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        将传统数据任务配置转换为 SystemManager.add_task 的关键字参数
+
+        data_type 为 period_bundle 时生成期间组合任务；depends_on 为前置任务名列表。
+        """
+        if task_config['data_type'] == 'period_bundle':
+            handler = 'process_period_bundle'
+            args = (task_config['company_code'],)
+        else:
+            handler = 'process_data'
+            args = (task_config['data_type'], task_config['company_code'])
+
+        return {
+            'name': self.build_task_name(task_config),
+            'handler': handler,
+            'args': args,
+            # 提取其他参数
+            'kwargs': {k: v for k, v in task_config.items()
+                       if k not in ['data_type', 'company_code', 'priority', 'depends_on']},
+            'priority': task_config.get('priority', 0),
+            'max_retries': 3,
+            'resources': ('finance_api', 'db_write'),
+            'depends_on': tuple(task_config.get('depends_on') or ())
+        }
 
     def add_processing_tasks_to_system(self, system_manager: SystemManager,
                                        tasks_config: List[Dict[str, Any]]) -> bool:
@@ -272,26 +629,20 @@ class DataProcessor:
             bool: 是否成功添加所有任务
         """
         try:
-            for i, task_config in enumerate(tasks_config):
-                data_type = task_config['data_type']
-                company_code = task_config['company_code']
-                task_name = f"process_{data_type}_{company_code}_{i}"
-
-                # 提取其他参数
-                kwargs = {k: v for k, v in task_config.items()
-                          if k not in ['data_type', 'company_code', 'priority']}
-
-                priority = task_config.get('priority', 0)
+            self.register_task_handlers(system_manager)
+            skipped = 0
+            for task_config in tasks_config:
+                # 任务名由数据类型、公司与期间/年份确定，重启后与持久化队列中的记录一致
+                spec = self.build_processing_task_spec(task_config)
+                task_name = spec['name']
+
+                if system_manager.has_task(task_name):
+                    skipped += 1
+                    self.logger.debug(f"任务 {task_name} 已存在或已完成，跳过")
+                    continue
 
                 # 添加任务到系统管理器
-                success = system_manager.add_task(
-                    name=task_name,
-                    func=self.process_data,
-                    args=(data_type, company_code),
-                    kwargs=kwargs,
-                    priority=priority,
-                    max_retries=3
-                )
+                success = system_manager.add_task(**spec)
 
                 if success:
                     self.logger.debug(f"任务 {task_name} 已添加到队列")
@@ -299,12 +650,38 @@ class DataProcessor:
                     self.logger.error(f"添加任务 {task_name} 失败")
                     return False
 
+            if skipped:
+                self.logger.info(f"跳过 {skipped} 个已存在或已完成的任务")
             return True
 
         except Exception as e:
             self.logger.error(f"添加处理任务到系统管理器时发生错误: {str(e)}")
             return False
 
+    def add_processing_task_source(self, system_manager: SystemManager, source_name: str,
+                                   tasks_config: Iterable[Dict[str, Any]], max_pending: int = None) -> bool:
+        """
+        以惰性任务源的方式添加数据处理任务
+
+        tasks_config 可以是生成器，任务只在系统有空闲容量时才被创建，适用于全量回补等大批量场景。
+
+        Args:
+            system_manager: 系统管理器实例
+            source_name: 任务源名称
+            tasks_config: 任务配置的可迭代对象
+            max_pending: 该任务源同时存在的未完成任务上限
+
+        Returns:
+            bool: 是否成功添加任务源
+        """
+        try:
+            self.register_task_handlers(system_manager)
+            specs = (self.build_processing_task_spec(task_config) for task_config in tasks_config)
+            return system_manager.add_task_source(source_name, specs, max_pending=max_pending)
+        except Exception as e:
+            self.logger.error(f"添加任务源 {source_name} 时发生错误: {str(e)}")
+            return False
+
     def get_processing_statistics(self) -> Dict[str, Any]:
         """获取数据处理统计信息"""
         return {
@@ -313,7 +690,8 @@ class DataProcessor:
                 'api_client': str(type(self.api_client).__name__),
                 'db_manager': str(type(self.db_manager).__name__),
                 'auto_report_api': str(type(self.auto_report_api).__name__) if self.auto_report_api else None
-            }
+            },
+            'db_pool': self.db_manager.get_pool_status() if hasattr(self.db_manager, 'get_pool_status') else None
         }
 
     def get_quarterly_monthly_tasks(self) -> List[Dict[str, Any]]:
@@ -396,6 +774,10 @@ class DataProcessor:
                 self.logger.error(f"保存数据时发生错误 (类型: {data_type}): {e}")
                 raise
 
+        # 判重使用与当前存储模式一致的表
+        existing_table = 'raw_financial_reports_json' if self.financial_report_storage_mode == 'json' \
+            else 'raw_financial_reports'
+
         try:
             self.logger.info(f"开始处理财务报表数据，任务信息: {task_info}")
 
@@ -407,13 +789,15 @@ class DataProcessor:
                     task_name_filter=None,
                     filter_quarterly_monthly=False,
                     tasks_list=[task_info],
-                    save_callback=save_data_callback
+                    save_callback=save_data_callback,
+                    existing_table=existing_table
                 )
             else:
                 self.logger.info("未提供具体任务信息，将重新获取任务列表")
                 report_result = self.auto_report_api.get_all_data_by_task(
                     task_info,
-                    save_callback=save_data_callback
+                    save_callback=save_data_callback,
+                    existing_table=existing_table
                 )
 
             if not report_result:
@@ -656,6 +1040,11 @@ class DataProcessor:
         try:
             if hasattr(self.api_client, 'close'):
                 self.api_client.close()
+            self.async_api_client.close()
+            if self.response_cache is not None:
+                self.response_cache.close()
+            if self.fingerprint_store is not None:
+                self.fingerprint_store.close()
             if hasattr(self.db_manager, 'close_engine'):
                 self.db_manager.close_engine()
             self.logger.info("数据处理器已关闭")
@@ -689,7 +1078,7 @@ class DataProcessor:
         return flattened
 
     def add_financial_report_task_to_system(self, system_manager: SystemManager, task_info: Dict[str, Any] = None,
-                                            priority: int = 0) -> bool:
+                                            priority: int = 0) -> Optional[TaskHandle]:
         """
         将财务报表处理任务添加到系统管理器
 
@@ -699,98 +1088,45 @@ class DataProcessor:
             priority: 任务优先级
 
         Returns:
-            bool: 是否成功添加任务
+            Optional[TaskHandle]: 添加成功时返回任务句柄，可等待结果；未添加时返回 None
         """
         try:
             task_name = task_info.get("taskName", "unknown_task") if task_info else "all_tasks"
             formatted_task_name = f"process_financial_reports_{task_name}"
 
-            success = system_manager.add_task(
+            self.register_task_handlers(system_manager)
+            handle = system_manager.add_task(
                 name=formatted_task_name,
-                func=self.process_financial_reports,
+                handler='process_financial_reports',
                 args=(task_info,),
                 kwargs={},
                 priority=priority,
-                max_retries=3
+                max_retries=3,
+                resources=('browser', 'report_api')
             )
 
-            if success:
+            if handle:
                 self.logger.info(f"财务报表处理任务 {formatted_task_name} 已添加到队列")
             else:
                 self.logger.error(f"添加财务报表处理任务 {formatted_task_name} 失败")
 
-            return success
+            return handle or None
 
         except Exception as e:
             self.logger.error(f"添加财务报表处理任务到系统管理器时发生错误: {str(e)}")
-            return False
+            return None
 
     def _process_financial_report_unit_json(self, unit_data: Dict[str, Any]) -> (
             List[Dict[str, Any]], List[Dict[str, Any]]):
         """将单个单位的报表数据以 JSON 形式存储。
         只保存主要字段（报表ID、名称、代码等），其余数据存储在raw_data字段中。
-        返回 (raw_records, cleaned_records) 列表，每个报表一条记录。"""
+        返回 (raw_records, cleaned_records) 列表，每个报表一条记录。
+        报表矩阵较大时在进程池中序列化，避免占用 GIL。"""
         try:
-            period_name = unit_data.get('period_name', '')
-            period_detail_id = unit_data.get('period_detail_id', '')
-            company_id = unit_data.get('company_id', '')
-            parent_id = unit_data.get('parent_id', '')
-            reports = unit_data.get('reports', []) or []
             report_data_matrix = unit_data.get('report_data', []) or []
-
-            raw_records = []
-
-            # 为每个报表创建一条记录
-            for report in reports:
-                # 提取主要字段
-                report_id = report.get('reportId', '')
-                report_name = report.get('reportName', '')
-                report_code = report.get('reportCode', '')
-
-                # 将报表的完整信息和报表数据矩阵存储在raw_data字段中
-                raw_data_dict = {
-                    'report_info': report,  # 完整的报表信息
-                    'report_data': report_data_matrix  # 报表数据矩阵
-                }
-                raw_data_json = json.dumps(raw_data_dict, ensure_ascii=False)
-
-                record = {
-                    'report_id': report_id,
-                    'report_name': report_name,
-                    'report_code': report_code,
-                    'company_id': company_id,
-                    'parent_id': parent_id,
-                    'period_name': period_name,
-                    'period_detail_id': period_detail_id,
-                    'raw_data': raw_data_json,  # 其余数据存储在raw_data字段中
-                    'data_source': 'financial_report_api',
-                    'processing_status': 'raw',
-                    'created_at': datetime.now().isoformat()
-                }
-                raw_records.append(record)
-
-            # 如果没，有报表信息，但存在报表数据仍然保存一条记录
-            if not reports and report_data_matrix:
-                raw_data_dict = {
-                    'report_data': report_data_matrix
-                }
-                raw_data_json = json.dumps(raw_data_dict, ensure_ascii=False)
-
-                record = {
-                    'report_id': '',
-                    'report_name': '',
-                    'report_code': '',
-                    'company_id': company_id,
-                    'parent_id': parent_id,
-                    'period_name': period_name,
-                    'period_detail_id': period_detail_id,
-                    'raw_data': raw_data_json,
-                    'data_source': 'financial_report_api',
-                    'processing_status': 'raw',
-                    'created_at': datetime.now().isoformat()
-                }
-                raw_records.append(record)
-
+            cell_count = sum(len(row) for row in report_data_matrix if isinstance(row, (list, tuple)))
+            raw_records = run_cpu_bound(build_financial_report_json_records, unit_data,
+                                        size=cell_count * max(1, len(unit_data.get('reports', []) or [])))
             return raw_records, []
         except Exception as e:
             self.logger.error(f"JSON 方式处理单元报表数据失败: {e}")
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_HASH_MODULUS = 1 << 128
+
+
+class PayloadFingerprint:
+    """
+    接口返回数据的内容指纹：各条记录规范化 JSON 的 128 位哈希之和（取模）与记录数
+
+    求和与记录顺序无关，接口对同一数据返回不同顺序时指纹不变；支持按块累加，用于流式获取。
+    需在 _save_raw_data 补充 company_code、created_at 等元数据之前计算。
+    """
+
+    __slots__ = ('total', 'count')
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def update(self, records: Iterable[Dict[str, Any]]) -> 'PayloadFingerprint':
+        total = self.total
+        for record in records:
+            encoded = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'),
+                                 default=str).encode('utf-8')
+            total += int.from_bytes(hashlib.blake2b(encoded, digest_size=16).digest(), 'big')
+            self.count += 1
+        self.total = total % _HASH_MODULUS
+        return self
+
+    def hexdigest(self) -> str:
+        return f"{self.total:032x}"
+
+    @classmethod
+    def of(cls, records: Iterable[Dict[str, Any]]) -> 'PayloadFingerprint':
+        return cls().update(records)
+
+
+class SQLiteFingerprintStore:
+    """
+    传统数据分区指纹存储（SQLite）
+
+    以 (数据类型, 公司代码, 期间或年份) 为分区键，记录最近一次成功入库的数据指纹与记录数。
+    重新获取的数据指纹一致时可跳过全部数据库写入；不一致时由调用方替换整个分区后再更新指纹。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                data_type TEXT NOT NULL,
+                company_code TEXT NOT NULL,
+                partition TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (data_type, company_code, partition)
+            )
+        """)
+        logger.info(f"数据指纹存储已打开: {db_path}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def get(self, data_type: str, company_code: str, partition: str) -> Optional[Tuple[str, int]]:
+        """返回 (指纹, 记录数)，没有记录时返回 None"""
+        row = self._execute(
+            "SELECT digest, row_count FROM fingerprints WHERE data_type = ? AND company_code = ? AND partition = ?",
+            (data_type, company_code, partition or '')).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def matches(self, data_type: str, company_code: str, partition: str, fingerprint: PayloadFingerprint) -> bool:
+        return self.get(data_type, company_code, partition) == (fingerprint.hexdigest(), fingerprint.count)
+
+    def record(self, data_type: str, company_code: str, partition: str, fingerprint: PayloadFingerprint) -> None:
+        self._execute("""
+            INSERT OR REPLACE INTO fingerprints (data_type, company_code, partition, digest, row_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (data_type, company_code, partition or '', fingerprint.hexdigest(), fingerprint.count, time.time()))
+
+    def remove(self, data_type: str, company_code: str, partition: str) -> None:
+        self._execute("DELETE FROM fingerprints WHERE data_type = ? AND company_code = ? AND partition = ?",
+                      (data_type, company_code, partition or ''))
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.warning(f"关闭数据指纹存储失败: {e}")
+
+
+def create_fingerprint_store(db_path: Optional[str]) -> Optional[SQLiteFingerprintStore]:
+    """按配置创建数据指纹存储，路径为空时不启用变化检测"""
+    if not db_path:
+        return None
+    try:
+        return SQLiteFingerprintStore(db_path)
+    except Exception as e:
+        logger.error(f"打开数据指纹存储 {db_path} 失败，不启用变化检测: {e}")
+        return None
@@ -1,6 +1,7 @@
 import logging
 import time
 from datetime import datetime, timedelta
+from queue import Empty
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +19,9 @@ class MonitorService:
         self.check_interval_minutes = config_manager.get('monitor.check_interval_minutes', 30)
         self.monitor_interval_seconds = config_manager.get('monitor.monitor_interval_seconds', 30)
 
+        # 订阅任务状态变化事件：失败与队列清空在发生时立即处理，不等下一个监控周期
+        self.events = system_manager.subscribe()
+
         logger.info(f"⚙️ 定时检测配置: 每 {self.check_interval_minutes} 分钟检查新数据，"
                     f"每 {self.monitor_interval_seconds} 秒监控系统状态")
 
@@ -51,13 +55,44 @@ class MonitorService:
                 # 显示下次检测倒计时
                 self._show_countdown(monitor_count, current_time, next_check_time)
 
-                # 等待下次监控
-                time.sleep(self.monitor_interval_seconds)
+                # 等待下次监控，期间处理任务状态变化事件
+                self._wait_for_events(self.monitor_interval_seconds)
 
         except KeyboardInterrupt:
             logger.info("接收到中断信号，正在关闭系统...")
             raise
 
+    def _wait_for_events(self, timeout: float):
+        """在 timeout 秒内处理任务状态变化事件：任务失败立即告警，所有任务结束时立即汇报"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event = self.events.get(timeout=remaining)
+            except Empty:
+                return
+
+            if event.status == "failed":
+                logger.warning(f"❌ 任务失败: {event.name}")
+            elif event.status in ("completed", "cancelled"):
+                logger.debug(f"任务结束: {event.name} ({event.status})")
+            else:
+                continue
+
+            if self.events.empty() and self._all_tasks_finished(self.system_manager.get_system_status()):
+                tasks = self.system_manager.get_system_status()["tasks"]
+                logger.info(f"💤 所有任务处理完成: 成功 {tasks['completed']} 个, 失败 {tasks['failed']} 个")
+
+    @staticmethod
+    def _all_tasks_finished(system_status) -> bool:
+        return (
+                system_status["tasks"]["pending"] == 0 and
+                system_status["tasks"]["running"] == 0 and
+                system_status["tasks"]["retry"] == 0
+        )
+
     def _monitor_system_status(self, monitor_count: int):
         """监控系统状态"""
         system_status = self.system_manager.get_system_status()
@@ -96,11 +131,7 @@ class MonitorService:
         """处理已完成的任务"""
         system_status = self.system_manager.get_system_status()
 
-        all_tasks_completed = (
-                system_status["tasks"]["pending"] == 0 and
-                system_status["tasks"]["running"] == 0 and
-                system_status["tasks"]["retry"] == 0
-        )
+        all_tasks_completed = self._all_tasks_finished(system_status)
 
         if all_tasks_completed:
             completed_tasks = system_status["tasks"]["completed"]
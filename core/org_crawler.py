@@ -3,6 +3,7 @@ import time
 from typing import Dict, Optional
 
 from api.api_client import UnifiedLoginClient, OrgAPIClient
+from database.batch_writer import BufferedTableWriter, FlushResult
 from database.database_manager import DataBaseManager
 
 # 配置日志
@@ -29,6 +30,10 @@ class OrgCrawler:
         self.employees = []  # 存储所有人员信息
         self.visited_depts = set()  # 避免重复访问
         self.db_manager = DataBaseManager()  # 数据库管理器
+        # 人员数据先进入写缓冲，按批次合并写入数据库
+        self.writer = BufferedTableWriter(self.db_manager, on_flush=self._on_employees_flushed)
+        self.saved_employees = 0
+        self.failed_employees = 0
 
         # 使用统一的登录客户端和API客户端
         self.login_client = UnifiedLoginClient(base_url, login_key, password)
@@ -281,19 +286,9 @@ class OrgCrawler:
                     self.employees.append(employee)
                     logger.info(f"{indent}  - 人员: {employee['name']} ({employee['code']})")
                     
-                    # 立即保存到数据库
-                    try:
-                        success = self.db_manager.auto_create_and_save_data(
-                            [employee],  # 将单条数据包装成列表
-                            "raw_organize",
-                            if_exists='append'
-                        )
-                        if success:
-                            logger.debug(f"{indent}    ✓ 已保存到数据库")
-                        else:
-                            logger.warning(f"{indent}    ✗ 保存到数据库失败")
-                    except Exception as e:
-                        logger.error(f"{indent}    保存人员数据时发生错误: {e}")
+                    # 加入写缓冲，达到批次阈值后批量保存到数据库
+                    if not self.writer.add("raw_organize", employee):
+                        logger.warning(f"{indent}    ✗ 写缓冲已关闭，人员数据未保存")
 
             # 检查是否还有下一页
             total_pages = page_info.get("totalPage", 1)
@@ -303,6 +298,14 @@ class OrgCrawler:
             page += 1
             time.sleep(0.5)  # 添加延迟
 
+    def _on_employees_flushed(self, result: FlushResult):
+        """写缓冲每次批量写入后的回调，用于统计保存结果"""
+        # 放回缓冲区等待重试的记录在之后的写入中再统计
+        self.saved_employees += result.written_count
+        self.failed_employees += result.failed_count
+        if result.failed_count:
+            logger.warning(f"✗ {result.failed_count} 条人员数据保存到数据库失败: {result.error or '写入返回失败'}")
+
     def run(self, start_dept_id: str = "0"):
         """运行爬取任务"""
         logger.info("开始爬取组织架构和人员信息...")
@@ -334,9 +337,11 @@ class OrgCrawler:
                 logger.warning("未找到上海铁路部门，从根部门开始爬取")
                 self.crawl_departments_recursive(start_dept_id)
 
-            # 注意：数据已在获取时逐条保存，此处仅用于统计
+            # 写出缓冲中剩余的人员数据
+            self.writer.flush(reason='finish')
             if self.employees:
-                logger.info(f"爬取完成，共获取 {len(self.employees)} 条员工数据（已逐条保存到数据库）")
+                logger.info(f"爬取完成，共获取 {len(self.employees)} 条员工数据，"
+                            f"已保存 {self.saved_employees} 条，失败 {self.failed_employees} 条")
             else:
                 logger.warning("没有员工数据需要写入数据库")
 
@@ -353,6 +358,8 @@ class OrgCrawler:
         except Exception as e:
             logger.error(f"爬取过程中发生错误: {e}")
             raise
+        finally:
+            self.writer.close()
 
 
 def main():
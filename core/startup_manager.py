@@ -1,10 +1,14 @@
 import logging
 import sys
+from pathlib import Path
 
+from api.response_cache import create_response_cache
 from common.config import ConfigManager
 from core.data_processor import DataProcessor
 from core.system_manager import SystemManager
 from core.task_manager import TaskManager
+from core.fingerprint_store import create_fingerprint_store
+from core.task_store import create_task_store
 from core.monitor_service import MonitorService
 from database.database_manager import DataBaseManager
 
@@ -34,8 +38,18 @@ class StartupManager:
 
             self.config_manager = ConfigManager()
 
-            self.system_manager = SystemManager(max_workers=5, health_check_interval=60)
+            # 持久化任务队列，重启后重放未完成的任务；路径为空时仅使用内存队列
+            task_store = create_task_store(self.config_manager.get(
+                'system.task_store_path', str(Path(__file__).parent.parent / "data" / "task_store.db")))
+            self.system_manager = SystemManager(
+                max_workers=5,
+                health_check_interval=60,
+                task_store=task_store,
+                completed_retention_hours=self.config_manager.get('system.completed_retention_hours', 24)
+            )
             self.db_manager = DataBaseManager()
+            # 预热表结构元数据缓存，后续判重与写入不再逐表查询字典视图
+            self.db_manager.refresh_metadata_cache()
 
             api_config = {
                 'base_url': self.config_manager.get('api.base_url', 'http://10.134.188.79:8080'),
@@ -48,9 +62,26 @@ class StartupManager:
                 'password': self.config_manager.get('financial_api.password', 'Qaz.123456789.')
             }
 
-            self.data_processor = DataProcessor(api_config, self.db_manager, auto_report_config)
+            # 科目结构、科目维度关系、客商字典的响应缓存；路径为空时不缓存
+            response_cache = create_response_cache(
+                self.config_manager.get('api.response_cache_path',
+                                        str(Path(__file__).parent.parent / "data" / "response_cache.db")),
+                ttl_seconds=self.config_manager.get('api.response_cache_ttl_seconds', 24 * 3600),
+                memory_size=self.config_manager.get('api.response_cache_memory_size', 32),
+                max_disk_bytes=self.config_manager.get('api.response_cache_max_bytes', 256 * 1024 * 1024)
+            )
+
+            # 传统数据分区指纹，重新检查已入库期间时跳过未变化的数据；路径为空时不启用
+            fingerprint_store = create_fingerprint_store(self.config_manager.get(
+                'system.fingerprint_store_path', str(Path(__file__).parent.parent / "data" / "fingerprints.db")))
+
+            self.data_processor = DataProcessor(api_config, self.db_manager, auto_report_config,
+                                                response_cache=response_cache,
+                                                fingerprint_store=fingerprint_store)
 
             self.task_manager = TaskManager(self.data_processor, self.system_manager, self.db_manager)
+            # 处理器需在系统启动（重放持久化任务）前注册
+            self.task_manager.register_task_handlers()
 
             self.monitor_service = MonitorService(
                 self.system_manager,
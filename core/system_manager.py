@@ -1,52 +1,178 @@
+import heapq
+import itertools
 import logging
+import random
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed as futures_as_completed
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from enum import Enum
-from queue import PriorityQueue, Empty
-from threading import Lock, Event
-from typing import Dict, Optional, Any, Callable
+from queue import PriorityQueue, Queue, Empty, Full
+from threading import Lock, Event, BoundedSemaphore, Condition
+from collections import deque, OrderedDict
+from dataclasses import fields, is_dataclass
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Dict, Optional, Any, Callable, Iterable, Iterator, List, Tuple
 
 from common.config import ConfigManager
 from common.decorators import log_execution
 
 
-class TaskStatus(Enum):
-    PENDING = "pending"
-    RUNNING = "running"
-    COMPLETED = "completed"
-    FAILED = "failed"
-    RETRY = "retry"
-    CANCELLED = "cancelled"
+class TaskStatus(IntEnum):
+    PENDING = 0
+    RUNNING = 1
+    COMPLETED = 2
+    FAILED = 3
+    RETRY = 4
+    CANCELLED = 5
 
+    @property
+    def label(self) -> str:
+        """对外输出（状态接口、持久化队列）使用的字符串状态"""
+        return self.name.lower()
 
-@dataclass
+
+FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+
+@dataclass(slots=True)
 class TaskResult:
     success: bool
+    # 任务完成后只保留返回值摘要，完整返回值按需保存在有界的 ResultPayloadCache 中
     data: Optional[Any] = None
     error: Optional[str] = None
-    timestamp: datetime = field(default_factory=datetime.now)  # 修正：使用 field(default_factory)
+    timestamp: float = field(default_factory=time.time)
     execution_time: Optional[float] = None
+    # 失败时是否按退避策略重试
+    retryable: bool = True
+
+
+def summarize_result(data: Any, max_items: int = 20) -> Any:
+    """将任务返回值压缩为小的摘要：标量原样保留，数据类/字典只保留标量字段，容器只保留长度"""
+    if data is None or isinstance(data, (bool, int, float)):
+        return data
+    if isinstance(data, str):
+        return data if len(data) <= 200 else data[:200] + "..."
+    if is_dataclass(data) and not isinstance(data, type):
+        items = ((f.name, getattr(data, f.name)) for f in fields(data))
+    elif isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, (list, tuple, set)):
+        return {"type": type(data).__name__, "length": len(data)}
+    else:
+        return {"type": type(data).__name__}
+
+    summary = {}
+    for key, value in items:
+        if len(summary) >= max_items:
+            break
+        if value is None or isinstance(value, (bool, int, float)):
+            summary[str(key)] = value
+        elif isinstance(value, str) and len(value) <= 200:
+            summary[str(key)] = value
+        elif isinstance(value, datetime):
+            summary[str(key)] = value.isoformat()
+    return summary
+
+
+class ResultPayloadCache:
+    """任务完整返回值的有界 LRU 缓存，max_size 为 0 时不保存"""
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def put(self, name: str, data: Any) -> None:
+        if self.max_size <= 0 or data is None:
+            return
+        with self._lock:
+            self._entries[name] = data
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        with self._lock:
+            if name not in self._entries:
+                return default
+            self._entries.move_to_end(name)
+            return self._entries[name]
+
+    def pop(self, name: str) -> None:
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def monotonic_to_datetime(value: Optional[float]) -> Optional[datetime]:
+    """将 time.monotonic() 时间戳换算为当前系统时间下的 datetime"""
+    if value is None:
+        return None
+    return datetime.now() - timedelta(seconds=time.monotonic() - value)
+
+
+# 各类外部资源的默认并发上限，任务通过 resources 标签声明需要占用的资源
+DEFAULT_RESOURCE_LIMITS = {
+    'browser': 1,  # Selenium 浏览器登录
+    'report_api': 4,  # 财务报表服务器
+    'finance_api': 8,  # 财务数据接口
+    'db_write': 6,  # OceanBase 写入
+    'crawler_api': 2,  # 组织架构/资金流水/报账单系统
+}
+
+
+# 任务状态锁按任务名分片共享，避免每个任务各持有一把锁
+TASK_LOCK_STRIPES = 64
+_TASK_LOCKS = tuple(Lock() for _ in range(TASK_LOCK_STRIPES))
+_NO_KWARGS = MappingProxyType({})
+_TASK_IDS = itertools.count()
 
 
 class Task:
+    """
+    紧凑的任务记录：使用 __slots__、整数枚举状态与 time.monotonic() 时间戳，
+    状态锁从分片锁中按任务名选取，无关键字参数的任务共享同一个只读空字典
+    """
+
+    __slots__ = ("name", "func", "handler", "args", "kwargs", "status", "max_retries", "retry_count",
+                 "priority", "resources", "created_at", "last_run", "next_retry", "task_id", "finished",
+                 "finished_at", "depends_on", "waiting_on")
+
     def __init__(self, name: str, func: Callable, args: tuple = (), kwargs: dict = None,
-                 max_retries: int = 3, priority: int = 0):
+                 max_retries: int = 3, priority: int = 0, resources: Iterable[str] = (),
+                 handler: str = None, depends_on: Iterable[str] = ()):
         self.name = name
         self.func = func
-        self.args = args
-        self.kwargs = kwargs or {}
+        # 已注册处理器的名称，持久化队列据此在重启后重建任务
+        self.handler = handler
+        self.args = tuple(args)
+        self.kwargs = kwargs or _NO_KWARGS
         self.status = TaskStatus.PENDING
-        self.result: Optional[TaskResult] = None
         self.max_retries = max_retries
         self.retry_count = 0
         self.priority = priority
-        self.created_at = datetime.now()
-        self.last_run: Optional[datetime] = None
-        self.next_retry: Optional[datetime] = None
-        self.lock = Lock()
-        self.task_id = id(self)  # 添加唯一标识符用于排序
+        # 排序去重后的资源标签，同一组标签的任务共享一个等待队列
+        self.resources: Tuple[str, ...] = tuple(sorted(set(resources or ())))
+        self.created_at = time.monotonic()
+        self.last_run: Optional[float] = None
+        self.next_retry: Optional[float] = None
+        self.task_id = next(_TASK_IDS)  # 添加唯一标识符用于排序
+        # 任务已进入最终状态（完成、重试耗尽或取消），完成通知已发出
+        self.finished = False
+        # 进入最终状态的时间（monotonic），清理已结束任务时据此判断保留期
+        self.finished_at: Optional[float] = None
+        # 前置任务名，以及尚未完成的前置任务数；为 0 时才进入就绪队列
+        self.depends_on: Tuple[str, ...] = tuple(dict.fromkeys(depends_on or ()))
+        self.waiting_on = 0
+
+    @property
+    def lock(self) -> Lock:
+        return _TASK_LOCKS[hash(self.name) % TASK_LOCK_STRIPES]
 
     def __lt__(self, other):
         """用于优先级队列排序 - 修正：添加稳定排序"""
@@ -58,28 +184,360 @@ class Task:
 class PriorityTaskWrapper:
     """包装类用于优先级队列"""
 
+    _sequence = itertools.count()
+
     def __init__(self, task: Task, schedule_time: datetime = None):
         self.task = task
         self.schedule_time = schedule_time or datetime.now()
+        self.sequence = next(self._sequence)
 
     def __lt__(self, other):
-        # 首先按调度时间排序
-        if self.schedule_time != other.schedule_time:
-            return self.schedule_time < other.schedule_time
-        # 然后按任务优先级排序
-        return self.task < other.task
+        # 就绪队列只包含可立即执行的任务：先按优先级，再按入队顺序
+        if self.task.priority != other.task.priority:
+            return self.task.priority > other.task.priority
+        return self.sequence < other.sequence
+
+
+class ResourceLimiter:
+    """按资源标签限制并发：任务只有在其所有标签都有空闲额度时才能一次性全部占用"""
+
+    def __init__(self, limits: Dict[str, int] = None):
+        self.limits = dict(limits or {})
+        self.in_use: Dict[str, int] = {tag: 0 for tag in self.limits}
+        self._lock = Lock()
+
+    def try_acquire(self, tags: Iterable[str]) -> bool:
+        """原子地占用所有标签的额度，任一标签已满则不占用任何额度"""
+        tags = [tag for tag in tags if tag in self.limits]
+        with self._lock:
+            if any(self.in_use[tag] >= self.limits[tag] for tag in tags):
+                return False
+            for tag in tags:
+                self.in_use[tag] += 1
+            return True
+
+    def release(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                if tag in self.limits and self.in_use[tag] > 0:
+                    self.in_use[tag] -= 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {tag: {"limit": self.limits[tag], "in_use": self.in_use[tag]} for tag in self.limits}
+
+
+class DelayedTaskScheduler:
+    """
+    延迟任务调度器：按到期时间维护最小堆，由单个定时线程在任务到期时放入就绪队列
+
+    就绪队列中不再混入未到期的重试任务，调度循环无需轮询等待。
+    """
+
+    def __init__(self, on_due: Callable[[PriorityTaskWrapper], None], name: str = "delayed-task-timer"):
+        self.on_due = on_due
+        self.name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self) -> None:
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def schedule(self, wrapper: PriorityTaskWrapper, delay_seconds: float) -> None:
+        """在 delay_seconds 秒后将任务放入就绪队列"""
+        due = time.monotonic() + max(0.0, delay_seconds)
+        with self._condition:
+            heapq.heappush(self._heap, (due, next(self._sequence), wrapper))
+            # 新任务成为最早到期的任务时唤醒定时线程重新计算等待时间
+            if self._heap[0][2] is wrapper:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._running:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    wait_seconds = self._heap[0][0] - time.monotonic()
+                    if wait_seconds <= 0:
+                        break
+                    self._condition.wait(wait_seconds)
+                if not self._running:
+                    return
+                _, _, wrapper = heapq.heappop(self._heap)
+
+            try:
+                self.on_due(wrapper)
+            except Exception as e:
+                self.logger.error(f"Failed to release delayed task '{wrapper.task.name}': {str(e)}")
+
+    def stop(self) -> list:
+        """停止定时线程，返回尚未到期的任务"""
+        with self._condition:
+            self._running = False
+            pending = [item[2] for item in sorted(self._heap)]
+            self._heap.clear()
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        return pending
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+
+class TaskFailedError(Exception):
+    """任务重试耗尽或因系统关闭而失败，由 TaskHandle.result() 抛出"""
+
+    def __init__(self, name: str, error: Optional[str] = None):
+        super().__init__(f"Task '{name}' failed: {error}")
+        self.name = name
+        self.error = error
+
+
+@dataclass(slots=True)
+class TaskEvent:
+    """任务状态变化事件，previous 为 None 表示任务刚加入系统"""
+    name: str
+    status: str
+    previous: Optional[str]
+    timestamp: float = field(default_factory=time.time)
+
+
+class TaskHandle:
+    """
+    add_task 返回的任务句柄，类似 concurrent.futures.Future
+
+    句柄本身只保存系统管理器与任务名；调用 result()/add_done_callback() 时才按需创建完成通知，
+    因此不等待结果的任务不额外占用内存。句柄恒为真值，兼容原先判断 add_task 返回值的写法。
+    """
+
+    __slots__ = ("manager", "name")
+
+    def __init__(self, manager: "SystemManager", name: str):
+        self.manager = manager
+        self.name = name
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __repr__(self) -> str:
+        return f"TaskHandle({self.name!r}, status={self.status!r})"
+
+    @property
+    def future(self) -> Future:
+        return self.manager._completion_future(self.name)
+
+    @property
+    def status(self) -> Optional[str]:
+        task = self.manager.tasks.get(self.name)
+        return task.status.label if task else None
+
+    def result(self, timeout: float = None) -> Any:
+        """等待任务结束并返回其返回值；失败时抛出 TaskFailedError，取消时抛出 CancelledError"""
+        return self.future.result(timeout)
+
+    def exception(self, timeout: float = None) -> Optional[BaseException]:
+        return self.future.exception(timeout)
+
+    def done(self) -> bool:
+        task = self.manager.tasks.get(self.name)
+        return task is None or task.finished
+
+    def add_done_callback(self, fn: Callable[["TaskHandle"], None]) -> None:
+        """任务结束后以句柄为参数调用 fn；任务已结束时立即调用"""
+        self.future.add_done_callback(lambda _future: fn(self))
+
+    def cancel(self) -> bool:
+        return self.manager.cancel_task(self.name)
+
+
+def as_completed(handles: Iterable[TaskHandle], timeout: float = None) -> Iterator[TaskHandle]:
+    """按结束先后产出一组任务句柄，语义同 concurrent.futures.as_completed"""
+    by_future = {handle.future: handle for handle in handles}
+    for future in futures_as_completed(by_future, timeout=timeout):
+        yield by_future[future]
+
+
+class TaskRegistry:
+    """
+    任务索引：按名称保存任务，并增量维护按状态的名称集合与按名称前缀的计数
+
+    状态变化统一通过 set_status() 完成，状态统计、按状态遍历与前缀查询都不需要扫描全部任务。
+    名称前缀以 "_" 为边界，例如 crawler_org_crawler 登记 crawler、crawler_org、crawler_org_crawler。
+    """
+
+    def __init__(self, on_transition: Callable[[Task, Optional[TaskStatus], TaskStatus], None] = None):
+        self._tasks: Dict[str, Task] = {}
+        self._by_status: Dict[TaskStatus, set] = {status: set() for status in TaskStatus}
+        # 状态变化回调，在索引锁之外调用
+        self.on_transition = on_transition
+        self._prefix_counts: Dict[str, int] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _prefixes(name: str) -> Iterable[str]:
+        parts = name.split("_")
+        return ("_".join(parts[:i]) for i in range(1, len(parts) + 1))
+
+    def add(self, task: Task) -> bool:
+        """登记任务，同名任务已存在时返回 False"""
+        with self._lock:
+            if task.name in self._tasks:
+                return False
+            self._tasks[task.name] = task
+            self._by_status[task.status].add(task.name)
+            for prefix in self._prefixes(task.name):
+                self._prefix_counts[prefix] = self._prefix_counts.get(prefix, 0) + 1
+        if self.on_transition:
+            self.on_transition(task, None, task.status)
+        return True
+
+    def remove(self, name: str) -> Optional[Task]:
+        with self._lock:
+            task = self._tasks.pop(name, None)
+            if task is None:
+                return None
+            self._by_status[task.status].discard(name)
+            for prefix in self._prefixes(name):
+                remaining = self._prefix_counts.get(prefix, 0) - 1
+                if remaining > 0:
+                    self._prefix_counts[prefix] = remaining
+                else:
+                    self._prefix_counts.pop(prefix, None)
+            return task
+
+    def set_status(self, task: Task, status: TaskStatus) -> None:
+        """更新任务状态并同步状态索引"""
+        with self._lock:
+            previous = task.status
+            task.status = status
+            if task.name in self._tasks and previous != status:
+                self._by_status[previous].discard(task.name)
+                self._by_status[status].add(task.name)
+        if self.on_transition and previous != status:
+            self.on_transition(task, previous, status)
+
+    def count(self, status: TaskStatus) -> int:
+        with self._lock:
+            return len(self._by_status[status])
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数（键为状态字符串）及总数"""
+        with self._lock:
+            stats = {"total": len(self._tasks)}
+            stats.update({status.label: len(names) for status, names in self._by_status.items()})
+            return stats
+
+    def with_status(self, *statuses: TaskStatus) -> list:
+        """指定状态的任务快照"""
+        with self._lock:
+            return [self._tasks[name] for status in statuses for name in self._by_status[status]]
+
+    def has_prefix(self, prefix: str) -> bool:
+        """是否存在名称以 prefix 开头（按 "_" 边界）的任务"""
+        with self._lock:
+            return prefix in self._prefix_counts
+
+    def get(self, name: str, default: Optional[Task] = None) -> Optional[Task]:
+        with self._lock:
+            return self._tasks.get(name, default)
+
+    def __getitem__(self, name: str) -> Task:
+        with self._lock:
+            return self._tasks[name]
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._tasks
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+
+
+class TaskSource:
+    """惰性任务源：由供给线程逐个取出任务定义，未完成任务数达到上限时等待已有任务结束"""
+
+    def __init__(self, name: str, specs: Iterable[Dict[str, Any]], max_pending: int):
+        self.name = name
+        self.specs = iter(specs)
+        self.max_pending = max_pending
+        # 已加入系统但尚未结束的任务名
+        self.outstanding = set()
+        self.condition = Condition()
+        self.produced = 0
+        self.skipped = 0
+        self.exhausted = False
+        self.thread: Optional[threading.Thread] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                "produced": self.produced,
+                "skipped": self.skipped,
+                "pending": len(self.outstanding),
+                "max_pending": self.max_pending,
+                "exhausted": self.exhausted
+            }
 
 
 class SystemManager:
-    def __init__(self, max_workers: int = 5, health_check_interval: int = 60):
+    def __init__(self, max_workers: int = 5, health_check_interval: int = 60,
+                 retry_base_delay: float = 2.0, retry_max_delay: float = 300.0,
+                 resource_limits: Dict[str, int] = None, task_store=None,
+                 completed_retention_hours: float = 24, result_cache_size: int = None):
         self.config = ConfigManager()
         self.logger = logging.getLogger(__name__)
-        self.tasks: Dict[str, Task] = {}
+        self.tasks = TaskRegistry(on_transition=self._publish_event)
         self.task_queue: PriorityQueue = PriorityQueue()  # 修正：使用优先级队列
+        # 只保存结果摘要；完整返回值进入有界 LRU，供最近完成的任务查询
         self.results: Dict[str, TaskResult] = {}
+        if result_cache_size is None:
+            result_cache_size = self.config.get('system.result_cache_size', 128)
+        self.result_payloads = ResultPayloadCache(result_cache_size)
         self.lock = Lock()
         self.max_workers = max_workers  # 修正：保存参数避免访问私有属性
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # 任务线程池只执行任务；调度循环与健康检查使用独立的服务线程池，不占用任务并发
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="system-task")
+        self.service_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="system-service")
+        # 任务执行槽位，保证同时提交到线程池的任务不超过 max_workers
+        self.task_slots = BoundedSemaphore(max_workers)
+        self.futures: Dict[str, Future] = {}
+        # 重试任务在到期前保存在延迟调度器中，到期后才进入就绪队列
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.delayed_tasks = DelayedTaskScheduler(self.task_queue.put)
+        # 资源标签并发限制；资源不足的任务按标签组暂存，等资源释放后优先调度
+        limits = dict(DEFAULT_RESOURCE_LIMITS)
+        limits.update(self.config.get('system.resource_limits', {}) or {})
+        limits.update(resource_limits or {})
+        self.resource_limiter = ResourceLimiter(limits)
+        self.blocked_tasks: Dict[Tuple[str, ...], deque] = {}
+        # 可选的持久化队列与按名称注册的任务处理器
+        self.task_store = task_store
+        self.completed_retention_seconds = completed_retention_hours * 3600
+        self.handlers: Dict[str, Callable] = {}
+        # 惰性任务源，以及由任务源产生、尚未结束的任务名到任务源的映射
+        self.task_sources: Dict[str, TaskSource] = {}
+        self.source_of_task: Dict[str, TaskSource] = {}
+        # 等待结果的任务的完成通知，以及状态变化事件的订阅队列
+        self.waiters: Dict[str, Future] = {}
+        # 前置任务名 -> 等待它完成的任务名
+        self.dependents: Dict[str, List[str]] = {}
+        self.subscribers: List[Queue] = []
+        self.subscribers_lock = Lock()
         self.running = False
         self.shutdown_event = Event()
         self.health_check_interval = health_check_interval
@@ -90,36 +548,317 @@ class SystemManager:
         }
         self.active_tasks_count = 0  # 修正：手动跟踪活跃任务数
 
-    def add_task(self, name: str, func: Callable, args: tuple = (),
-                 kwargs: dict = None, max_retries: int = 3, priority: int = 0) -> bool:
-        """添加新任务到系统"""
+    def register_handler(self, name: str, func: Callable) -> None:
+        """注册任务处理器；通过处理器名称添加的任务可以持久化并在重启后重放"""
+        self.handlers[name] = func
+
+    def has_task(self, name: str) -> bool:
+        """任务是否已在系统中，或在保留期内已由持久化队列记录为完成"""
+        if name in self.tasks:
+            return True
+        return bool(self.task_store and self.task_store.is_completed(name, self.completed_retention_seconds))
+
+    def has_task_prefix(self, prefix: str) -> bool:
+        """系统中是否存在名称以 prefix 开头（按 "_" 边界）的任务"""
+        return self.tasks.has_prefix(prefix)
+
+    def add_task(self, name: str, func: Callable = None, args: tuple = (),
+                 kwargs: dict = None, max_retries: int = 3, priority: int = 0,
+                 resources: Iterable[str] = (), handler: str = None, depends_on: Iterable[str] = ()):
+        """
+        添加新任务到系统，resources 为任务执行期间需要占用的资源标签
+
+        指定 handler 时按名称使用已注册的处理器，任务会写入持久化队列；
+        持久化队列记录该任务在保留期内已完成时不再重复添加。
+
+        depends_on 中的前置任务全部成功后任务才进入就绪队列；任一前置任务失败或被取消时，
+        任务直接失败并继续向后传递。不在系统中的前置任务（已清理或无需执行）视为已满足。
+
+        Returns:
+            TaskHandle: 添加成功时返回任务句柄（真值），可等待结果或注册完成回调；失败时返回 False
+        """
         try:
-            with self.lock:
-                if name in self.tasks:
-                    self.logger.warning(f"Task '{name}' already exists, skipping")
+            if handler is not None:
+                if handler not in self.handlers:
+                    self.logger.error(f"Task handler '{handler}' is not registered")
                     return False
+                func = func or self.handlers[handler]
+            if func is None:
+                self.logger.error(f"Task '{name}' has no function or handler")
+                return False
 
-                task = Task(name, func, args, kwargs, max_retries, priority)
-                self.tasks[name] = task
+            if (handler and self.task_store
+                    and self.task_store.is_completed(name, self.completed_retention_seconds)):
+                self.logger.debug(f"Task '{name}' already completed recently, skipping")
+                return False
+
+            task = Task(name, func, args, kwargs, max_retries, priority, resources, handler, depends_on)
+            if not self.tasks.add(task):
+                self.logger.warning(f"Task '{name}' already exists, skipping")
+                return False
 
-                # 修正：使用包装类添加到优先级队列
-                wrapper = PriorityTaskWrapper(task)
-                self.task_queue.put(wrapper)
+            if handler and self.task_store:
+                self.task_store.record_enqueue(name, handler, task.args, task.kwargs, priority,
+                                               max_retries, task.resources, task.depends_on)
 
-                # self.logger.info(f"Task '{name}' added to queue with priority {priority}")
-                return True
+            # 修正：使用包装类添加到优先级队列（有未完成的前置任务时等待）
+            self._enqueue_when_ready(task)
+
+            # self.logger.info(f"Task '{name}' added to queue with priority {priority}")
+            return TaskHandle(self, name)
         except Exception as e:
             self.logger.error(f"Failed to add task '{name}': {str(e)}")
             return False
 
+    def add_task_source(self, name: str, specs: Iterable[Dict[str, Any]], max_pending: int = None) -> bool:
+        """
+        添加惰性任务源，specs 逐个产出 add_task 的关键字参数
+
+        任务只在容量空闲时才被创建：由该任务源产生、尚未结束的任务达到 max_pending 时，
+        供给线程暂停从 specs 取数，因此内存占用与并发数成正比，而与待处理总量无关。
+        """
+        with self.lock:
+            existing = self.task_sources.get(name)
+            if existing and not existing.exhausted:
+                self.logger.warning(f"Task source '{name}' is still running, skipping")
+                return False
+            source = TaskSource(name, specs, max_pending or self.max_workers * 4)
+            self.task_sources[name] = source
+
+        source.thread = threading.Thread(target=self._feed_task_source, args=(source,),
+                                         name=f"task-source-{name}", daemon=True)
+        source.thread.start()
+        self.logger.info(f"Task source '{name}' started (max pending {source.max_pending})")
+        return True
+
+    def _feed_task_source(self, source: TaskSource) -> None:
+        """供给线程：在未完成任务数低于上限时从任务源取出下一个任务加入系统"""
+        try:
+            while not self.shutdown_event.is_set():
+                with source.condition:
+                    while (len(source.outstanding) >= source.max_pending
+                           and not self.shutdown_event.is_set()):
+                        source.condition.wait(timeout=1)
+                if self.shutdown_event.is_set():
+                    break
+
+                spec = next(source.specs, None)
+                if spec is None:
+                    break
+
+                task_name = spec["name"]
+                with source.condition:
+                    # 先登记再入队，避免任务在登记前就已结束
+                    source.outstanding.add(task_name)
+                with self.lock:
+                    self.source_of_task[task_name] = source
+
+                if self.has_task(task_name) or not self.add_task(**spec):
+                    self._release_source_task(task_name)
+                    with source.condition:
+                        source.skipped += 1
+                    continue
+
+                with source.condition:
+                    source.produced += 1
+        except Exception as e:
+            self.logger.error(f"Task source '{source.name}' failed: {str(e)}")
+        finally:
+            with source.condition:
+                source.exhausted = True
+            self.logger.info(
+                f"Task source '{source.name}' finished: {source.produced} tasks added, {source.skipped} skipped"
+            )
+
+    def _release_source_task(self, task_name: str) -> None:
+        """任务结束（完成、永久失败或取消）后归还其任务源的容量"""
+        with self.lock:
+            source = self.source_of_task.pop(task_name, None)
+        if source is None:
+            return
+        with source.condition:
+            source.outstanding.discard(task_name)
+            source.condition.notify()
+
+    def _enqueue_when_ready(self, task: Task) -> None:
+        """前置任务都已成功时放入就绪队列，否则登记到各前置任务的等待列表"""
+        failed_dependency = None
+        with self.lock:
+            waiting_on = 0
+            for dependency in task.depends_on:
+                dependency_task = self.tasks.get(dependency)
+                if dependency_task is None or (dependency_task.finished
+                                               and dependency_task.status == TaskStatus.COMPLETED):
+                    continue
+                if dependency_task.finished:
+                    failed_dependency = dependency_task
+                    break
+                self.dependents.setdefault(dependency, []).append(task.name)
+                waiting_on += 1
+            task.waiting_on = waiting_on
+
+        if failed_dependency is not None:
+            self._fail_on_dependency(task, failed_dependency)
+        elif not waiting_on:
+            self.task_queue.put(PriorityTaskWrapper(task))
+
+    def _fail_on_dependency(self, task: Task, dependency: Task) -> None:
+        """前置任务失败或被取消：任务不再执行，直接标记失败并通知其后续任务"""
+        error = f"Dependency '{dependency.name}' {dependency.status.label}"
+        with task.lock:
+            if task.status != TaskStatus.PENDING:
+                return
+            self.tasks.set_status(task, TaskStatus.FAILED)
+        with self.lock:
+            self.results[task.name] = TaskResult(success=False, error=error)
+        self._persist(task, "record_finish", TaskStatus.FAILED.label, error)
+        self.logger.error(f"Task '{task.name}' failed: {error}")
+        self._on_task_finished(task)
+
+    def _release_dependents(self, task: Task, dependents: List[str]) -> None:
+        """前置任务真正成功（状态为已完成且结果为成功）时释放后续任务，否则后续任务连带失败"""
+        with self.lock:
+            result = self.results.get(task.name)
+        succeeded = task.status == TaskStatus.COMPLETED and (result is None or result.success)
+        for name in dependents:
+            dependent = self.tasks.get(name)
+            if dependent is None or dependent.finished:
+                continue
+            if not succeeded:
+                self._fail_on_dependency(dependent, task)
+                continue
+            with self.lock:
+                dependent.waiting_on -= 1
+                ready = dependent.waiting_on == 0
+            if ready and dependent.status == TaskStatus.PENDING:
+                self.task_queue.put(PriorityTaskWrapper(dependent))
+
+    def get_task_handle(self, name: str) -> Optional[TaskHandle]:
+        """获取已在系统中的任务（包括任务源产生和重放的任务）的句柄"""
+        return TaskHandle(self, name) if name in self.tasks else None
+
+    def subscribe(self, maxsize: int = 10000) -> Queue:
+        """
+        订阅任务状态变化事件，返回接收 TaskEvent 的队列
+
+        队列已满时丢弃最早的事件，订阅者处理缓慢不会阻塞任务调度。
+        """
+        events = Queue(maxsize=maxsize)
+        with self.subscribers_lock:
+            self.subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events: Queue) -> None:
+        with self.subscribers_lock:
+            if events in self.subscribers:
+                self.subscribers.remove(events)
+
+    def _publish_event(self, task: Task, previous: Optional[TaskStatus], status: TaskStatus) -> None:
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        if not subscribers:
+            return
+        event = TaskEvent(task.name, status.label, previous.label if previous is not None else None)
+        for events in subscribers:
+            try:
+                events.put_nowait(event)
+            except Full:
+                try:
+                    events.get_nowait()
+                    events.put_nowait(event)
+                except (Empty, Full):
+                    pass
+
+    def _completion_future(self, name: str) -> Future:
+        """获取任务的完成通知；任务已结束时返回已完成的 Future"""
+        with self.lock:
+            future = self.waiters.get(name)
+            if future is not None:
+                return future
+            future = Future()
+            task = self.tasks.get(name)
+            if task is not None and not task.finished:
+                self.waiters[name] = future
+                return future
+
+        if task is None:
+            future.set_exception(KeyError(f"Task '{name}' not found"))
+        else:
+            self._resolve_future(future, task)
+        return future
+
+    def _resolve_future(self, future: Future, task: Task, data: Any = None) -> None:
+        if task.status == TaskStatus.COMPLETED:
+            if data is None:
+                result = self.results.get(task.name)
+                data = self.result_payloads.get(task.name, result.data if result else None)
+            future.set_result(data)
+        elif task.status == TaskStatus.CANCELLED:
+            future.cancel()
+        else:
+            result = self.results.get(task.name)
+            future.set_exception(TaskFailedError(task.name, result.error if result else None))
+
+    def _on_task_finished(self, task: Task, data: Any = None) -> None:
+        """任务进入最终状态：归还任务源容量并通知等待该任务的句柄"""
+        self._release_source_task(task.name)
+        with self.lock:
+            if task.finished:
+                return
+            task.finished = True
+            task.finished_at = time.monotonic()
+            future = self.waiters.pop(task.name, None)
+            dependents = self.dependents.pop(task.name, [])
+        if future is not None:
+            self._resolve_future(future, task, data)
+        if dependents:
+            self._release_dependents(task, dependents)
+
+    def _persist(self, task: Task, method: str, *args) -> None:
+        """将任务状态变化写入持久化队列，写入失败不影响任务执行"""
+        if not (self.task_store and task.handler):
+            return
+        try:
+            getattr(self.task_store, method)(task.name, *args)
+        except Exception as e:
+            self.logger.warning(f"Failed to persist task '{task.name}' ({method}): {str(e)}")
+
+    def _replay_persisted_tasks(self) -> int:
+        """启动时重放持久化队列中未完成的任务"""
+        if not self.task_store:
+            return 0
+
+        replayed = []
+        for row in self.task_store.load_unfinished():
+            func = self.handlers.get(row["handler"])
+            if func is None:
+                self.logger.warning(f"Cannot replay task '{row['name']}': handler '{row['handler']}' not registered")
+                continue
+
+            task = Task(row["name"], func, row["args"], row["kwargs"], row["max_retries"], row["priority"],
+                        row["resources"], row["handler"], row["depends_on"])
+            task.retry_count = row["retry_count"]
+            if self.tasks.add(task):
+                replayed.append(task)
+
+        # 先登记全部任务再处理依赖，使前置任务与后续任务的重放顺序无关
+        for task in replayed:
+            self._enqueue_when_ready(task)
+        replayed = len(replayed)
+
+        if replayed:
+            self.logger.info(f"Replayed {replayed} unfinished tasks from task store")
+        return replayed
+
     @log_execution(include_args=True)
     def execute_task(self, task: Task) -> TaskResult:
         """执行单个任务"""
         start_time = time.time()
 
         with task.lock:
-            task.status = TaskStatus.RUNNING
-            task.last_run = datetime.now()
+            self.tasks.set_status(task, TaskStatus.RUNNING)
+            task.last_run = time.monotonic()
+        self._persist(task, "record_start")
 
         # 增加活跃任务计数
         with self.lock:
@@ -129,8 +868,24 @@ class SystemManager:
             result_data = task.func(*task.args, **task.kwargs)
             execution_time = time.time() - start_time
 
+            # 处理函数以带 success=False 的结果对象（如 ProcessingResult）报告失败，而不是抛出异常
+            if getattr(result_data, 'success', True) is False:
+                error_msg = getattr(result_data, 'error_message', None) or "Task returned an unsuccessful result"
+                retryable = getattr(result_data, 'retryable', True)
+                self.logger.error(f"Task '{task.name}' returned failure after {execution_time:.2f}s: {error_msg}")
+
+                with task.lock:
+                    self.tasks.set_status(task, TaskStatus.FAILED)
+
+                return TaskResult(
+                    success=False,
+                    error=error_msg,
+                    execution_time=execution_time,
+                    retryable=retryable
+                )
+
             with task.lock:
-                task.status = TaskStatus.COMPLETED
+                self.tasks.set_status(task, TaskStatus.COMPLETED)
 
             self.logger.info(f"Task '{task.name}' completed successfully in {execution_time:.2f}s")
             return TaskResult(
@@ -146,7 +901,7 @@ class SystemManager:
             self.logger.error(f"Task '{task.name}' failed after {execution_time:.2f}s: {error_msg}")
 
             with task.lock:
-                task.status = TaskStatus.FAILED
+                self.tasks.set_status(task, TaskStatus.FAILED)
 
             return TaskResult(
                 success=False,
@@ -158,93 +913,182 @@ class SystemManager:
             with self.lock:
                 self.active_tasks_count -= 1
 
-    def handle_failed_task(self, task: Task) -> None:
-        """处理失败的任务，使用指数退避重试"""
+    def handle_failed_task(self, task: Task, error: str = None, retryable: bool = True) -> None:
+        """处理失败的任务，使用指数退避重试；retryable 为 False 时直接标记为失败"""
         with task.lock:
-            if task.retry_count < task.max_retries and not self.shutdown_event.is_set():
+            if retryable and task.retry_count < task.max_retries and not self.shutdown_event.is_set():
                 task.retry_count += 1
-                task.status = TaskStatus.RETRY
+                self.tasks.set_status(task, TaskStatus.RETRY)
 
-                # 指数退避：2^retry_count 秒，最大300秒
-                delay_seconds = min(2 ** task.retry_count, 300)
+                # 带抖动的指数退避，避免大量失败任务在同一时刻集中重试
+                delay_seconds = self._retry_delay(task.retry_count)
                 retry_time = datetime.now() + timedelta(seconds=delay_seconds)
-                task.next_retry = retry_time
+                task.next_retry = time.monotonic() + delay_seconds
 
-                # 修正：直接放入队列，避免使用executor调度
                 wrapper = PriorityTaskWrapper(task, retry_time)
 
                 try:
                     if not self.shutdown_event.is_set():
-                        self.task_queue.put(wrapper)
+                        self.delayed_tasks.schedule(wrapper, delay_seconds)
+                        self._persist(task, "record_retry", task.retry_count, error)
                         self.logger.info(
                             f"Task '{task.name}' scheduled for retry {task.retry_count}/{task.max_retries} "
                             f"at {retry_time.strftime('%H:%M:%S')}"
                         )
                     else:
                         # 系统正在关闭，标记任务为失败
-                        task.status = TaskStatus.FAILED
+                        self.tasks.set_status(task, TaskStatus.FAILED)
                         self.logger.warning(
                             f"Task '{task.name}' retry cancelled due to system shutdown"
                         )
                 except Exception as e:
-                    task.status = TaskStatus.FAILED
+                    self.tasks.set_status(task, TaskStatus.FAILED)
                     self.logger.error(f"Failed to schedule retry for task '{task.name}': {str(e)}")
             else:
-                task.status = TaskStatus.FAILED  # 确保状态正确
+                self.tasks.set_status(task, TaskStatus.FAILED)  # 确保状态正确
                 if self.shutdown_event.is_set():
                     self.logger.warning(
                         f"Task '{task.name}' failed - no retry due to system shutdown"
                     )
                 else:
-                    self.logger.error(
-                        f"Task '{task.name}' failed permanently after {task.max_retries} retries"
-                    )
+                    # 关闭导致的失败保留未完成状态，重启后重放；重试耗尽才记录为失败
+                    self._persist(task, "record_finish", TaskStatus.FAILED.label, error)
+                    if retryable:
+                        self.logger.error(
+                            f"Task '{task.name}' failed permanently after {task.max_retries} retries"
+                        )
+                    else:
+                        self.logger.warning(f"Task '{task.name}' failed with a non-retryable result: {error}")
+        if task.status == TaskStatus.FAILED:
+            self._on_task_finished(task)
+
+    def _retry_delay(self, retry_count: int) -> float:
+        """指数退避延迟（base * 2^(n-1)，上限 retry_max_delay），在 [delay/2, delay] 内随机抖动"""
+        delay = min(self.retry_base_delay * (2 ** (retry_count - 1)), self.retry_max_delay)
+        return delay / 2 + random.uniform(0, delay / 2)
 
     def process_tasks(self) -> None:
-        """处理任务队列"""
+        """调度循环：取出可执行的任务并提交到任务线程池，结果在完成回调中处理"""
         self.logger.info("Task processor started")
 
         while self.running and not self.shutdown_event.is_set():
-            try:
-                # 修正：从优先级队列获取包装对象
-                wrapper = self.task_queue.get(timeout=1)
-                task = wrapper.task
-
-                # 检查任务是否已被取消
-                if task.status == TaskStatus.CANCELLED:
-                    self.task_queue.task_done()
-                    continue
+            # 先占用执行槽位，槽位已满时等待正在执行的任务完成
+            if not self.task_slots.acquire(timeout=1):
+                continue
 
-                # 修正：检查重试任务是否到时间
-                current_time = datetime.now()
-                if (task.status == TaskStatus.RETRY and
-                        wrapper.schedule_time and wrapper.schedule_time > current_time):
-                    # 重新放回队列等待
-                    self.task_queue.put(wrapper)
-                    self.task_queue.task_done()
-                    time.sleep(0.1)  # 短暂休息避免忙等待
+            submitted = False
+            try:
+                # 优先调度此前因资源不足而暂存、现在资源已释放的任务
+                task = self._take_unblocked_task()
+                if task is None:
+                    task = self._take_ready_task()
+                if task is None:
                     continue
 
-                # 执行任务
-                result: TaskResult = self.execute_task(task)
+                self._submit_task(task)
+                submitted = True
 
-                # 保存结果
-                with self.lock:
-                    self.results[task.name] = result
+            except Exception as e:
+                self.logger.error(f"Error processing task queue: {str(e)}")
+                continue
+            finally:
+                if not submitted:
+                    self.task_slots.release()
 
-                # 处理失败任务
-                if not result.success:
-                    self.handle_failed_task(task)
+        self.logger.info("Task processor stopped")
 
-                self.task_queue.task_done()
+    def _take_unblocked_task(self) -> Optional[Task]:
+        """从暂存的标签组中取出一个已能获得全部资源的任务（资源已占用）"""
+        with self.lock:
+            groups = list(self.blocked_tasks.items())
 
-            except Empty:
+        for resources, waiting in groups:
+            if not self.resource_limiter.try_acquire(resources):
                 continue
+            with self.lock:
+                while waiting:
+                    task = waiting.popleft()
+                    if task.status != TaskStatus.CANCELLED:
+                        break
+                else:
+                    task = None
+                if not waiting:
+                    self.blocked_tasks.pop(resources, None)
+            if task is not None:
+                return task
+            self.resource_limiter.release(resources)
+        return None
+
+    def _take_ready_task(self) -> Optional[Task]:
+        """从就绪队列取出一个任务；资源不足的任务放入对应标签组暂存，返回 None 让调度循环继续"""
+        with self.lock:
+            has_blocked = bool(self.blocked_tasks)
+        try:
+            # 有暂存任务时缩短等待，以便资源释放后尽快调度
+            wrapper = self.task_queue.get(timeout=0.1 if has_blocked else 1)
+        except Empty:
+            return None
+        self.task_queue.task_done()
+        task = wrapper.task
+
+        # 检查任务是否已被取消
+        if task.status == TaskStatus.CANCELLED:
+            return None
+
+        with self.lock:
+            # 同组已有任务在等待时保持先后顺序
+            queued_behind = task.resources in self.blocked_tasks
+        if not queued_behind and self.resource_limiter.try_acquire(task.resources):
+            return task
+
+        with self.lock:
+            self.blocked_tasks.setdefault(task.resources, deque()).append(task)
+        return None
+
+    def _submit_task(self, task: Task) -> None:
+        """提交任务到线程池，完成后由回调保存结果、释放资源并处理重试"""
+        try:
+            future = self.executor.submit(self.execute_task, task)
+        except Exception:
+            self.resource_limiter.release(task.resources)
+            raise
+
+        with self.lock:
+            self.futures[task.name] = future
+        future.add_done_callback(lambda done_future: self._on_task_done(task, done_future))
+
+    def _on_task_done(self, task: Task, future: Future) -> None:
+        """任务完成回调：保存结果、处理失败重试并释放执行槽位"""
+        try:
+            try:
+                result: TaskResult = future.result()
             except Exception as e:
-                self.logger.error(f"Error processing task queue: {str(e)}")
-                continue
+                with task.lock:
+                    self.tasks.set_status(task, TaskStatus.FAILED)
+                result = TaskResult(success=False, error=str(e))
+
+            # 保存结果：完整返回值放入有界缓存，任务表中只保留摘要
+            data = result.data
+            if result.success:
+                self.result_payloads.put(task.name, result.data)
+                result.data = summarize_result(result.data)
+            with self.lock:
+                self.results[task.name] = result
+                if self.futures.get(task.name) is future:
+                    del self.futures[task.name]
+
+            # 处理失败任务
+            if result.success:
+                self._persist(task, "record_finish", TaskStatus.COMPLETED.label)
+                self._on_task_finished(task, data)
+            else:
+                self.handle_failed_task(task, result.error, result.retryable)
 
-        self.logger.info("Task processor stopped")
+        except Exception as e:
+            self.logger.error(f"Error handling result of task '{task.name}': {str(e)}")
+        finally:
+            self.resource_limiter.release(task.resources)
+            self.task_slots.release()
 
     def start(self) -> None:
         """启动系统"""
@@ -256,9 +1100,13 @@ class SystemManager:
         self.running = True
         self.shutdown_event.clear()
 
-        # 启动工作线程
-        self.executor.submit(self.process_tasks)
-        self.executor.submit(self.health_check_loop)
+        # 重放持久化队列中上次未完成的任务
+        self._replay_persisted_tasks()
+
+        # 启动延迟重试定时线程、调度与健康检查线程
+        self.delayed_tasks.start()
+        self.service_executor.submit(self.process_tasks)
+        self.service_executor.submit(self.health_check_loop)
 
         self.logger.info("System manager started successfully")
 
@@ -272,6 +1120,19 @@ class SystemManager:
         self.running = False
         self.shutdown_event.set()
 
+        # 唤醒等待容量的任务源供给线程，使其退出
+        for source in list(self.task_sources.values()):
+            with source.condition:
+                source.condition.notify_all()
+
+        # 停止延迟调度，未到期的重试不再执行
+        for wrapper in self.delayed_tasks.stop():
+            with wrapper.task.lock:
+                if wrapper.task.status == TaskStatus.RETRY:
+                    self.tasks.set_status(wrapper.task, TaskStatus.FAILED)
+            self._on_task_finished(wrapper.task)
+            self.logger.warning(f"Task '{wrapper.task.name}' retry cancelled due to system shutdown")
+
         # 等待当前正在执行的任务完成
         start_time = time.time()
         while self.active_tasks_count > 0 and time.time() - start_time < timeout / 2:
@@ -288,7 +1149,10 @@ class SystemManager:
 
         # 关闭线程池
         try:
+            self.service_executor.shutdown(wait=True)
             self.executor.shutdown(wait=True)
+            if self.task_store:
+                self.task_store.close()
             self.logger.info("System manager stopped gracefully")
         except Exception as e:
             self.logger.error(f"Error during executor shutdown: {str(e)}")
@@ -303,12 +1167,17 @@ class SystemManager:
 
             with task.lock:
                 if task.status in [TaskStatus.PENDING, TaskStatus.RETRY]:
-                    task.status = TaskStatus.CANCELLED
+                    self.tasks.set_status(task, TaskStatus.CANCELLED)
+                    self._persist(task, "record_finish", TaskStatus.CANCELLED.label)
                     self.logger.info(f"Task '{task_name}' cancelled")
-                    return True
+                    cancelled = True
                 else:
-                    self.logger.warning(f"Cannot cancel task '{task_name}' in status {task.status.value}")
-                    return False
+                    self.logger.warning(f"Cannot cancel task '{task_name}' in status {task.status.label}")
+                    cancelled = False
+
+        if cancelled:
+            self._on_task_finished(task)
+        return cancelled
 
     def get_task_status(self, task_name: str) -> Dict[str, Any]:
         """获取任务状态"""
@@ -322,48 +1191,48 @@ class SystemManager:
                 result = self.results[task_name]
                 result_data = {
                     "success": result.success,
-                    "data": result.data,
+                    "data": self.result_payloads.get(task_name, result.data),
                     "error": result.error,
-                    "timestamp": result.timestamp.isoformat(),
+                    "timestamp": datetime.fromtimestamp(result.timestamp).isoformat(),
                     "execution_time": result.execution_time
                 }
 
+            last_run = monotonic_to_datetime(task.last_run)
+            next_retry = monotonic_to_datetime(task.next_retry)
             return {
                 "name": task.name,
-                "status": task.status.value,
+                "status": task.status.label,
                 "retry_count": task.retry_count,
                 "max_retries": task.max_retries,
                 "priority": task.priority,
-                "created_at": task.created_at.isoformat(),
-                "last_run": task.last_run.isoformat() if task.last_run else None,
-                "next_retry": task.next_retry.isoformat() if task.next_retry else None,
+                "resources": list(task.resources),
+                "depends_on": list(task.depends_on),
+                "created_at": monotonic_to_datetime(task.created_at).isoformat(),
+                "last_run": last_run.isoformat() if last_run else None,
+                "next_retry": next_retry.isoformat() if next_retry else None,
                 "result": result_data
             }
 
     def get_system_status(self) -> Dict[str, Any]:
         """获取系统状态"""
-        with self.lock:
-            task_stats = {
-                "total": len(self.tasks),
-                "pending": 0,
-                "running": 0,
-                "completed": 0,
-                "failed": 0,
-                "retry": 0,
-                "cancelled": 0
-            }
-
-            for task in self.tasks.values():
-                task_stats[task.status.value] += 1
+        # 状态计数由任务索引增量维护，不扫描任务表
+        task_stats = self.tasks.counts()
 
         return {
             "running": self.running,
             "health": self.health_status,
             "tasks": task_stats,
             "queue_size": self.task_queue.qsize(),
+            "delayed_queue_size": len(self.delayed_tasks),
+            "blocked_tasks": {",".join(resources) or "-": len(waiting)
+                              for resources, waiting in list(self.blocked_tasks.items())},
+            "resources": self.resource_limiter.snapshot(),
+            "result_payloads_cached": len(self.result_payloads),
+            "task_sources": {name: source.snapshot() for name, source in list(self.task_sources.items())},
             "executor_status": {
                 "max_workers": self.max_workers,  # 修正：使用保存的值
-                "active_tasks": self.active_tasks_count  # 修正：使用手动跟踪的值
+                "active_tasks": self.active_tasks_count,  # 修正：使用手动跟踪的值
+                "in_flight": len(self.futures)
             }
         }
 
@@ -382,12 +1251,12 @@ class SystemManager:
                 # 检查是否有长时间运行的任务
                 long_running_tasks = []
                 current_time = datetime.now()
-                with self.lock:
-                    for task in self.tasks.values():
-                        with task.lock:
-                            if (task.status == TaskStatus.RUNNING and task.last_run and
-                                    (current_time - task.last_run).total_seconds() > 300):  # 5分钟
-                                long_running_tasks.append(task.name)
+                now = time.monotonic()
+                for task in self.tasks.with_status(TaskStatus.RUNNING):
+                    with task.lock:
+                        if (task.status == TaskStatus.RUNNING and task.last_run and
+                                now - task.last_run > 300):  # 5分钟
+                            long_running_tasks.append(task.name)
 
                 status = "healthy"
                 if queue_size > 100:  # 队列积压过多
@@ -424,23 +1293,32 @@ class SystemManager:
 
     def clear_completed_tasks(self, older_than_hours: int = 24) -> int:
         """清理完成的任务"""
-        cutoff_time = datetime.now() - timedelta(hours=older_than_hours)
+        cutoff_time = time.monotonic() - older_than_hours * 3600
         cleared_count = 0
 
-        with self.lock:
-            tasks_to_remove = []
-            for name, task in self.tasks.items():
-                with task.lock:
-                    if (task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED]
-                            and task.last_run and task.last_run < cutoff_time):
-                        tasks_to_remove.append(name)
+        tasks_to_remove = []
+        for task in self.tasks.with_status(*FINISHED_STATUSES):
+            with task.lock:
+                # 按结束时间判断：依赖失败或未开始即取消的任务没有 last_run
+                if (task.status in FINISHED_STATUSES and task.finished_at is not None
+                        and task.finished_at < cutoff_time):
+                    tasks_to_remove.append(task.name)
 
+        with self.lock:
             for name in tasks_to_remove:
-                del self.tasks[name]
-                if name in self.results:
-                    del self.results[name]
+                self.tasks.remove(name)
+                self.results.pop(name, None)
+                self.result_payloads.pop(name)
                 cleared_count += 1
 
+        if self.task_store:
+            try:
+                purged = self.task_store.purge_finished(max(older_than_hours * 3600, self.completed_retention_seconds))
+                if purged:
+                    self.logger.info(f"Purged {purged} finished tasks from task store")
+            except Exception as e:
+                self.logger.warning(f"Failed to purge task store: {str(e)}")
+
         if cleared_count > 0:
             self.logger.info(f"Cleared {cleared_count} completed tasks older than {older_than_hours} hours")
 
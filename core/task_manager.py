@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+from common.config import config_manager
 from utils.generate_period_code import generate_period_codes
 from core.org_crawler import OrgCrawler
 from core.flow_crawler import FlowCrawler
@@ -86,14 +87,9 @@ class TaskManager:
             for i, task in enumerate(quarterly_monthly_tasks):
                 task_name = task.get("taskName", "")
 
-                # 检查任务是否已处理过
+                # 检查任务是否已处理过（直接查询任务索引，不获取整个系统状态）
                 formatted_task_name = f"process_financial_reports_{task_name}"
-
-                # 获取系统状态，检查是否已有同名任务
-                system_status = self.system_manager.get_system_status()
-                existing_tasks = system_status.get("task_details", {})
-
-                task_exists = any(formatted_task_name in task_name for task_name in existing_tasks.keys())
+                task_exists = self.system_manager.has_task(formatted_task_name)
 
                 if not task_exists:
                     success = self.data_processor.add_financial_report_task_to_system(
@@ -124,46 +120,12 @@ class TaskManager:
             current_period_codes = generate_period_codes(start_year=2025)
             logger.debug(f"生成当前期间代码，最新期间: {current_period_codes[-1] if current_period_codes else 'None'}")
 
-            new_traditional_tasks = []
-
-            # 检查年度数据
-            processed_years = set()
-            for period_code in current_period_codes:
-                year = period_code.split('-')[0]
-
-                if year not in processed_years:
-                    for data_type in self.yearly_data_types:
-                        for company_code in self.company_codes:
-                            if not self.db_manager.check_traditional_data_exists(data_type, company_code, year=year):
-                                task_config = {
-                                    'data_type': data_type,
-                                    'company_code': company_code,
-                                    'year': year,
-                                    'period_code': f"{year}-01",
-                                    'priority': len(self.yearly_data_types) - self.yearly_data_types.index(data_type)
-                                }
-                                new_traditional_tasks.append(task_config)
-                                logger.info(f"✅ 发现新的年度数据需要处理: {data_type} - {company_code} - {year}")
-
-                    processed_years.add(year)
-
-            # 检查期间数据
-            for period_code in current_period_codes:
-                year = period_code.split('-')[0]
-
-                for data_type in self.period_data_types:
-                    for company_code in self.company_codes:
-                        if not self.db_manager.check_traditional_data_exists(data_type, company_code,
-                                                                             period_code=period_code):
-                            task_config = {
-                                'data_type': data_type,
-                                'company_code': company_code,
-                                'year': year,
-                                'period_code': period_code,
-                                'priority': len(self.period_data_types) - self.period_data_types.index(data_type)
-                            }
-                            new_traditional_tasks.append(task_config)
-                            logger.info(f"✅ 发现新的期间数据需要处理: {data_type} - {company_code} - {period_code}")
+            new_traditional_tasks, _ = self._collect_missing_traditional_tasks(current_period_codes)
+            for task_config in new_traditional_tasks:
+                logger.info(f"✅ 发现新的数据需要处理: {task_config['data_type']} - {task_config['company_code']} - "
+                            f"{task_config['period_code']}")
+            new_traditional_tasks.extend(self._iter_refresh_traditional_tasks(current_period_codes,
+                                                                              new_traditional_tasks))
 
             if new_traditional_tasks:
                 success = self.data_processor.add_processing_tasks_to_system(
@@ -185,6 +147,125 @@ class TaskManager:
             logger.warning(f"检查传统数据新任务时发生错误: {e}")
             return False
 
+    def _collect_missing_traditional_tasks(self, period_codes: list) -> tuple:
+        """
+        根据覆盖索引计算缺失的传统数据任务
+
+        Returns:
+            tuple: (任务配置列表, (跳过的年度任务数, 跳过的期间任务数))
+        """
+        skipped = {'yearly': 0, 'period': 0}
+        tasks_config = list(self._iter_missing_traditional_tasks(period_codes, skipped))
+        return tasks_config, (skipped['yearly'], skipped['period'])
+
+    def _iter_missing_traditional_tasks(self, period_codes: list, skipped: dict = None):
+        """
+        按需生成缺失的传统数据任务配置
+
+        每种数据类型只在轮到它时查询一次已存在的键集合，用集合成员判断得到需要处理的组合；
+        覆盖索引不可用时回退为逐条检查。年度数据按类型生成独立任务，期间数据按公司×期间生成组合任务。
+        跳过的数据类型数累加到 skipped 的 yearly / period 中。
+        """
+        if skipped is None:
+            skipped = {}
+        skipped.setdefault('yearly', 0)
+        skipped.setdefault('period', 0)
+        years = list(dict.fromkeys(period_code.split('-')[0] for period_code in period_codes))
+
+        # 1. 按年份的数据（客商字典只按公司判重，但仍按年份生成任务）
+        for data_type in self.yearly_data_types:
+            coverage = self.db_manager.get_traditional_data_coverage(data_type)
+            if coverage is None:
+                logger.warning(f"{data_type} 覆盖索引不可用，回退为逐条检查")
+            for year in years:
+                for company_code in self.company_codes:
+                    if self._traditional_data_exists(coverage, data_type, company_code, year=year):
+                        skipped['yearly'] += 1
+                        logger.debug(f"跳过已存在的年度数据 - 类型: {data_type}, 公司: {company_code}, 年份: {year}")
+                        continue
+                    yield {
+                        'data_type': data_type,
+                        'company_code': company_code,
+                        'year': year,
+                        'period_code': f"{year}-01",
+                        'priority': len(self.yearly_data_types) - self.yearly_data_types.index(data_type)
+                    }
+
+        # 2. 按期间的数据：同一公司、同一期间缺失的期间数据类型合并为一个组合任务。
+        #    期间数据的获取与保存不需要年度字典，不依赖年度数据任务：字典为空或获取失败时期间数据照常加载；
+        #    年度任务优先级更高，通常仍先执行
+        coverages = {}
+        for data_type in self.period_data_types:
+            coverages[data_type] = self.db_manager.get_traditional_data_coverage(data_type)
+            if coverages[data_type] is None:
+                logger.warning(f"{data_type} 覆盖索引不可用，回退为逐条检查")
+        for period_code in period_codes:
+            year = period_code.split('-')[0]
+            for company_code in self.company_codes:
+                missing_types = []
+                for data_type in self.period_data_types:
+                    if self._traditional_data_exists(coverages[data_type], data_type, company_code,
+                                                     period_code=period_code):
+                        skipped['period'] += 1
+                        logger.debug(
+                            f"跳过已存在的期间数据 - 类型: {data_type}, 公司: {company_code}, 期间: {period_code}")
+                        continue
+                    missing_types.append(data_type)
+                if not missing_types:
+                    continue
+                yield {
+                    'data_type': 'period_bundle',
+                    'company_code': company_code,
+                    'year': year,
+                    'period_code': period_code,
+                    'data_types': missing_types,
+                    'priority': 0
+                }
+
+    def _iter_refresh_traditional_tasks(self, period_codes: list, pending_tasks: list = ()):
+        """
+        为最近 system.refresh_open_periods 个期间（未结账期间）生成重新检查的期间组合任务
+
+        重新检查任务按数据指纹判断上游数据是否变化，未变化时不写库，变化时替换整个分区。
+        已有首次获取任务的公司×期间、以及保留期内已完成过重新检查的任务不再生成，
+        因此同一期间的重新检查频率受 system.completed_retention_hours 限制。默认 0 不重新检查。
+        """
+        open_periods = int(config_manager.get('system.refresh_open_periods', 0) or 0)
+        if open_periods <= 0 or not period_codes:
+            return
+        pending = {(task['company_code'], task.get('period_code')) for task in pending_tasks
+                   if task['data_type'] == 'period_bundle'}
+        for period_code in period_codes[-open_periods:]:
+            year = period_code.split('-')[0]
+            for company_code in self.company_codes:
+                if (company_code, period_code) in pending:
+                    continue
+                task_config = {
+                    'data_type': 'period_bundle',
+                    'company_code': company_code,
+                    'year': year,
+                    'period_code': period_code,
+                    'refresh': True,
+                    'priority': -1
+                }
+                if self.system_manager.has_task(self.data_processor.build_task_name(task_config)):
+                    continue
+                yield task_config
+
+    def _traditional_data_exists(self, coverage, data_type: str, company_code: str, year: str = None,
+                                 period_code: str = None) -> bool:
+        """优先使用覆盖索引判断数据是否存在，索引不可用时逐条查询数据库"""
+        if coverage is None:
+            return self.db_manager.check_traditional_data_exists(data_type, company_code, year=year,
+                                                                 period_code=period_code)
+        if data_type == 'customer_vendor':
+            key = (str(company_code),)
+        elif data_type in self.yearly_data_types:
+            key = (str(company_code), str(year))
+        else:
+            key = (str(company_code), str(period_code))
+        return key in coverage
+
     def _check_crawler_tasks(self) -> bool:
         """检查组织架构、资金流水、报账单新任务"""
         try:
@@ -222,25 +303,31 @@ class TaskManager:
     def _check_crawler_task_exists(self, task_type: str) -> bool:
         """检查爬虫任务是否已存在"""
         try:
-            system_status = self.system_manager.get_system_status()
-            existing_tasks = system_status.get("task_details", {})
-            task_name = f"crawler_{task_type}"
-            return any(task_name in task_name_key for task_name_key in existing_tasks.keys())
+            return self.system_manager.has_task_prefix(f"crawler_{task_type}")
         except Exception as e:
             logger.warning(f"检查爬虫任务是否存在时发生错误: {e}")
             return False
 
+    def register_task_handlers(self) -> None:
+        """向系统管理器注册爬虫任务处理器，使爬虫任务可以持久化并在重启后重放"""
+        self.system_manager.register_handler("crawler_org_crawler", self._run_org_crawler)
+        self.system_manager.register_handler("crawler_flow_crawler", self._run_flow_crawler)
+        self.system_manager.register_handler("crawler_boe_crawler", self._run_boe_crawler)
+        self.data_processor.register_task_handlers(self.system_manager)
+
     def _add_crawler_task(self, task_type: str, func, priority: int = 0) -> bool:
         """添加爬虫任务到系统"""
         try:
             task_name = f"crawler_{task_type}"
+            self.system_manager.register_handler(task_name, func)
             success = self.system_manager.add_task(
                 name=task_name,
-                func=func,
+                handler=task_name,
                 args=(),
                 kwargs={},
                 priority=priority,
-                max_retries=3
+                max_retries=3,
+                resources=('crawler_api',)
             )
             return success
         except Exception as e:
@@ -391,7 +478,12 @@ class TaskManager:
             return False
 
     def _create_initial_traditional_tasks(self) -> bool:
-        """创建初始传统数据任务"""
+        """
+        创建初始传统数据任务
+
+        全量回补的任务数量可能很大，这里以惰性任务源的方式提交：
+        任务配置按需生成，只在系统有空闲容量时才创建任务对象。
+        """
         logger.info("步骤2: 初次启动 - 添加传统财务数据任务到队列")
 
         period_codes = generate_period_codes(start_year=2025)
@@ -400,76 +492,21 @@ class TaskManager:
         # 过滤已存在的数据
         logger.info("开始检查已存在的数据，过滤重复任务...")
 
-        all_tasks_config = []
-
-        # 1. 处理按年份的数据，先过滤已存在的
-        processed_years = set()
-        skipped_yearly_tasks = 0
-        for period_code in period_codes:
-            year = period_code.split('-')[0]
-
-            if year not in processed_years:
-                for data_type in self.yearly_data_types:
-                    for company_code in self.company_codes:
-                        if self.db_manager.check_traditional_data_exists(data_type, company_code, year=year):
-                            skipped_yearly_tasks += 1
-                            logger.debug(
-                                f"跳过已存在的年度数据 - 类型: {data_type}, 公司: {company_code}, 年份: {year}")
-                            continue
-
-                        task_config = {
-                            'data_type': data_type,
-                            'company_code': company_code,
-                            'year': year,
-                            'period_code': f"{year}-01",
-                            'priority': len(self.yearly_data_types) - self.yearly_data_types.index(data_type)
-                        }
-                        all_tasks_config.append(task_config)
-
-                processed_years.add(year)
-
-        logger.info(f"年度数据检查完成，跳过 {skipped_yearly_tasks} 个已存在的任务")
-
-        # 2. 处理按期间的数据，先过滤已存在的
-        skipped_period_tasks = 0
-        for period_code in period_codes:
-            year = period_code.split('-')[0]
-
-            for data_type in self.period_data_types:
-                for company_code in self.company_codes:
-                    if self.db_manager.check_traditional_data_exists(data_type, company_code, period_code=period_code):
-                        skipped_period_tasks += 1
-                        logger.debug(
-                            f"跳过已存在的期间数据 - 类型: {data_type}, 公司: {company_code}, 期间: {period_code}")
-                        continue
-
-                    task_config = {
-                        'data_type': data_type,
-                        'company_code': company_code,
-                        'year': year,
-                        'period_code': period_code,
-                        'priority': len(self.period_data_types) - self.period_data_types.index(data_type)
-                    }
-                    all_tasks_config.append(task_config)
-
-        logger.info(f"期间数据检查完成，跳过 {skipped_period_tasks} 个已存在的任务")
-
-        total_skipped = skipped_yearly_tasks + skipped_period_tasks
-        logger.info(f"初次启动数据去重完成：")
-        logger.info(f"  - 跳过的重复任务数: {total_skipped}")
-        logger.info(f"  - 实际需要执行的任务数: {len(all_tasks_config)}")
-
-        if not all_tasks_config:
-            logger.info("所有传统数据任务都已存在，无需重复处理")
-            return True
+        def tasks_config():
+            skipped = {'yearly': 0, 'period': 0}
+            yield from self._iter_missing_traditional_tasks(period_codes, skipped)
+            logger.info(f"初次启动数据去重完成：")
+            logger.info(f"  - 跳过的重复年度任务数: {skipped['yearly']}")
+            logger.info(f"  - 跳过的重复期间任务数: {skipped['period']}")
 
-        success = self.data_processor.add_processing_tasks_to_system(
+        success = self.data_processor.add_processing_task_source(
             self.system_manager,
-            all_tasks_config
+            "traditional_backfill",
+            tasks_config()
         )
 
         if success:
-            logger.info(f"成功添加 {len(all_tasks_config)} 个新的传统数据处理任务到队列")
+            logger.info("传统数据处理任务源已启动，任务将随处理进度逐步加入队列")
             return True
         else:
             logger.error("添加传统数据任务到队列时发生错误")
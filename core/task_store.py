@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 未完成的任务状态，重启后需要重放
+UNFINISHED_STATUSES = ("pending", "running", "retry")
+
+
+class SQLiteTaskStore:
+    """
+    SystemManager 的持久化任务队列（SQLite）
+
+    记录任务的入队、开始、完成与重试状态变化。任务函数无法序列化，
+    因此只保存处理器名称与 JSON 参数，重启后由 SystemManager 按名称查找已注册的处理器重放。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                name TEXT PRIMARY KEY,
+                handler TEXT NOT NULL,
+                args TEXT NOT NULL,
+                kwargs TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                max_retries INTEGER NOT NULL DEFAULT 3,
+                resources TEXT NOT NULL DEFAULT '[]',
+                depends_on TEXT NOT NULL DEFAULT '[]',
+                status TEXT NOT NULL,
+                retry_count INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                enqueued_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                updated_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+        logger.info(f"任务持久化存储已打开: {db_path}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def record_enqueue(self, name: str, handler: str, args: tuple, kwargs: Dict[str, Any], priority: int,
+                       max_retries: int, resources: tuple, depends_on: tuple = ()) -> bool:
+        """记录任务入队；参数无法序列化为 JSON 时不持久化并返回 False"""
+        try:
+            args_json = json.dumps(list(args), ensure_ascii=False)
+            kwargs_json = json.dumps(kwargs or {}, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"任务 {name} 参数无法序列化，不做持久化: {e}")
+            return False
+
+        now = time.time()
+        self._execute("""
+            INSERT INTO tasks (name, handler, args, kwargs, priority, max_retries, resources, depends_on, status,
+                               retry_count, error, enqueued_at, started_at, finished_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', 0, NULL, ?, NULL, NULL, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                handler = excluded.handler, args = excluded.args, kwargs = excluded.kwargs,
+                priority = excluded.priority, max_retries = excluded.max_retries,
+                resources = excluded.resources, depends_on = excluded.depends_on, status = 'pending',
+                retry_count = 0, error = NULL, enqueued_at = excluded.enqueued_at, started_at = NULL,
+                finished_at = NULL, updated_at = excluded.updated_at
+        """, (name, handler, args_json, kwargs_json, priority, max_retries, json.dumps(list(resources)),
+              json.dumps(list(depends_on or ())), now, now))
+        return True
+
+    def record_start(self, name: str) -> None:
+        now = time.time()
+        self._execute("UPDATE tasks SET status = 'running', started_at = ?, updated_at = ? WHERE name = ?",
+                      (now, now, name))
+
+    def record_retry(self, name: str, retry_count: int, error: str = None) -> None:
+        self._execute("UPDATE tasks SET status = 'retry', retry_count = ?, error = ?, updated_at = ? WHERE name = ?",
+                      (retry_count, error, time.time(), name))
+
+    def record_finish(self, name: str, status: str, error: str = None) -> None:
+        """记录任务结束（completed / failed / cancelled）"""
+        now = time.time()
+        self._execute("UPDATE tasks SET status = ?, error = ?, finished_at = ?, updated_at = ? WHERE name = ?",
+                      (status, error, now, now, name))
+
+    def load_unfinished(self) -> List[Dict[str, Any]]:
+        """读取需要重放的未完成任务，按优先级从高到低、入队时间从早到晚排序"""
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATUSES)
+        cursor = self._execute(f"""
+            SELECT name, handler, args, kwargs, priority, max_retries, resources, depends_on, status, retry_count
+            FROM tasks WHERE status IN ({placeholders})
+            ORDER BY priority DESC, enqueued_at ASC
+        """, UNFINISHED_STATUSES)
+        rows = []
+        for (name, handler, args, kwargs, priority, max_retries, resources, depends_on, status,
+             retry_count) in cursor.fetchall():
+            rows.append({
+                "name": name,
+                "handler": handler,
+                "args": tuple(json.loads(args)),
+                "kwargs": json.loads(kwargs),
+                "priority": priority,
+                "max_retries": max_retries,
+                "resources": tuple(json.loads(resources)),
+                "depends_on": tuple(json.loads(depends_on)),
+                "status": status,
+                "retry_count": retry_count
+            })
+        return rows
+
+    def is_completed(self, name: str, within_seconds: float) -> bool:
+        """任务是否在保留期内已成功完成"""
+        cursor = self._execute("SELECT 1 FROM tasks WHERE name = ? AND status = 'completed' AND finished_at >= ?",
+                               (name, time.time() - within_seconds))
+        return cursor.fetchone() is not None
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """删除结束时间早于保留期的任务记录"""
+        cursor = self._execute(
+            "DELETE FROM tasks WHERE status IN ('completed', 'failed', 'cancelled') AND finished_at < ?",
+            (time.time() - older_than_seconds,))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.warning(f"关闭任务持久化存储失败: {e}")
+
+
+def create_task_store(db_path: Optional[str]) -> Optional[SQLiteTaskStore]:
+    """按配置创建任务存储，路径为空时不启用持久化"""
+    if not db_path:
+        return None
+    try:
+        return SQLiteTaskStore(db_path)
+    except Exception as e:
+        logger.error(f"打开任务持久化存储 {db_path} 失败，使用内存队列: {e}")
+        return None
@@ -0,0 +1,301 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common.config import config_manager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FlushResult:
+    """一次批量写入的结果"""
+    table_name: str
+    row_count: int
+    success: bool
+    reason: str
+    duration: float
+    error: Optional[str] = None
+    # 写入成功、最终丢弃、放回缓冲区等待重试的记录数
+    written_count: int = 0
+    failed_count: int = 0
+    requeued_count: int = 0
+
+
+class BufferedTableWriter:
+    """
+    按表缓冲单条记录，达到行数、字节数或时间阈值后合并为一次 auto_create_and_save_data 写入
+
+    行数/字节数阈值在调用 add() 的线程中同步触发，时间阈值由后台守护线程触发；
+    进程退出时通过 atexit 写出剩余数据。每次写入的结果通过 on_flush 回调上报。
+
+    写入失败时把批次对半拆分重试：只有部分记录失败时继续拆分，定位并丢弃无法写入的记录；
+    两半都失败（多为数据库不可用）时把记录放回缓冲区，等下次写出时重试，
+    连续失败超过 max_retries 次或关闭写缓冲时才丢弃。
+    """
+
+    def __init__(self, db_manager=None, max_rows: int = None, max_bytes: int = None,
+                 flush_interval: float = None, if_exists: str = 'append',
+                 on_flush: Callable[[FlushResult], None] = None, max_retries: int = 3):
+        if db_manager is None:
+            from database.database_manager import DataBaseManager
+            db_manager = DataBaseManager()
+        self.db_manager = db_manager
+        self.max_rows = max_rows or int(config_manager.get('database.write_buffer_rows', 500) or 500)
+        self.max_bytes = max_bytes or int(config_manager.get('database.write_buffer_bytes', 4 * 1024 * 1024)
+                                          or 4 * 1024 * 1024)
+        self.flush_interval = flush_interval or float(config_manager.get('database.write_buffer_interval', 5) or 5)
+        self.if_exists = if_exists
+        self.on_flush = on_flush
+        self.max_retries = max_retries
+
+        # 表名 -> {'rows': [...], 'bytes': int, 'since': 首条记录进入缓冲的时间, 'retries': 连续整批失败次数}
+        self._buffers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # 同一张表的写入串行执行，保证写入顺序与 add 顺序一致
+        self._table_flush_locks: Dict[str, threading.Lock] = {}
+        self._stats = {'rows_added': 0, 'rows_written': 0, 'rows_failed': 0, 'rows_requeued': 0, 'flushes': 0,
+                       'failed_flushes': 0}
+
+        self._closed = False
+        self._stop_event = threading.Event()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="BufferedTableWriter", daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.close)
+
+    def add(self, table_name: str, row: Dict[str, Any]) -> bool:
+        """
+        添加一条记录到缓冲区
+
+        Returns:
+            bool: 是否已接收（写入结果通过 on_flush 回调上报）
+        """
+        return self.add_many(table_name, [row])
+
+    def add_many(self, table_name: str, rows: List[Dict[str, Any]]) -> bool:
+        """批量添加记录到缓冲区"""
+        if self._closed:
+            logger.error(f"写缓冲已关闭，拒绝写入表 {table_name} 的 {len(rows)} 条记录")
+            return False
+        if not rows:
+            return True
+
+        size = sum(self._estimate_size(row) for row in rows)
+        with self._lock:
+            buffer = self._buffers.setdefault(table_name, {'rows': [], 'bytes': 0, 'since': time.monotonic(),
+                                                           'retries': 0})
+            if not buffer['rows']:
+                buffer['since'] = time.monotonic()
+            buffer['rows'].extend(rows)
+            buffer['bytes'] += size
+            self._stats['rows_added'] += len(rows)
+
+            if buffer['retries']:
+                # 上次写出整批失败、记录已放回缓冲区，等后台线程按时间阈值重试，避免每次添加都重试
+                reason = None
+            elif len(buffer['rows']) >= self.max_rows:
+                reason = 'rows'
+            elif buffer['bytes'] >= self.max_bytes:
+                reason = 'bytes'
+            else:
+                reason = None
+
+        if reason:
+            self.flush(table_name, reason=reason)
+        return True
+
+    def flush(self, table_name: str = None, reason: str = 'manual') -> List[FlushResult]:
+        """
+        立即写出缓冲区数据
+
+        Args:
+            table_name: 指定表名，None 表示写出所有表
+            reason: 触发原因，记录在 FlushResult 中
+
+        Returns:
+            List[FlushResult]: 每张表的写入结果
+        """
+        with self._lock:
+            table_names = [table_name] if table_name else list(self._buffers.keys())
+
+        results = []
+        for name in table_names:
+            result = self._flush_table(name, reason)
+            if result:
+                results.append(result)
+        return results
+
+    def _flush_table(self, table_name: str, reason: str) -> Optional[FlushResult]:
+        with self._lock:
+            flush_lock = self._table_flush_locks.setdefault(table_name, threading.Lock())
+
+        with flush_lock:
+            with self._lock:
+                buffer = self._buffers.get(table_name)
+                if not buffer or not buffer['rows']:
+                    return None
+                rows = buffer['rows']
+                retries = buffer['retries']
+                buffer['rows'] = []
+                buffer['bytes'] = 0
+
+            start_time = time.time()
+            written, failed, requeue, error = self._write_with_split(table_name, rows)
+            if requeue and (reason == 'close' or retries >= self.max_retries):
+                failed.extend(requeue)
+                requeue = []
+
+            with self._lock:
+                buffer = self._buffers[table_name]
+                if requeue:
+                    # 放回缓冲区头部，保持写入顺序；等下一个时间阈值再重试
+                    buffer['rows'][:0] = requeue
+                    buffer['bytes'] += sum(self._estimate_size(row) for row in requeue)
+                    buffer['since'] = time.monotonic()
+                    buffer['retries'] = retries + 1
+                else:
+                    buffer['retries'] = 0
+
+            result = FlushResult(
+                table_name=table_name,
+                row_count=len(rows),
+                success=written == len(rows),
+                reason=reason,
+                duration=time.time() - start_time,
+                error=error,
+                written_count=written,
+                failed_count=len(failed),
+                requeued_count=len(requeue)
+            )
+
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['rows_written'] += result.written_count
+            self._stats['rows_failed'] += result.failed_count
+            self._stats['rows_requeued'] += result.requeued_count
+            if not result.success:
+                self._stats['failed_flushes'] += 1
+
+        if result.success:
+            logger.info(f"批量写入表 {table_name} {result.row_count} 条记录 (触发: {reason}, 耗时: {result.duration:.2f}秒)")
+        else:
+            logger.error(f"批量写入表 {table_name} 部分或全部失败 (触发: {reason}): 成功 {result.written_count} 条, "
+                         f"丢弃 {result.failed_count} 条, 待重试 {result.requeued_count} 条, 错误: {error}")
+
+        if self.on_flush:
+            try:
+                self.on_flush(result)
+            except Exception as e:
+                logger.warning(f"写入结果回调执行失败: {e}")
+        return result
+
+    def _save_rows(self, table_name: str, rows: List[Dict[str, Any]]) -> Tuple[bool, Optional[str]]:
+        try:
+            return bool(self.db_manager.auto_create_and_save_data(rows, table_name, if_exists=self.if_exists)), None
+        except Exception as e:
+            return False, str(e)
+
+    def _write_with_split(self, table_name: str, rows: List[Dict[str, Any]]):
+        """
+        写入一个批次，失败时对半拆分重试
+
+        Returns:
+            tuple: (成功写入条数, 无法写入而丢弃的记录, 需放回缓冲区的记录, 最后一次错误)
+        """
+        success, error = self._save_rows(table_name, rows)
+        if success:
+            return len(rows), [], [], None
+        if len(rows) == 1:
+            return 0, [], rows, error
+
+        mid = len(rows) // 2
+        halves = [rows[:mid], rows[mid:]]
+        outcomes = [self._save_rows(table_name, half) for half in halves]
+        if not any(ok for ok, _ in outcomes):
+            # 两半都失败，更可能是数据库不可用而非个别坏数据，整体等待重试
+            return 0, [], rows, outcomes[-1][1] or error
+
+        written, failed = 0, []
+        for half, (ok, half_error) in zip(halves, outcomes):
+            if ok:
+                written += len(half)
+                continue
+            error = half_error or error
+            half_written, half_failed = self._isolate_bad_rows(table_name, half)
+            written += half_written
+            failed.extend(half_failed)
+        return written, failed, [], error
+
+    def _isolate_bad_rows(self, table_name: str, rows: List[Dict[str, Any]]):
+        """已知数据库可用时二分定位写入失败的记录，返回 (成功写入条数, 失败记录)"""
+        if len(rows) == 1:
+            return 0, rows
+        mid = len(rows) // 2
+        written, failed = 0, []
+        for half in (rows[:mid], rows[mid:]):
+            ok, _ = self._save_rows(table_name, half)
+            if ok:
+                written += len(half)
+            else:
+                half_written, half_failed = self._isolate_bad_rows(table_name, half)
+                written += half_written
+                failed.extend(half_failed)
+        return written, failed
+
+    def _flush_loop(self):
+        """后台线程：写出超过时间阈值的缓冲区"""
+        check_interval = min(1.0, self.flush_interval)
+        while not self._stop_event.wait(check_interval):
+            now = time.monotonic()
+            with self._lock:
+                expired = [name for name, buffer in self._buffers.items()
+                           if buffer['rows'] and now - buffer['since'] >= self.flush_interval]
+            for table_name in expired:
+                try:
+                    self._flush_table(table_name, 'time')
+                except Exception as e:
+                    logger.error(f"定时写出表 {table_name} 时发生错误: {e}")
+
+    def _estimate_size(self, row: Dict[str, Any]) -> int:
+        try:
+            return len(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'))
+        except Exception:
+            return len(str(row))
+
+    def pending_rows(self, table_name: str = None) -> int:
+        """缓冲区中尚未写出的记录数"""
+        with self._lock:
+            if table_name:
+                buffer = self._buffers.get(table_name)
+                return len(buffer['rows']) if buffer else 0
+            return sum(len(buffer['rows']) for buffer in self._buffers.values())
+
+    def get_statistics(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_rows'] = sum(len(buffer['rows']) for buffer in self._buffers.values())
+        return stats
+
+    def close(self) -> List[FlushResult]:
+        """停止后台线程并写出剩余数据，可重复调用"""
+        if self._closed:
+            return []
+        self._closed = True
+        self._stop_event.set()
+        if self._flush_thread.is_alive() and self._flush_thread is not threading.current_thread():
+            self._flush_thread.join(timeout=5)
+        try:
+            atexit.unregister(self.close)
+        except Exception:
+            pass
+        return self.flush(reason='close')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
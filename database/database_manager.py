@@ -1,13 +1,16 @@
+import json
 import logging
 import os
 import cx_Oracle
 import pandas as pd
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import threading
 import time
 from common.config import config_manager
 import re
+from contextlib import contextmanager
+from utils.process_pool import submit_cpu_bound
 
 load_dotenv()
 
@@ -19,14 +22,74 @@ ALWAYS_STRING_COLUMNS = {
     'TASKID', 'TASK_NAME', 'TASKNAME'
 }
 
+# 单值字符串/CLOB 的安全上限（字符数）
+MAX_VALUE_CHARS = 1024 * 1024
+
+# 表结构元数据整体刷新失败后的重试间隔（秒）
+METADATA_RETRY_BACKOFF_SECONDS = 60
+
+# 整列日期识别使用的格式，与 _process_date_value 中的模式保持一致
+COLUMN_DATE_FORMATS = [
+    (r'^\d{4}-\d{2}-\d{2}$', '%Y-%m-%d'),
+    (r'^\d{4}/\d{2}/\d{2}$', '%Y/%m/%d'),
+    (r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', '%Y-%m-%d %H:%M:%S'),
+    (r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$', '%Y-%m-%dT%H:%M:%S'),
+    (r'^\d{2}/\d{2}/\d{4}$', '%m/%d/%Y'),
+    (r'^\d{2}-\d{2}-\d{4}$', '%m-%d-%Y'),
+]
+# 带毫秒的 ISO 格式由 pandas 逐个解析
+ISO_MICROSECOND_PATTERN = r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+Z?$'
+
+# 传统财务数据判重使用的键列：按年份、按期间或仅按公司
+TRADITIONAL_COVERAGE_KEYS = {
+    'account_structure': ('company_code', 'year'),
+    'subject_dimension': ('company_code', 'year'),
+    'customer_vendor': ('company_code',),
+    'voucher_list': ('company_code', 'period_code'),
+    'voucher_detail': ('company_code', 'period_code'),
+    'voucher_dim_detail': ('company_code', 'period_code'),
+    'balance': ('company_code', 'period_code'),
+    'aux_balance': ('company_code', 'period_code'),
+}
+
+
+def prepare_batch_rows(batch_df: pd.DataFrame, column_infos: List[Optional[Dict]]) -> List[tuple]:
+    """按列类型准备一批插入行；纯函数，可在进程池中执行"""
+    return DataBaseManager()._prepare_batch_rows(batch_df, column_infos)
+
+
+class _PinnedConnection:
+    """线程固定连接的代理：close() 不归还连接，由 pinned_connection() 退出时统一归还"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
 
 class DataBaseManager:
+    # 当前线程通过 pinned_connection() 固定的连接
+    _thread_local = threading.local()
     # 类级别的锁，用于防止并发创建表
     _table_creation_locks = {}
     _locks_lock = threading.Lock()
     # 表存在性缓存，避免重复查询
     _table_exists_cache = {}
     _cache_lock = threading.Lock()
+    # 进程级共享的会话池，所有实例共用，避免每次操作都新建连接
+    _session_pool = None
+    _pool_lock = threading.Lock()
+    # 表结构元数据缓存：大写表名 -> {'columns': [...], 'by_name': {大写列名: 列信息}}
+    _metadata_cache = {}
+    _metadata_loaded_at = None
+    _metadata_lock = threading.Lock()
+    # 整体刷新只由一个线程执行；刷新失败后在 _metadata_retry_at 之前不再重试
+    _metadata_refresh_lock = threading.Lock()
+    _metadata_retry_at = 0.0
 
     def __init__(self):
         pass
@@ -66,8 +129,87 @@ class DataBaseManager:
 
         return ob_username, password, ob_connection
 
+    def _get_pool_settings(self) -> Dict[str, int]:
+        """读取会话池配置（最小/最大连接数、增量、获取超时、取连接时探活间隔、语句缓存大小）"""
+        return {
+            'min': int(config_manager.get('database.pool_min', 2)),
+            'max': int(config_manager.get('database.pool_max', 20)),
+            'increment': int(config_manager.get('database.pool_increment', 1)),
+            # 获取连接的最长等待时间（秒）
+            'timeout': int(config_manager.get('database.pool_timeout', 30)),
+            # 连接空闲超过该秒数后，取出时先 ping 一次；0 表示每次取出都 ping
+            'ping_interval': int(config_manager.get('database.pool_ping_interval', 60)),
+            'stmt_cache_size': int(config_manager.get('database.stmt_cache_size', 50)),
+        }
+
+    def _get_session_pool(self):
+        """获取进程级共享会话池，首次调用时创建"""
+        pool = DataBaseManager._session_pool
+        if pool is not None:
+            return pool
+
+        with DataBaseManager._pool_lock:
+            if DataBaseManager._session_pool is None:
+                username, password, oracle_connection = self._get_ob_connection_params()
+                settings = self._get_pool_settings()
+                DataBaseManager._session_pool = cx_Oracle.SessionPool(
+                    user=username,
+                    password=password,
+                    dsn=oracle_connection,
+                    min=settings['min'],
+                    max=settings['max'],
+                    increment=settings['increment'],
+                    threaded=True,
+                    getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT,
+                    wait_timeout=settings['timeout'] * 1000,
+                    ping_interval=settings['ping_interval'],
+                    stmtcachesize=settings['stmt_cache_size']
+                )
+                logger.info(f"OceanBase 会话池已创建: min={settings['min']}, max={settings['max']}, "
+                            f"increment={settings['increment']}, timeout={settings['timeout']}s")
+            return DataBaseManager._session_pool
+
+    @contextmanager
+    def pinned_connection(self):
+        """
+        在当前线程内固定一个连接：范围内所有 connect() 都返回同一连接，conn.close() 不再归还，
+        退出最外层范围时才归还到会话池。用于组合任务连续写入多张表，避免反复取还连接。
+        """
+        local = DataBaseManager._thread_local
+        if getattr(local, 'connection', None) is not None:
+            # 嵌套调用沿用外层固定的连接
+            yield local.connection
+            return
+
+        conn = self._acquire_connection()
+        local.connection = _PinnedConnection(conn) if conn is not None else None
+        try:
+            yield local.connection
+        finally:
+            local.connection = None
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.warning(f"归还固定连接失败: {e}")
+
     def connect(self):
+        """从共享会话池获取连接；调用方 conn.close() 即归还到池中（线程固定连接除外）"""
+        pinned = getattr(DataBaseManager._thread_local, 'connection', None)
+        if pinned is not None:
+            return pinned
+        return self._acquire_connection()
+
+    def _acquire_connection(self):
+        try:
+            pool = self._get_session_pool()
+        except Exception as e:
+            logger.warning(f"创建 OceanBase 会话池失败，改用独立连接: {e}")
+            pool = None
+
         try:
+            if pool is not None:
+                return pool.acquire()
             username, password, oracle_connection = self._get_ob_connection_params()
             conn = cx_Oracle.connect(username, password, oracle_connection)
             return conn
@@ -75,6 +217,22 @@ class DataBaseManager:
             logger.error(f"OceanBase 连接失败: {e}")
             return None
 
+    def get_pool_status(self) -> Dict[str, Any]:
+        """获取会话池状态，用于监控"""
+        pool = DataBaseManager._session_pool
+        if pool is None:
+            return {'enabled': False}
+        try:
+            return {
+                'enabled': True,
+                'opened': pool.opened,
+                'busy': pool.busy,
+                'max': pool.max,
+                'min': pool.min
+            }
+        except Exception as e:
+            return {'enabled': True, 'error': str(e)}
+
     def _generate_column_definition(self, dtype, column_data=None, column_name=None) -> str:
         # 如果字段名为REPORTS、REPORT或RAW_DATA，强制使用CLOB类型
         if column_name and column_name.upper() in ['REPORTS', 'REPORT', 'RAW_DATA']:
@@ -211,8 +369,6 @@ class DataBaseManager:
             cursor = conn.cursor()
 
             table_structure = self._get_table_structure(table_name, conn)
-            # 去除 ID 列用于对齐索引
-            data_table_structure = [col for col in table_structure if col['column_name'] != 'ID']
 
             # 生成唯一列名（与创建时算法一致）
             unique_names, mapping = self._generate_unique_clean_names(list(df.columns))
@@ -221,31 +377,31 @@ class DataBaseManager:
             placeholders = ', '.join([':' + str(i + 1) for i in range(len(df.columns))])
             insert_sql = f'INSERT INTO "{table_name}" ({", ".join(cleaned_columns)}) VALUES ({placeholders})'
 
+            # 按列名对齐表结构，得到每一列的类型/长度信息
+            structure_by_name = {col['column_name']: col for col in table_structure}
+            column_infos = [structure_by_name.get(name) for name in unique_names]
+
             batch_size = min(5000, len(df))
             total_rows = len(df)
             total_inserted = 0
 
             logger.info(f"开始分批次插入数据到表 {table_name}，总记录数: {total_rows}，批次大小: {batch_size}")
 
+            # 行数据准备是纯 CPU 计算：数据量较大时在进程池中准备下一批，与当前批次的写入重叠
+            def submit_batch(batch_start):
+                batch_df = df.iloc[batch_start:min(batch_start + batch_size, total_rows)]
+                return submit_cpu_bound(prepare_batch_rows, batch_df, column_infos,
+                                        size=total_rows * len(column_infos))
+
+            next_batch = submit_batch(0)
+
             # 分批处理数据
             for start_idx in range(0, total_rows, batch_size):
                 end_idx = min(start_idx + batch_size, total_rows)
-                batch_df = df.iloc[start_idx:end_idx]
 
-                batch_data = []
-                for _, row in batch_df.iterrows():
-                    row_data = []
-                    for i, raw_value in enumerate(row):
-                        try:
-                            processed_value = self._process_data_value(raw_value)
-                            # 表结构长度校验（避免索引越界）
-                            if i < len(data_table_structure):
-                                column_info = data_table_structure[i]
-                                processed_value = self._validate_and_truncate_value(processed_value, column_info)
-                            row_data.append(processed_value)
-                        except Exception:
-                            row_data.append(None)
-                    batch_data.append(tuple(row_data))
+                batch_data = next_batch.result()
+                if end_idx < total_rows:
+                    next_batch = submit_batch(end_idx)
 
                 try:
                     cursor.executemany(insert_sql, batch_data)
@@ -271,6 +427,105 @@ class DataBaseManager:
             return False
 
     def _get_table_structure(self, table_name: str, conn) -> List[Dict]:
+        metadata = self._get_table_metadata(table_name, conn)
+        return list(metadata['columns']) if metadata else []
+
+    def _get_metadata_ttl(self) -> int:
+        return int(config_manager.get('database.metadata_ttl_seconds', 1800) or 1800)
+
+    def refresh_metadata_cache(self, conn=None) -> bool:
+        """
+        一次查询加载当前用户下所有表的列结构，替换元数据缓存
+
+        Args:
+            conn: 可选的已有连接，未传入时从会话池获取
+
+        Returns:
+            bool: 是否加载成功
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = self.connect()
+            if not conn:
+                DataBaseManager._metadata_retry_at = time.monotonic() + METADATA_RETRY_BACKOFF_SECONDS
+                logger.warning(f"获取数据库连接失败，{METADATA_RETRY_BACKOFF_SECONDS} 秒内不再整体刷新表结构元数据")
+                return False
+        try:
+            cursor = conn.cursor()
+            cursor.arraysize = 5000
+            cursor.execute("""
+                SELECT t.table_name, c.column_name, c.data_type, c.data_length, c.char_length
+                FROM user_tables t
+                LEFT JOIN user_tab_columns c ON c.table_name = t.table_name
+                ORDER BY t.table_name, c.column_id
+            """)
+            cache = {}
+            for table_name, column_name, data_type, data_length, char_length in cursor.fetchall():
+                metadata = cache.setdefault(table_name.upper(), {'columns': [], 'by_name': {}})
+                if column_name is None:
+                    continue
+                column_info = {
+                    'column_name': column_name,
+                    'data_type': data_type,
+                    'data_length': data_length,
+                    'char_length': char_length
+                }
+                metadata['columns'].append(column_info)
+                metadata['by_name'][column_name.upper()] = column_info
+            cursor.close()
+
+            with self._metadata_lock:
+                DataBaseManager._metadata_cache = cache
+                DataBaseManager._metadata_loaded_at = time.monotonic()
+                DataBaseManager._metadata_retry_at = 0.0
+            logger.info(f"表结构元数据缓存已加载，共 {len(cache)} 张表")
+            return True
+
+        except Exception as e:
+            DataBaseManager._metadata_retry_at = time.monotonic() + METADATA_RETRY_BACKOFF_SECONDS
+            logger.warning(f"加载表结构元数据缓存失败，{METADATA_RETRY_BACKOFF_SECONDS} 秒内不再整体刷新: {e}")
+            return False
+        finally:
+            if own_conn:
+                conn.close()
+
+    def _is_metadata_fresh(self) -> bool:
+        loaded_at = self._metadata_loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self._get_metadata_ttl()
+
+    def _refresh_metadata_if_stale(self, conn=None) -> None:
+        """
+        缓存过期时由一个线程整体刷新，其他线程不等待、继续使用旧快照（未命中的表单表加载）；
+        上次刷新失败后在退避期内不再刷新
+        """
+        if self._is_metadata_fresh() or time.monotonic() < DataBaseManager._metadata_retry_at:
+            return
+        if not DataBaseManager._metadata_refresh_lock.acquire(blocking=False):
+            return
+        try:
+            # 获取锁期间其他线程可能已完成刷新
+            if not self._is_metadata_fresh() and time.monotonic() >= DataBaseManager._metadata_retry_at:
+                self.refresh_metadata_cache(conn)
+        finally:
+            DataBaseManager._metadata_refresh_lock.release()
+
+    def _get_table_metadata(self, table_name: str, conn=None) -> Dict:
+        """从元数据缓存获取表结构，缓存过期时整体刷新，未命中时单表加载"""
+        self._refresh_metadata_if_stale(conn)
+
+        with self._metadata_lock:
+            metadata = self._metadata_cache.get(table_name.upper())
+        if metadata is not None:
+            return metadata
+        return self._load_table_metadata(table_name, conn)
+
+    def _load_table_metadata(self, table_name: str, conn=None) -> Dict:
+        """查询单张表的列结构并写入缓存，表不存在时返回 None"""
+        own_conn = conn is None
+        if own_conn:
+            conn = self.connect()
+            if not conn:
+                return None
         try:
             cursor = conn.cursor()
             sql = """
@@ -281,21 +536,43 @@ class DataBaseManager:
             """
             cursor.execute(sql, {"table_name": table_name})
 
-            structure = []
+            metadata = {'columns': [], 'by_name': {}}
             for row in cursor.fetchall():
-                structure.append({
+                column_info = {
                     'column_name': row[0],
                     'data_type': row[1],
                     'data_length': row[2],
                     'char_length': row[3]
-                })
-
+                }
+                metadata['columns'].append(column_info)
+                metadata['by_name'][row[0].upper()] = column_info
             cursor.close()
-            return structure
+
+            if not metadata['columns']:
+                return None
+            with self._metadata_lock:
+                self._metadata_cache[table_name.upper()] = metadata
+            return metadata
 
         except Exception as e:
             logger.warning(f"获取表结构失败: {e}")
-            return []
+            return None
+        finally:
+            if own_conn:
+                conn.close()
+
+    def _update_column_metadata(self, table_name: str, column_name: str, **changes):
+        """DDL 修改列定义后就地更新缓存"""
+        with self._metadata_lock:
+            metadata = self._metadata_cache.get(table_name.upper())
+            column_info = metadata['by_name'].get(column_name.upper()) if metadata else None
+            if column_info is not None:
+                column_info.update(changes)
+
+    def _invalidate_table_metadata(self, table_name: str):
+        """删除表后移除其元数据缓存"""
+        with self._metadata_lock:
+            self._metadata_cache.pop(table_name.upper(), None)
 
     def _validate_and_truncate_value(self, value, column_info: Dict):
         if value is None:
@@ -328,6 +605,164 @@ class DataBaseManager:
 
         return value
 
+    def _prepare_batch_rows(self, batch_df: pd.DataFrame, column_infos: List[Dict]) -> List[tuple]:
+        """按列准备一个批次的数据：每列只分类一次并整列转换，最后按行拼成 executemany 所需的元组"""
+        batch_df = batch_df.reset_index(drop=True)
+        columns = []
+        for i in range(batch_df.shape[1]):
+            column_info = column_infos[i] if i < len(column_infos) else None
+            columns.append(self._prepare_column_values(batch_df.iloc[:, i], column_info))
+        return list(zip(*columns))
+
+    def _classify_column(self, series: pd.Series) -> str:
+        """根据 dtype 与非空值的实际类型确定整列的转换方式"""
+        dtype = series.dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            return 'bool'
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return 'datetime'
+        if pd.api.types.is_numeric_dtype(dtype):
+            return 'numeric'
+
+        values = series.dropna()
+        if values.empty:
+            return 'empty'
+        value_types = set(map(type, values))
+        if value_types <= {str}:
+            return 'string'
+        if value_types <= {dict, list, tuple}:
+            return 'json'
+        if value_types <= {int, float}:
+            return 'numeric'
+        return 'mixed'
+
+    def _prepare_column_values(self, series: pd.Series, column_info: Dict = None) -> List[Any]:
+        """整列转换并做长度校验，结果与逐值调用 _process_data_value/_validate_and_truncate_value 一致"""
+        try:
+            kind = self._classify_column(series)
+            notna = series.notna()
+
+            if kind == 'empty':
+                return [None] * len(series)
+            if kind == 'bool':
+                values = series.map({True: '1', False: '0'}).astype(object)
+            elif kind == 'datetime':
+                values = series.astype(object)
+            elif kind == 'numeric':
+                values = series.astype(object)
+            elif kind == 'json':
+                values = series.map(self._serialize_json_value, na_action='ignore').astype(object)
+            elif kind == 'string':
+                values = self._prepare_string_column(series)
+            else:
+                values = series.map(self._process_data_value).astype(object)
+
+            values = values.where(notna & values.notna(), None)
+            if column_info:
+                values = self._apply_column_limits(values, column_info)
+            return values.tolist()
+
+        except Exception as e:
+            logger.warning(f"整列转换列 {series.name} 失败，回退为逐值处理: {e}")
+            return [self._prepare_single_value(value, column_info) for value in series]
+
+    def _prepare_single_value(self, value, column_info: Dict = None):
+        """逐值处理的兜底路径，任何异常均返回 None"""
+        try:
+            processed_value = self._process_data_value(value)
+            if column_info:
+                processed_value = self._validate_and_truncate_value(processed_value, column_info)
+            return processed_value
+        except Exception:
+            return None
+
+    def _serialize_json_value(self, value):
+        """字典/列表序列化为 JSON 字符串，空列表视为 None"""
+        if isinstance(value, (list, tuple)) and len(value) == 0:
+            return None
+        try:
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        except Exception as e:
+            logger.warning(f"JSON序列化失败: {e}，使用字符串转换")
+            return str(value)
+
+    def _prepare_string_column(self, series: pd.Series) -> pd.Series:
+        """字符串列：无效日期置空、超长截断、日期样式的字符串整列解析为 datetime"""
+        values = series.astype(object)
+        text = series.dropna().astype(str)
+        stripped = text.str.strip()
+
+        # 月/日越界的无效日期（如 2024-13-99）置空
+        date_parts = stripped.str.extract(r'^(\d{4})-(\d{2})-(\d{2})')
+        month = pd.to_numeric(date_parts[1], errors='coerce')
+        day = pd.to_numeric(date_parts[2], errors='coerce')
+        invalid = month.notna() & ((month < 1) | (month > 12) | (day < 1) | (day > 31))
+        values[invalid[invalid].index] = None
+
+        # 超长字符串截断，且不再做日期解析
+        too_long = text.str.len() > MAX_VALUE_CHARS
+        if too_long.any():
+            logger.warning(f"列 {series.name} 有 {int(too_long.sum())} 个值超过1MB，截断到1MB")
+            values[too_long[too_long].index] = text[too_long].str.slice(0, MAX_VALUE_CHARS)
+
+        candidates = stripped[~invalid & ~too_long]
+        for pattern, date_format in COLUMN_DATE_FORMATS:
+            matched = candidates[candidates.str.match(pattern)]
+            if matched.empty:
+                continue
+            parsed = pd.to_datetime(matched, format=date_format, errors='coerce')
+            reasonable = parsed.notna() & parsed.dt.year.between(1900, 2100)
+            if reasonable.any():
+                converted = parsed[reasonable].astype(object)
+                values[converted.index] = converted
+
+        iso_matched = candidates[candidates.str.match(ISO_MICROSECOND_PATTERN)]
+        for index, value in iso_matched.items():
+            values[index] = self._process_date_value(series[index])
+
+        return values
+
+    def _apply_column_limits(self, values: pd.Series, column_info: Dict) -> pd.Series:
+        """
+        整列执行与 _validate_and_truncate_value 相同的 VARCHAR/CLOB 长度限制
+
+        与逐值版本一致只处理字符串值；数值、日期等写入字符列的值原样保留，由驱动转换
+        """
+        data_type = column_info.get('data_type') or ''
+        char_length = column_info.get('char_length') or 0
+        data_length = column_info.get('data_length') or 0
+        if not (data_type.startswith('VARCHAR') or data_type == 'CLOB'):
+            return values
+
+        strings = values[values.map(lambda value: isinstance(value, str))]
+        if strings.empty:
+            return values
+
+        if data_type.startswith('VARCHAR'):
+            max_length = char_length if char_length > 0 else data_length
+            if not max_length:
+                return values
+            char_counts = strings.str.len()
+            # UTF-8 单字符最多 4 字节，只有可能超限的值才需要计算字节长度
+            suspects = strings[char_counts * 4 > max_length]
+            if suspects.empty:
+                return values
+            byte_counts = suspects.str.encode('utf-8').str.len()
+            overflow = suspects[(byte_counts > max_length) | (suspects.str.len() > max_length)]
+            if not overflow.empty:
+                logger.warning(f"列 {column_info['column_name']} 有 {len(overflow)} 个值超过最大长度 {max_length}，进行截断")
+                values = values.copy()
+                values[overflow.index] = overflow.map(
+                    lambda text: self._safe_truncate_string_by_bytes(text, max_length))
+            return values
+
+        overflow = strings[strings.str.len() > MAX_VALUE_CHARS]
+        if not overflow.empty:
+            logger.warning(f"列 {column_info['column_name']} 有 {len(overflow)} 个CLOB值超出1MB，截断到1MB")
+            values = values.copy()
+            values[overflow.index] = overflow.str.slice(0, MAX_VALUE_CHARS)
+        return values
+
     def execute_sql(self, sql: str, params: Dict[str, Any] = None) -> bool:
         conn = self.connect()
         if not conn:
@@ -346,6 +781,9 @@ class DataBaseManager:
         except Exception as e:
             logger.error(f"执行SQL语句时发生错误: {e}")
             return False
+        finally:
+            if conn:
+                conn.close()
 
     def table_exists(self, table_name: str) -> bool:
         """
@@ -357,6 +795,14 @@ class DataBaseManager:
         if cached_exists is not None:
             return cached_exists
 
+        # 元数据缓存中已有该表时无需再查询字典视图
+        if self._is_metadata_fresh():
+            with self._metadata_lock:
+                in_metadata = table_name.upper() in self._metadata_cache
+            if in_metadata:
+                self._update_table_cache(table_name, True)
+                return True
+
         conn = self.connect()
         if not conn:
             return False
@@ -394,6 +840,8 @@ class DataBaseManager:
 
             # 创建成功后立即更新缓存
             self._update_table_cache(table_name, True)
+            self._invalidate_table_metadata(table_name)
+            self._load_table_metadata(table_name, conn)
             logger.info(f"成功创建表 {table_name}")
             return True
 
@@ -432,6 +880,8 @@ class DataBaseManager:
                     return False
             elif if_exists == 'replace':
                 self.execute_sql(f'DROP TABLE "{table_name}"')
+                self._update_table_cache(table_name, False)
+                self._invalidate_table_metadata(table_name)
                 if not self._safe_create_table(df, table_name, conn):
                     return False
                 logger.info(f"表 {table_name} 已被替换")
@@ -490,6 +940,8 @@ class DataBaseManager:
                         try:
                             logger.info(f"修改列 {cleaned} 类型为 VARCHAR2(255) 以兼容字符串数据 (表 {table_name})")
                             cursor.execute(f'ALTER TABLE "{table_name}" MODIFY ("{cleaned}" VARCHAR2(255))')
+                            self._update_column_metadata(table_name, cleaned, data_type='VARCHAR2',
+                                                         data_length=255, char_length=255)
                             altered = True
                         except Exception as e:
                             logger.warning(f"修改列 {cleaned} 类型失败: {e}")
@@ -647,6 +1099,12 @@ class DataBaseManager:
         if not self.table_exists(table_name):
             return False
 
+        return self.check_data_exists(table_name, self._traditional_partition_conditions(
+            data_type, company_code, year, period_code))
+
+    def _traditional_partition_conditions(self, data_type: str, company_code: str, year: str = None,
+                                          period_code: str = None) -> Dict[str, Any]:
+        """传统财务数据分区（公司 + 年份或期间）的查询条件"""
         conditions = {
             'company_code': company_code
         }
@@ -664,7 +1122,192 @@ class DataBaseManager:
             # 客商数据只需要公司代码
             pass
 
-        return self.check_data_exists(table_name, conditions)
+        return conditions
+
+    def delete_traditional_data(self, data_type: str, company_code: str, year: str = None,
+                                period_code: str = None, processing_status: str = None) -> Optional[int]:
+        """
+        删除传统财务数据的一个分区，processing_status 非空时只删除该状态的行（如重新检查的暂存行）
+
+        Returns:
+            int: 删除的行数，表不存在时为 0；失败时返回 None
+        """
+        conditions = self._traditional_partition_conditions(data_type, company_code, year, period_code)
+        if processing_status is not None:
+            conditions['processing_status'] = processing_status
+        return self.delete_data(f"raw_{data_type}", conditions)
+
+    def delete_data(self, table_name: str, conditions: Dict[str, Any]) -> Optional[int]:
+        """
+        按条件删除数据；任一条件列在表中不存在时不执行删除，避免误删条件之外的数据
+
+        Returns:
+            int: 删除的行数，表不存在时为 0；失败时返回 None
+        """
+        if not conditions:
+            logger.error(f"删除表 {table_name} 数据时未提供条件，拒绝执行")
+            return None
+        if not self.table_exists(table_name):
+            return 0
+
+        conn = self.connect()
+        if not conn:
+            return None
+
+        try:
+            where = self._build_where_clause(table_name, conditions, conn)
+            if where is None:
+                return None
+            where_sql, params = where
+
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f'DELETE FROM "{table_name}" WHERE {where_sql}', params)
+                deleted = cursor.rowcount
+                conn.commit()
+            finally:
+                cursor.close()
+            logger.info(f"删除表 {table_name} 数据 {deleted} 行, 条件: {conditions}")
+            return deleted
+        except Exception as e:
+            logger.error(f"删除表 {table_name} 数据时发生错误: {e}")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return None
+        finally:
+            conn.close()
+
+    def promote_staged_traditional_data(self, data_type: str, company_code: str, year: str = None,
+                                        period_code: str = None, staged_status: str = 'staging') -> Optional[int]:
+        """
+        在同一事务中删除分区的现有数据，并把 processing_status 为 staged_status 的暂存数据转为正式数据（raw）
+
+        用于重新检查模式整体替换分区：新数据全部写入成功后才替换，失败时旧数据保持不变。
+
+        Returns:
+            int: 删除的旧数据行数；失败时返回 None（事务回滚）
+        """
+        table_name = f"raw_{data_type}"
+        conditions = self._traditional_partition_conditions(data_type, company_code, year, period_code)
+        conn = self.connect()
+        if not conn:
+            return None
+
+        try:
+            where = self._build_where_clause(table_name, conditions, conn)
+            status_info = self._get_table_metadata(table_name, conn)['by_name'].get(
+                self._clean_column_name('processing_status')) if where is not None else None
+            if status_info is None:
+                logger.error(f"表 {table_name} 缺少分区条件列或 processing_status 列，拒绝替换分区")
+                return None
+            partition_sql, params = where
+            status_column = status_info['column_name']
+            params['staged_status'] = staged_status
+
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f'DELETE FROM "{table_name}" WHERE {partition_sql} '
+                               f'AND ("{status_column}" IS NULL OR "{status_column}" <> :staged_status)', params)
+                deleted = cursor.rowcount
+                cursor.execute(f'UPDATE "{table_name}" SET "{status_column}" = \'raw\' '
+                               f'WHERE {partition_sql} AND "{status_column}" = :staged_status', params)
+                promoted = cursor.rowcount
+                conn.commit()
+            finally:
+                cursor.close()
+            logger.info(f"表 {table_name} 分区替换完成：删除旧数据 {deleted} 行，启用新数据 {promoted} 行, 条件: {conditions}")
+            return deleted
+        except Exception as e:
+            logger.error(f"替换表 {table_name} 分区数据时发生错误: {e}")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return None
+        finally:
+            conn.close()
+
+    def _build_where_clause(self, table_name: str, conditions: Dict[str, Any], conn) -> Optional[tuple]:
+        """按表中实际列名生成 WHERE 条件与绑定参数 (:p0, :p1 ...)；任一条件列不存在时返回 None"""
+        metadata = self._get_table_metadata(table_name, conn)
+        existing_columns = metadata['by_name'] if metadata else {}
+
+        where_clauses = []
+        params = {}
+        for i, (key, value) in enumerate(conditions.items()):
+            column_info = existing_columns.get(self._clean_column_name(key))
+            if not column_info:
+                logger.error(f"表 {table_name} 中不存在列 {key}，拒绝执行")
+                return None
+            where_clauses.append(f'"{column_info["column_name"]}" = :p{i}')
+            params[f'p{i}'] = value
+        return " AND ".join(where_clauses), params
+
+    def get_distinct_keys(self, table_name: str, columns: List[str]) -> Optional[set]:
+        """
+        一次性读取表中指定列组合的去重值，用于批量判重
+
+        Args:
+            table_name: 表名
+            columns: 键列（原始列名，按清洗规则映射为大写列名）
+
+        Returns:
+            set: 由字符串元组组成的集合；表不存在时为空集合。
+            列缺失或查询失败时返回 None，调用方应回退为逐条检查。
+        """
+        if not self.table_exists(table_name):
+            return set()
+
+        conn = self.connect()
+        if not conn:
+            return None
+
+        cleaned_columns = [self._clean_column_name(col) for col in columns]
+        try:
+            cursor = conn.cursor()
+            try:
+                metadata = self._get_table_metadata(table_name, conn)
+                existing_columns = metadata['by_name'] if metadata else {}
+                missing = [col for col in cleaned_columns if col not in existing_columns]
+                if missing:
+                    logger.warning(f"表 {table_name} 中不存在列 {missing}，无法批量判重")
+                    return None
+
+                select_list = ", ".join(f'"{col}"' for col in cleaned_columns)
+                not_null = " AND ".join(f'"{col}" IS NOT NULL' for col in cleaned_columns)
+                cursor.arraysize = 5000
+                cursor.execute(f'SELECT DISTINCT {select_list} FROM "{table_name}" WHERE {not_null}')
+                keys = {tuple(self._normalize_key_value(value) for value in row) for row in cursor.fetchall()}
+                logger.debug(f"读取表 {table_name} 键 {cleaned_columns} 的去重值 {len(keys)} 个")
+                return keys
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"批量读取表 {table_name} 去重键失败: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def _normalize_key_value(self, value) -> str:
+        """统一键值的字符串形式，避免 NUMBER 列返回 2025 / 2025.0 与字符串 '2025' 不一致"""
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value).strip()
+
+    def get_traditional_data_coverage(self, data_type: str) -> Optional[set]:
+        """
+        获取传统财务数据的覆盖索引
+
+        Returns:
+            set: 已存在数据的键集合，键的组成见 TRADITIONAL_COVERAGE_KEYS；
+            无法批量读取时返回 None
+        """
+        key_columns = TRADITIONAL_COVERAGE_KEYS.get(data_type)
+        if not key_columns:
+            return None
+        return self.get_distinct_keys(f"raw_{data_type}", list(key_columns))
 
     def check_data_exists(self, table_name: str, conditions: Dict[str, Any]) -> bool:
         if not self.table_exists(table_name):
@@ -677,22 +1320,18 @@ class DataBaseManager:
         try:
             cursor = conn.cursor()
 
-            column_sql = """
-                SELECT column_name 
-                FROM user_tab_columns 
-                WHERE table_name = UPPER(:table_name)
-            """
-            cursor.execute(column_sql, {"table_name": table_name})
-            existing_columns = [row[0].lower() for row in cursor.fetchall()]
+            metadata = self._get_table_metadata(table_name, conn)
+            existing_columns = metadata['by_name'] if metadata else {}
 
-            # 构建查询条件，只使用存在的列
+            # 构建查询条件，只使用存在的列（按建表时的清洗规则映射为真实列名）
             where_clauses = []
             params = {}
 
-            for key, value in conditions.items():
-                if key.lower() in existing_columns or key.upper() in [col.upper() for col in existing_columns]:
-                    where_clauses.append(f'"{key}" = :{key}')
-                    params[key] = value
+            for i, (key, value) in enumerate(conditions.items()):
+                column_info = existing_columns.get(self._clean_column_name(key))
+                if column_info:
+                    where_clauses.append(f'"{column_info["column_name"]}" = :p{i}')
+                    params[f'p{i}'] = value
                 else:
                     logger.warning(f"表 {table_name} 中不存在列 {key}，跳过此条件")
 
@@ -727,6 +1366,21 @@ class DataBaseManager:
         return self.check_data_exists(table_name, conditions)
 
     def close_engine(self):
+        """关闭共享会话池，等待已借出的连接归还，超时则强制关闭"""
+        with DataBaseManager._pool_lock:
+            pool = DataBaseManager._session_pool
+            DataBaseManager._session_pool = None
+
+        if pool is not None:
+            try:
+                pool.close()
+            except cx_Oracle.Error as e:
+                logger.warning(f"会话池仍有连接在使用，强制关闭: {e}")
+                try:
+                    pool.close(force=True)
+                except Exception as force_error:
+                    logger.error(f"强制关闭会话池失败: {force_error}")
+            logger.info("OceanBase 会话池已关闭")
         logger.info("数据库管理器已关闭")
 
     def _process_date_value(self, value):
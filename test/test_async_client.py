@@ -0,0 +1,70 @@
+import threading
+import time
+
+from api.api_client import APIResponse
+from api.async_client import AsyncFinanceAPIClient
+
+
+class FakeAsyncClient(AsyncFinanceAPIClient):
+    """替换 HTTP 请求，记录并发数与请求参数"""
+
+    def __init__(self, per_host_limit, fail_periods=()):
+        super().__init__("http://finance.local", "key", "secret", max_connections=8, per_host_limit=per_host_limit)
+        self.fail_periods = set(fail_periods)
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _make_request(self, endpoint, params):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append((endpoint, params))
+        try:
+            time.sleep(0.05)
+            if params.get("periodCode") in self.fail_periods:
+                raise RuntimeError("timeout")
+            raw = {"code": 200, "data": [{"endpoint": endpoint, **params}]}
+            return APIResponse(**self._normalize_api_response(raw))
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TestAsyncFinanceAPIClient:
+    """测试异步批量获取"""
+
+    def test_fetch_many_respects_per_host_limit(self):
+        client = FakeAsyncClient(per_host_limit=3, fail_periods={"2025-02"})
+        requests_ = [(data_type, f"C{i:03d}", period)
+                     for i in range(4)
+                     for data_type in ("balance", "voucher_list")
+                     for period in ("2025-01", "2025-02")]
+        try:
+            started = time.time()
+            results = client.fetch_all(requests_)
+            elapsed = time.time() - started
+        finally:
+            client.close()
+
+        assert len(results) == 16
+        assert client.max_active == 3
+        # 16 个请求、每个 50ms、并发 3，远快于串行的 0.8 秒
+        assert elapsed < 0.6
+        failed = [result for result in results if not result.success]
+        assert len(failed) == 8 and all(result.period_code == "2025-02" for result in failed)
+        ok = next(result for result in results if result.success and result.data_type == "balance")
+        assert ok.data[0]["endpoint"] == "/Cw6Api/Get_Balance"
+
+    def test_yearly_types_use_period_year(self):
+        client = FakeAsyncClient(per_host_limit=2)
+        try:
+            results = client.fetch_all([("account_structure", "C001", "2024-05"), ("customer_vendor", "C001", None)])
+        finally:
+            client.close()
+
+        params = {endpoint: params for endpoint, params in client.calls}
+        assert params["/Cw6Api/GetAcc"]["year"] == "2024"
+        assert "year" not in params["/Cw6Api/Get_PC"]
+        assert all(result.success for result in results)
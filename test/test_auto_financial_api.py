@@ -0,0 +1,258 @@
+import threading
+import time
+
+from api.api_client import AutoFinancialReportAPI, ReportCatalogCache
+
+
+class FakeReportAPI(AutoFinancialReportAPI):
+    """替换单位报表获取逻辑，记录并发情况"""
+
+    def __init__(self, max_workers, fail_companies=()):
+        super().__init__("user", "password", max_workers=max_workers)
+        self.fail_companies = set(fail_companies)
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _fetch_unit_report(self, unit, task_id):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.02)
+            if unit["company_id"] in self.fail_companies:
+                raise RuntimeError("boom")
+            return {**unit, "report_data": [[unit["company_id"]]]}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def _units(count):
+    return [{"period_name": "1月", "period_detail_id": "P1", "company_id": f"C{i}", "parent_id": "ROOT"}
+            for i in range(count)]
+
+
+class TestIterUnitReports:
+    """测试单位报表的有限并发获取"""
+
+    def test_bounded_concurrency_and_all_units_yielded(self):
+        api = FakeReportAPI(max_workers=3)
+        results = list(api._iter_unit_reports(_units(10), "T1"))
+
+        assert sorted(unit["company_id"] for unit, _, _ in results) == sorted(f"C{i}" for i in range(10))
+        assert 1 < api.max_active <= 3
+
+    def test_errors_are_isolated_per_unit(self):
+        api = FakeReportAPI(max_workers=4, fail_companies={"C2", "C5"})
+        results = {unit["company_id"]: (data, error) for unit, data, error in api._iter_unit_reports(_units(8), "T1")}
+
+        assert {company for company, (_, error) in results.items() if error} == {"C2", "C5"}
+        assert results["C0"][0]["report_data"] == [["C0"]]
+
+    def test_serial_mode(self):
+        api = FakeReportAPI(max_workers=1)
+        results = list(api._iter_unit_reports(_units(4), "T1"))
+
+        assert [unit["company_id"] for unit, _, _ in results] == ["C0", "C1", "C2", "C3"]
+        assert api.max_active == 1
+
+
+def _report_item(company_code, value):
+    item = {"formatData": {"data": {"dataTable": {"0": {"0": {"value": value}}}}}}
+    if company_code:
+        item["companyCode"] = company_code
+    return item
+
+
+class FakeBatchReportAPI(AutoFinancialReportAPI):
+    """模拟报表目录和批量报表接口"""
+
+    def __init__(self, batch_size, with_codes=True):
+        super().__init__("user", "password", max_workers=2)
+        self.company_batch_size = batch_size
+        self.catalog_cache = None
+        self.with_codes = with_codes
+        self.requests = []
+
+    def get_reports(self, company_code, period_detail_id, task_id):
+        report_ids = ["R1", "R2"] if company_code != "C9" else ["R3"]
+        return [{"reportId": report_id} for report_id in report_ids]
+
+    def _make_batch_api_request(self, report_ids, companies):
+        self.requests.append((tuple(report_ids), tuple(code for code, _ in companies)))
+        return {"result": [_report_item(code if self.with_codes else None, f"v-{code}") for code, _ in companies]}
+
+
+class TestCompanyBatching:
+    """测试多单位合并请求"""
+
+    def test_siblings_with_same_reports_are_batched(self):
+        api = FakeBatchReportAPI(batch_size=2)
+        units = _units(3) + [{"period_name": "1月", "period_detail_id": "P1", "company_id": "C9", "parent_id": "ROOT"}]
+        results = {unit["company_id"]: data for unit, data, error in api._iter_unit_reports(units, "T1")}
+
+        assert sorted(len(companies) for _, companies in api.requests) == [1, 1, 2]
+        assert {company: data["report_data"] for company, data in results.items()} == {
+            "C0": [["v-C0"]], "C1": [["v-C1"]], "C2": [["v-C2"]], "C9": [["v-C9"]]}
+
+    def test_falls_back_to_single_requests_without_company_codes(self):
+        api = FakeBatchReportAPI(batch_size=3, with_codes=False)
+        results = {unit["company_id"]: data for unit, data, error in api._iter_unit_reports(_units(3), "T1")}
+
+        assert [len(companies) for _, companies in api.requests] == [3, 1, 1, 1]
+        assert results["C1"]["report_data"] == [["v-C1"]]
+
+    def test_company_missing_from_batch_response_is_requested_alone(self):
+        class DroppingBatchReportAPI(FakeBatchReportAPI):
+            def _make_batch_api_request(self, report_ids, companies):
+                response = super()._make_batch_api_request(report_ids, companies)
+                if len(companies) > 1:
+                    response["result"] = [item for item in response["result"] if item["companyCode"] != "C1"]
+                return response
+
+        api = DroppingBatchReportAPI(batch_size=3)
+        results = {unit["company_id"]: data for unit, data, error in api._iter_unit_reports(_units(3), "T1")}
+
+        assert [sorted(companies) for _, companies in api.requests] == [["C0", "C1", "C2"], ["C1"]]
+        assert results["C1"]["report_data"] == [["v-C1"]]
+        assert results["C0"]["report_data"] == [["v-C0"]]
+
+
+class TestReportCatalogCache:
+    """测试报表目录缓存"""
+
+    KEY = ("T1", "P1", "ROOT")
+
+    def test_shared_after_verification(self):
+        cache = ReportCatalogCache(verify_count=2)
+        reports = [{"reportId": "R1", "companyCode": "C0"}]
+
+        cache.record(self.KEY, "C0", reports)
+        assert cache.get(self.KEY, "C1") is None
+
+        cache.record(self.KEY, "C1", [{"reportId": "R1", "companyCode": "C1"}])
+        assert cache.get(self.KEY, "C2") == [{"reportId": "R1", "companyCode": "C2"}]
+        assert reports[0]["companyCode"] == "C0"
+
+    def test_divergent_catalog_disables_sharing(self):
+        cache = ReportCatalogCache(verify_count=2)
+        cache.record(self.KEY, "C0", [{"reportId": "R1"}])
+        cache.record(self.KEY, "C1", [{"reportId": "R1", "hasData": False}])
+        cache.record(self.KEY, "C2", [{"reportId": "R1"}])
+
+        assert cache.get(self.KEY, "C3") is None
+
+    def test_company_bound_catalog_is_not_shared(self):
+        cache = ReportCatalogCache(verify_count=1)
+        cache.record(self.KEY, "C0", [{"reportId": "R1", "dataCompanyCode": "C0"}])
+
+        assert cache.get(self.KEY, "C1") is None
+
+    def test_unit_fields_rewritten_and_flags_not_served(self):
+        cache = ReportCatalogCache(verify_count=2)
+        cache.record(self.KEY, "C0", [{"reportId": "R1", "companyCode": "C0", "unitCode": "C0", "hasData": True}])
+        cache.record(self.KEY, "C1", [{"reportId": "R1", "companyCode": "C1", "unitCode": "C1", "hasData": True}])
+
+        assert cache.get(self.KEY, "C2") == [{"reportId": "R1", "companyCode": "C2", "unitCode": "C2"}]
+
+    def test_other_unit_specific_fields_disable_sharing(self):
+        cache = ReportCatalogCache(verify_count=2)
+        cache.record(self.KEY, "C0", [{"reportId": "R1", "companyName": "甲公司"}])
+        cache.record(self.KEY, "C1", [{"reportId": "R1", "companyName": "乙公司"}])
+
+        assert cache.get(self.KEY, "C2") is None
+
+    def test_sampled_revalidation(self):
+        cache = ReportCatalogCache(verify_count=1, revalidate_every=3)
+        cache.record(self.KEY, "C0", [{"reportId": "R1"}])
+
+        assert cache.get(self.KEY, "C1") is not None
+        assert cache.get(self.KEY, "C2") is not None
+        assert cache.get(self.KEY, "C3") is None
+        cache.record(self.KEY, "C3", [{"reportId": "R1"}, {"reportId": "R2"}])
+
+        assert cache.get(self.KEY, "C4") is None
+        assert cache.get_statistics()["revalidations"] == 1
+
+    def test_lru_bound(self):
+        cache = ReportCatalogCache(max_size=2, verify_count=1)
+        for period in ("P1", "P2", "P3"):
+            cache.record(("T1", period, "ROOT"), "C0", [{"reportId": "R1"}])
+
+        assert cache.get(("T1", "P1", "ROOT"), "C1") is None
+        assert cache.get(("T1", "P3", "ROOT"), "C1") == [{"reportId": "R1"}]
+
+
+class FakeLoginAPI(AutoFinancialReportAPI):
+    """模拟浏览器登录与凭证探测"""
+
+    def __init__(self, cache_path, probe_ok=True):
+        super().__init__("user", "password")
+        self.token_cache_path = str(cache_path)
+        self.probe_ok = probe_ok
+        self.browser_logins = 0
+
+    def login_and_get_tokens(self):
+        time.sleep(0.05)
+        self.browser_logins += 1
+        self.access_token = f"token-{self.browser_logins}"
+        self.cookies = [{"name": "token", "value": "t"}]
+        self.user_agent = "UA"
+        self.token_expires_at = self._estimate_token_expiry(time.time())
+        self._save_cached_tokens()
+        return True
+
+    def _probe_tokens(self):
+        return self.probe_ok
+
+
+class TestTokenCache:
+    """测试登录凭证缓存"""
+
+    def test_cached_tokens_skip_browser_login(self, tmp_path):
+        cache_path = tmp_path / "tokens.json"
+        first = FakeLoginAPI(cache_path)
+        assert first.ensure_logged_in()
+        assert first.browser_logins == 1
+        assert (cache_path.stat().st_mode & 0o777) == 0o600
+
+        second = FakeLoginAPI(cache_path)
+        assert second.ensure_logged_in()
+        assert second.browser_logins == 0
+        assert second.access_token == "token-1"
+
+    def test_failed_probe_falls_back_to_browser_login(self, tmp_path):
+        cache_path = tmp_path / "tokens.json"
+        FakeLoginAPI(cache_path).ensure_logged_in()
+
+        api = FakeLoginAPI(cache_path, probe_ok=False)
+        assert api.ensure_logged_in()
+        assert api.browser_logins == 1
+
+    def test_concurrent_refresh_is_shared(self, tmp_path):
+        api = FakeLoginAPI(tmp_path / "tokens.json")
+        api.ensure_logged_in()
+
+        barrier = threading.Barrier(5)
+
+        def refresh():
+            barrier.wait()
+            api.ensure_logged_in(force_refresh=True)
+
+        threads = [threading.Thread(target=refresh) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert api.browser_logins == 2
+
+    def test_expiry_from_jwt_exp_claim(self, tmp_path):
+        import base64
+        import json
+
+        api = FakeLoginAPI(tmp_path / "tokens.json")
+        payload = base64.urlsafe_b64encode(json.dumps({"exp": 2000000000}).encode()).decode().rstrip("=")
+        api.access_token = f"header.{payload}.sig"
+        assert api._estimate_token_expiry(0) == 2000000000 - 300
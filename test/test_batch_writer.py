@@ -0,0 +1,124 @@
+import threading
+import time
+
+from database.batch_writer import BufferedTableWriter
+
+
+class FakeDBManager:
+    """记录 auto_create_and_save_data 调用的假数据库管理器"""
+
+    def __init__(self, success=True):
+        self.success = success
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def auto_create_and_save_data(self, data, table_name, if_exists='append'):
+        with self.lock:
+            self.calls.append((table_name, list(data)))
+        return self.success
+
+
+class TestBufferedTableWriter:
+    """测试按表缓冲的批量写入器"""
+
+    def test_flush_by_row_count(self):
+        """达到行数阈值时合并为一次写入"""
+        db = FakeDBManager()
+        writer = BufferedTableWriter(db, max_rows=3, flush_interval=60)
+        for i in range(7):
+            writer.add("t", {"id": i})
+
+        assert [len(rows) for _, rows in db.calls] == [3, 3]
+        assert writer.pending_rows("t") == 1
+
+        writer.close()
+        assert [len(rows) for _, rows in db.calls] == [3, 3, 1]
+        assert [row["id"] for _, rows in db.calls for row in rows] == list(range(7))
+
+    def test_flush_by_bytes(self):
+        """达到字节阈值时写出"""
+        db = FakeDBManager()
+        writer = BufferedTableWriter(db, max_rows=1000, max_bytes=100, flush_interval=60)
+        writer.add("t", {"text": "x" * 60})
+        assert db.calls == []
+        writer.add("t", {"text": "y" * 60})
+        assert len(db.calls) == 1
+        writer.close()
+
+    def test_flush_by_time(self):
+        """超过时间阈值后由后台线程写出"""
+        db = FakeDBManager()
+        writer = BufferedTableWriter(db, max_rows=1000, flush_interval=0.2)
+        writer.add("t", {"id": 1})
+
+        deadline = time.time() + 3
+        while not db.calls and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert db.calls == [("t", [{"id": 1}])]
+        writer.close()
+
+    def test_on_flush_reports_results_per_table(self):
+        """每次写入通过回调上报结果；整批失败的记录放回缓冲区，关闭时仍失败才丢弃"""
+        db = FakeDBManager(success=False)
+        results = []
+        writer = BufferedTableWriter(db, max_rows=2, flush_interval=60, on_flush=results.append)
+        writer.add_many("a", [{"id": 1}, {"id": 2}])
+        assert writer.pending_rows("a") == 2
+        writer.add("b", {"id": 3})
+        writer.close()
+
+        assert [(r.table_name, r.row_count, r.success, r.reason, r.requeued_count, r.failed_count)
+                for r in results] == [
+            ("a", 2, False, "rows", 2, 0),
+            ("a", 2, False, "close", 0, 2),
+            ("b", 1, False, "close", 0, 1),
+        ]
+        stats = writer.get_statistics()
+        assert stats["rows_failed"] == 3
+        assert stats["failed_flushes"] == 3
+
+    def test_bad_rows_isolated_by_splitting(self):
+        """只有个别记录无法写入时拆分批次，其余记录照常写入"""
+
+        class RejectingDBManager(FakeDBManager):
+            def auto_create_and_save_data(self, data, table_name, if_exists='append'):
+                super().auto_create_and_save_data(data, table_name, if_exists)
+                return all(row["id"] != 5 for row in data)
+
+        db = RejectingDBManager()
+        results = []
+        writer = BufferedTableWriter(db, max_rows=8, flush_interval=60, on_flush=results.append)
+        writer.add_many("t", [{"id": i} for i in range(8)])
+
+        result = results[0]
+        assert (result.written_count, result.failed_count, result.requeued_count) == (7, 1, 0)
+        written = [row["id"] for _, rows in db.calls if all(r["id"] != 5 for r in rows) for row in rows]
+        assert sorted(written) == [0, 1, 2, 3, 4, 6, 7]
+        assert writer.pending_rows("t") == 0
+        writer.close()
+
+    def test_requeued_rows_retried_after_recovery(self):
+        """数据库暂时不可用时记录放回缓冲区，恢复后由后台线程重新写入"""
+        db = FakeDBManager(success=False)
+        results = []
+        writer = BufferedTableWriter(db, max_rows=2, flush_interval=0.2, on_flush=results.append)
+        writer.add_many("t", [{"id": 1}, {"id": 2}])
+        assert results[0].requeued_count == 2
+        db.success = True
+
+        deadline = time.time() + 3
+        while writer.pending_rows("t") and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert results[-1].success and results[-1].written_count == 2
+        assert writer.get_statistics()["rows_written"] == 2
+        writer.close()
+
+    def test_add_after_close_is_rejected(self):
+        """关闭后不再接收数据"""
+        db = FakeDBManager()
+        writer = BufferedTableWriter(db, flush_interval=60)
+        writer.close()
+        assert writer.add("t", {"id": 1}) is False
+        assert writer.close() == []
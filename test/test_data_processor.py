@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+pytest.importorskip("cx_Oracle")
+
+from api.response_cache import ResponseCache  # noqa: E402
+from core.data_processor import DataProcessor  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """按接口路径返回固定响应，记录调用的接口"""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        endpoint = url.split("finance.local", 1)[1]
+        self.calls.append(endpoint)
+        return FakeResponse(self.payloads[endpoint])
+
+    def close(self):
+        pass
+
+
+class FakeDBManager:
+    """不连接数据库：记录写入，可模拟写入失败"""
+
+    def __init__(self):
+        self.fail_saves = False
+        self.saved = []
+
+    def check_traditional_data_exists(self, data_type, company_code, year=None, period_code=None):
+        return False
+
+    def delete_traditional_data(self, data_type, company_code, year=None, period_code=None, processing_status=None):
+        return 0
+
+    def promote_staged_traditional_data(self, data_type, company_code, year=None, period_code=None,
+                                        staged_status='staging'):
+        return 0
+
+    def auto_create_and_save_data(self, data, table_name, if_exists='append'):
+        if self.fail_saves:
+            return False
+        self.saved.append((table_name, len(data)))
+        return True
+
+
+class TestDictionaryResponseCache:
+    """测试字典类数据经 DataProcessor 处理时的响应缓存命中路径"""
+
+    def test_retry_after_failed_save_is_served_from_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("time.sleep", lambda seconds: None)
+        cache = ResponseCache(str(tmp_path / "cache.db"))
+        db_manager = FakeDBManager()
+        processor = DataProcessor({"base_url": "http://finance.local", "app_key": "key", "app_secret": "secret"},
+                                  db_manager=db_manager, response_cache=cache)
+        processor.api_client.session = FakeSession({"/Cw6Api/Get_PC": {"code": 200, "data": [{"pc": "V001"}]}})
+
+        db_manager.fail_saves = True
+        assert not processor.process_data("customer_vendor", "C001", year="2025").success
+
+        db_manager.fail_saves = False
+        result = processor.process_data("customer_vendor", "C001", year="2025")
+
+        assert result.success and result.saved_count == 1
+        assert processor.api_client.session.calls == ["/Cw6Api/Get_PC"]
+        assert db_manager.saved == [("raw_customer_vendor", 1)]
+
+        assert processor.process_data("customer_vendor", "C001", year="2025", refresh=True).success
+        assert processor.api_client.session.calls == ["/Cw6Api/Get_PC", "/Cw6Api/Get_PC"]
+        cache.close()
@@ -0,0 +1,167 @@
+import json
+import os
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from api.api_client import FinanceAPIClient, build_api_response, decode_json
+from api.response_cache import ResponseCache
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """按接口路径返回固定响应，记录调用次数"""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        endpoint = url.split("finance.local", 1)[1]
+        self.calls.append((endpoint, json))
+        return FakeResponse(self.payloads[endpoint])
+
+    def close(self):
+        pass
+
+
+def make_client(payloads, **kwargs):
+    client = FinanceAPIClient("http://finance.local", "key", "secret", **kwargs)
+    client.session = FakeSession(payloads)
+    return client
+
+
+class TestResponseEnvelope:
+    """测试只校验信封字段的响应构建"""
+
+    def test_result_passed_through_without_copy(self):
+        records = [{"id": 1, "name": "甲"}, {"id": 2, "name": "乙"}]
+
+        response = build_api_response({"success": True, "code": 200, "message": "", "result": records})
+
+        assert response.success and response.code == 200
+        assert response.result is records
+
+    def test_full_validation_copies_records(self):
+        records = [{"id": 1}]
+
+        response = build_api_response({"success": True, "code": 200, "result": records}, validate_result=True)
+
+        assert response.result == records and response.result is not records
+
+    def test_envelope_still_validated(self):
+        with pytest.raises(ValidationError):
+            build_api_response({"success": True, "code": "not-a-code", "result": []})
+        with pytest.raises(ValidationError):
+            build_api_response({"success": True, "code": 200, "result": {"id": 1}})
+
+    def test_decode_json_bytes(self):
+        assert decode_json('{"code": 200, "data": ["凭证"]}'.encode('utf-8')) == {"code": 200, "data": ["凭证"]}
+
+    def test_make_request_uses_fast_path(self):
+        client = make_client({"/Cw6Api/Get_Balance": {"code": 200, "data": [{"acc": "1001", "amount": 1.5}]}},
+                             validate_result=False)
+
+        assert client.get_balance("C001", "2025-01") == [{"acc": "1001", "amount": 1.5}]
+        assert client.session.calls[0][1]["periodCode"] == "2025-01"
+
+
+class TestResponseCache:
+    """测试字典类接口的响应缓存"""
+
+    def test_hit_skips_http_and_returns_copies(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.db"))
+        client = make_client({"/Cw6Api/Get_PC": {"code": 200, "data": [{"pc": "V001"}]}}, response_cache=cache)
+
+        first = client.get_customer_vendor_dict("C001")
+        first[0]["company_code"] = "C001"
+        second = client.get_customer_vendor_dict("C001")
+
+        assert len(client.session.calls) == 1
+        assert second == [{"pc": "V001"}]
+        assert cache.get_statistics()["memory_hits"] == 1
+        cache.close()
+
+    def test_disk_store_survives_restart_and_dedupes_payloads(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        cache = ResponseCache(path)
+        cache.put("/Cw6Api/Get_PC", {"companyCode": "C001"}, [{"pc": "V001"}])
+        cache.put("/Cw6Api/Get_PC", {"companyCode": "C002"}, [{"pc": "V001"}])
+        disk_bytes = cache.get_statistics()["disk_bytes"]
+        cache.close()
+
+        reopened = ResponseCache(path)
+        assert reopened.get("/Cw6Api/Get_PC", {"companyCode": "C002", "appkey": "ignored"}) == [{"pc": "V001"}]
+        stats = reopened.get_statistics()
+        assert stats["entries"] == 2 and stats["disk_hits"] == 1 and stats["disk_bytes"] == disk_bytes
+        reopened.close()
+
+    def test_ttl_expiry(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.db"), ttl_seconds=0.05)
+        cache.put("/Cw6Api/GetAcc", {"year": "2025", "companyCode": "C001"}, [{"acc": "1001"}])
+        time.sleep(0.1)
+
+        assert cache.get("/Cw6Api/GetAcc", {"year": "2025", "companyCode": "C001"}) is None
+        cache.close()
+
+    def test_size_bound_eviction(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.db"), memory_size=2, max_disk_bytes=3000)
+        for i in range(10):
+            records = [{"row": j, "text": f"{i}-{j}-{os.urandom(8).hex()}"} for j in range(20)]
+            cache.put("/Cw6Api/Get_PC", {"companyCode": f"C{i:03d}"}, records)
+
+        stats = cache.get_statistics()
+        assert stats["disk_bytes"] <= 3000 and stats["memory_entries"] == 2
+        assert cache.get("/Cw6Api/Get_PC", {"companyCode": "C000"}) is None
+        assert cache.get("/Cw6Api/Get_PC", {"companyCode": "C009"}) is not None
+        cache.close()
+
+    def test_invalidate(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.db"))
+        client = make_client({
+            "/Cw6Api/GetAcc": {"code": 200, "data": [{"acc": "1001"}]},
+            "/Cw6Api/Get_PC": {"code": 200, "data": [{"pc": "V001"}]},
+        }, response_cache=cache)
+        client.get_account_structure("2025", "C001")
+        client.get_customer_vendor_dict("C001")
+        client.get_customer_vendor_dict("C002")
+
+        assert cache.invalidate("/Cw6Api/Get_PC", {"companyCode": "C001"}) == 1
+        assert cache.invalidate("/Cw6Api/Get_PC") == 1
+        client.get_customer_vendor_dict("C001")
+        client.get_account_structure("2025", "C001")
+
+        assert [endpoint for endpoint, _ in client.session.calls].count("/Cw6Api/Get_PC") == 3
+        assert [endpoint for endpoint, _ in client.session.calls].count("/Cw6Api/GetAcc") == 1
+        assert cache.invalidate() == 2
+        cache.close()
+
+    def test_refresh_bypasses_cache(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.db"))
+        client = make_client({"/Cw6Api/GetAcc": {"code": 200, "data": [{"acc": "1001"}]}}, response_cache=cache)
+        client.get_account_structure("2025", "C001")
+
+        client.session.payloads["/Cw6Api/GetAcc"] = {"code": 200, "data": [{"acc": "1002"}]}
+        assert client.get_account_structure("2025", "C001") == [{"acc": "1001"}]
+        assert client.get_account_structure("2025", "C001", refresh=True) == [{"acc": "1002"}]
+        assert client.get_account_structure("2025", "C001") == [{"acc": "1002"}]
+        assert len(client.session.calls) == 2
+        cache.close()
+
+    def test_period_endpoints_not_cached(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / "cache.db"))
+        client = make_client({"/Cw6Api/Get_Balance": {"code": 200, "data": [{"acc": "1001"}]}}, response_cache=cache)
+
+        client.get_balance("C001", "2025-01")
+        client.get_balance("C001", "2025-01")
+
+        assert len(client.session.calls) == 2
+        cache.close()
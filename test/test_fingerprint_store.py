@@ -0,0 +1,54 @@
+from core.fingerprint_store import PayloadFingerprint, SQLiteFingerprintStore, create_fingerprint_store
+
+
+class TestPayloadFingerprint:
+    """测试数据指纹"""
+
+    def test_order_and_key_order_insensitive(self):
+        records = [{"id": i, "name": f"凭证{i}", "amount": i * 0.5} for i in range(100)]
+        shuffled = [dict(reversed(list(record.items()))) for record in reversed(records)]
+
+        first = PayloadFingerprint.of(records)
+        second = PayloadFingerprint.of(shuffled)
+
+        assert first.hexdigest() == second.hexdigest() and first.count == second.count == 100
+
+    def test_chunked_update_matches_whole(self):
+        records = [{"id": i} for i in range(10)]
+        chunked = PayloadFingerprint()
+        for start in range(0, 10, 3):
+            chunked.update(records[start:start + 3])
+
+        assert chunked.hexdigest() == PayloadFingerprint.of(records).hexdigest()
+
+    def test_detects_changes_and_duplicates(self):
+        records = [{"id": 1, "amount": 10}, {"id": 2, "amount": 20}]
+        base = PayloadFingerprint.of(records).hexdigest()
+
+        assert PayloadFingerprint.of([{"id": 1, "amount": 10}, {"id": 2, "amount": 21}]).hexdigest() != base
+        assert PayloadFingerprint.of(records + records[:1]).hexdigest() != base
+
+
+class TestSQLiteFingerprintStore:
+    """测试分区指纹存储"""
+
+    def test_record_match_and_remove(self, tmp_path):
+        path = str(tmp_path / "fingerprints.db")
+        store = SQLiteFingerprintStore(path)
+        fingerprint = PayloadFingerprint.of([{"id": 1}, {"id": 2}])
+
+        assert not store.matches("balance", "C001", "2025-01", fingerprint)
+        store.record("balance", "C001", "2025-01", fingerprint)
+        assert store.matches("balance", "C001", "2025-01", fingerprint)
+        assert not store.matches("balance", "C001", "2025-02", fingerprint)
+        assert not store.matches("balance", "C001", "2025-01", PayloadFingerprint.of([{"id": 1}]))
+        store.close()
+
+        reopened = SQLiteFingerprintStore(path)
+        assert reopened.get("balance", "C001", "2025-01") == (fingerprint.hexdigest(), 2)
+        reopened.remove("balance", "C001", "2025-01")
+        assert reopened.get("balance", "C001", "2025-01") is None
+        reopened.close()
+
+    def test_create_disabled_without_path(self):
+        assert create_fingerprint_store("") is None
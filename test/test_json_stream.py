@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from api.api_client import FinanceAPIClient
+from api.json_stream import JSONStreamError, StreamingJSONArrayParser, iter_record_chunks
+
+
+def split_bytes(payload: bytes, size: int):
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+class FakeStreamResponse:
+    """模拟 stream=True 的 requests 响应，记录读取块数"""
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        self.reads = 0
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for block in split_bytes(self.payload, chunk_size):
+            self.reads += 1
+            yield block
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, payload: bytes):
+        self.response = FakeStreamResponse(payload)
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        self.calls.append((url, json, stream))
+        return self.response
+
+    def close(self):
+        pass
+
+
+class TestStreamingJSONArrayParser:
+    """测试增量 JSON 数组解析"""
+
+    def test_records_split_across_every_byte(self):
+        records = [{"id": i, "摘要": f"凭证{i}", "amount": i * 1.5, "tags": [1, {"x": None}]} for i in range(20)]
+        payload = json.dumps({"code": 200, "success": True, "result": records, "timestamp": 12345},
+                             ensure_ascii=False).encode('utf-8')
+
+        parser = StreamingJSONArrayParser(split_bytes(payload, 1))
+
+        assert list(parser) == records
+        assert parser.array_key == "result"
+        assert parser.record_count == 20
+        assert parser.envelope == {"code": 200, "success": True, "timestamp": 12345}
+
+    def test_data_key_and_empty_array(self):
+        parser = StreamingJSONArrayParser([b'{"code": 500, "info": "err", "data": []}'])
+
+        assert list(parser) == []
+        assert parser.envelope == {"code": 500, "info": "err"}
+
+    def test_truncated_payload_raises(self):
+        parser = StreamingJSONArrayParser(split_bytes(b'{"code": 200, "result": [{"id": 1}, {"id"', 4))
+
+        with pytest.raises(JSONStreamError):
+            list(parser)
+
+    def test_iter_record_chunks(self):
+        assert list(iter_record_chunks(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+class TestStreamRequest:
+    """测试 FinanceAPIClient 流式获取"""
+
+    def test_period_data_chunks(self):
+        records = [{"voucherId": i, "line": "x" * 50} for i in range(1000)]
+        payload = json.dumps({"code": 200, "result": records}).encode('utf-8')
+        client = FinanceAPIClient("http://finance.local", "key", "secret")
+        client.session = FakeSession(payload)
+        client.STREAM_READ_SIZE = 1024
+
+        chunks = client.iter_period_data_chunks("voucher_detail", "C001", "2025-01", chunk_size=300)
+        first = next(chunks)
+        # 产出第一块时只读取了响应的一小部分
+        assert len(first) == 300
+        assert client.session.response.reads < len(payload) // 1024 // 2
+        rest = list(chunks)
+
+        assert [len(chunk) for chunk in rest] == [300, 300, 100]
+        assert first + sum(rest, []) == records
+        url, request_data, stream = client.session.calls[0]
+        assert url == "http://finance.local/Cw6Api/Get_Voucher_Detail" and stream
+        assert request_data["periodCode"] == "2025-01"
+
+    def test_unsupported_data_type(self):
+        client = FinanceAPIClient("http://finance.local", "key", "secret")
+
+        with pytest.raises(ValueError):
+            client.iter_period_data_chunks("account_structure", "C001", "2025-01")
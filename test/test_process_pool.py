@@ -0,0 +1,42 @@
+import os
+
+from utils import process_pool
+from utils.process_pool import run_cpu_bound, submit_cpu_bound, shutdown_process_pool
+
+
+def worker_pid(value):
+    return os.getpid(), value * 2
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+class TestProcessPool:
+    """测试 CPU 密集型任务的进程池卸载"""
+
+    def test_small_inputs_run_inline_and_large_inputs_use_pool(self, monkeypatch):
+        monkeypatch.setattr(process_pool, "get_offload_min_size", lambda: 100)
+        monkeypatch.setattr(process_pool, "get_process_pool_workers", lambda: 2)
+        try:
+            pid, value = run_cpu_bound(worker_pid, 3, size=10)
+            assert pid == os.getpid() and value == 6
+
+            pid, value = run_cpu_bound(worker_pid, 4, size=1000)
+            assert pid != os.getpid() and value == 8
+
+            # 进程池被复用
+            pool = process_pool.get_process_pool()
+            futures = [submit_cpu_bound(worker_pid, i, size=1000) for i in range(4)]
+            assert [future.result(timeout=30)[1] for future in futures] == [0, 2, 4, 6]
+            assert process_pool.get_process_pool() is pool
+
+            assert isinstance(submit_cpu_bound(fail, "boom", size=1000).exception(timeout=30), ValueError)
+        finally:
+            shutdown_process_pool()
+
+    def test_disabled_pool_runs_inline(self, monkeypatch):
+        monkeypatch.setattr(process_pool, "get_process_pool_workers", lambda: 0)
+        shutdown_process_pool()
+        pid, _ = run_cpu_bound(worker_pid, 1)
+        assert pid == os.getpid()
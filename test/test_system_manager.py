@@ -0,0 +1,489 @@
+import threading
+import time
+
+from core.system_manager import SystemManager, TaskStatus, DelayedTaskScheduler, PriorityTaskWrapper, Task
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _status_counts(store):
+    cursor = store._execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+    return {status: count for status, count in cursor.fetchall()}
+
+
+class TestParallelDispatch:
+    """测试任务并发调度"""
+
+    def test_tasks_run_in_parallel_up_to_max_workers(self):
+        manager = SystemManager(max_workers=3, health_check_interval=60)
+        lock = threading.Lock()
+        state = {"active": 0, "max_active": 0}
+
+        def work():
+            with lock:
+                state["active"] += 1
+                state["max_active"] = max(state["max_active"], state["active"])
+            time.sleep(0.2)
+            with lock:
+                state["active"] -= 1
+            return "ok"
+
+        manager.start()
+        try:
+            for i in range(9):
+                manager.add_task(f"task_{i}", work)
+
+            assert wait_until(lambda: manager.get_system_status()["tasks"]["completed"] == 9)
+            assert state["max_active"] == 3
+            assert manager.get_task_status("task_0")["result"]["data"] == "ok"
+        finally:
+            manager.stop(timeout=5)
+
+    def test_failed_task_is_retried_from_completion_callback(self):
+        manager = SystemManager(max_workers=2, health_check_interval=60, retry_base_delay=0.1)
+        attempts = []
+
+        def flaky():
+            attempts.append(time.time())
+            if len(attempts) < 2:
+                raise ValueError("temporary")
+            return "done"
+
+        manager.start()
+        try:
+            manager.add_task("flaky", flaky, max_retries=2)
+            assert wait_until(lambda: manager.get_task_status("flaky")["status"] == TaskStatus.COMPLETED.label)
+            assert manager.get_task_status("flaky")["retry_count"] == 1
+        finally:
+            manager.stop(timeout=5)
+
+
+class TestDelayedRetries:
+    """测试延迟重试调度"""
+
+    def test_scheduler_releases_in_due_order(self):
+        released = []
+        scheduler = DelayedTaskScheduler(lambda wrapper: released.append(wrapper.task.name))
+        scheduler.start()
+        try:
+            for name, delay in [("late", 0.3), ("early", 0.05), ("middle", 0.15)]:
+                scheduler.schedule(PriorityTaskWrapper(Task(name, lambda: None)), delay)
+
+            assert wait_until(lambda: len(released) == 3)
+            assert released == ["early", "middle", "late"]
+        finally:
+            scheduler.stop()
+
+    def test_pending_retries_do_not_delay_ready_tasks(self):
+        manager = SystemManager(max_workers=2, health_check_interval=60, retry_base_delay=30)
+
+        def always_fail():
+            raise ValueError("fail")
+
+        manager.start()
+        try:
+            for i in range(20):
+                manager.add_task(f"fail_{i}", always_fail, max_retries=1)
+            assert wait_until(lambda: manager.get_system_status()["delayed_queue_size"] == 20)
+
+            started = time.time()
+            manager.add_task("ready", lambda: "ok")
+            assert wait_until(lambda: manager.get_task_status("ready")["status"] == TaskStatus.COMPLETED.label)
+            assert time.time() - started < 1.5
+        finally:
+            manager.stop(timeout=2)
+
+        assert manager.get_task_status("fail_0")["status"] == TaskStatus.FAILED.label
+
+    def test_backoff_is_jittered_and_capped(self):
+        manager = SystemManager(retry_base_delay=2, retry_max_delay=10)
+        delays = [manager._retry_delay(3) for _ in range(50)]
+
+        assert all(4 <= delay <= 8 for delay in delays)
+        assert len(set(delays)) > 1
+        assert all(5 <= manager._retry_delay(10) <= 10 for _ in range(20))
+
+
+class TestResourceLimits:
+    """测试资源标签并发限制"""
+
+    def test_limiter_acquires_all_tags_atomically(self):
+        from core.system_manager import ResourceLimiter
+
+        limiter = ResourceLimiter({"a": 1, "b": 2})
+        assert limiter.try_acquire(("a", "b"))
+        assert not limiter.try_acquire(("a", "b"))
+        assert limiter.snapshot()["b"]["in_use"] == 1
+        assert limiter.try_acquire(("b", "unknown"))
+        limiter.release(("a", "b"))
+        assert limiter.try_acquire(("a",))
+
+    def test_limited_tasks_do_not_block_other_tasks(self):
+        manager = SystemManager(max_workers=4, health_check_interval=60, resource_limits={"browser": 1})
+        lock = threading.Lock()
+        state = {"browser": 0, "max_browser": 0}
+        finished = []
+
+        def browser_work():
+            with lock:
+                state["browser"] += 1
+                state["max_browser"] = max(state["max_browser"], state["browser"])
+            time.sleep(0.2)
+            with lock:
+                state["browser"] -= 1
+
+        manager.start()
+        try:
+            for i in range(3):
+                manager.add_task(f"browser_{i}", browser_work, priority=10, resources=("browser",))
+            for i in range(4):
+                manager.add_task(f"plain_{i}", lambda i=i: finished.append((i, time.time())))
+
+            started = time.time()
+            assert wait_until(lambda: manager.get_system_status()["tasks"]["completed"] == 7)
+            assert state["max_browser"] == 1
+            # 普通任务无需等待浏览器任务依次执行完
+            assert all(done_at - started < 0.4 for _, done_at in finished)
+        finally:
+            manager.stop(timeout=5)
+
+
+class TestTaskStore:
+    """测试持久化任务队列"""
+
+    def test_unfinished_tasks_are_replayed_after_restart(self, tmp_path):
+        from core.task_store import SQLiteTaskStore
+
+        db_path = str(tmp_path / "tasks.db")
+        first = SystemManager(max_workers=2, health_check_interval=60, task_store=SQLiteTaskStore(db_path))
+        first.register_handler("echo", lambda value: value)
+        # 未启动调度循环，模拟进程在任务执行前退出
+        assert first.add_task("echo_1", handler="echo", args=(1,), priority=5, resources=("db_write",))
+        assert not first.add_task("bad", handler="missing")
+        first.task_store.close()
+
+        results = []
+        store = SQLiteTaskStore(db_path)
+        assert _status_counts(store) == {"pending": 1}
+        second = SystemManager(max_workers=2, health_check_interval=60, task_store=store)
+        second.register_handler("echo", lambda value: results.append(value) or value)
+        second.start()
+        try:
+            assert wait_until(lambda: second.get_task_status("echo_1") is not None
+                              and second.get_task_status("echo_1")["status"] == TaskStatus.COMPLETED.label)
+            assert results == [1]
+            assert second.tasks["echo_1"].resources == ("db_write",)
+            assert _status_counts(store) == {"completed": 1}
+        finally:
+            second.stop(timeout=2)
+
+    def test_recently_completed_tasks_are_skipped(self, tmp_path):
+        from core.task_store import SQLiteTaskStore
+
+        db_path = str(tmp_path / "tasks.db")
+        store = SQLiteTaskStore(db_path)
+        store.record_enqueue("done", "echo", (), {}, 0, 3, ())
+        store.record_finish("done", "completed")
+
+        manager = SystemManager(max_workers=1, health_check_interval=60, task_store=store)
+        manager.register_handler("echo", lambda: None)
+        assert manager.has_task("done")
+        assert not manager.add_task("done", handler="echo")
+        assert manager.add_task("adhoc", lambda: None)
+        # 未通过处理器添加的任务不持久化
+        assert _status_counts(store) == {"completed": 1}
+        store.close()
+
+    def test_unsuccessful_results_are_not_recorded_as_completed(self, tmp_path):
+        from types import SimpleNamespace
+        from core.task_store import SQLiteTaskStore
+
+        store = SQLiteTaskStore(str(tmp_path / "tasks.db"))
+        manager = SystemManager(max_workers=2, health_check_interval=60, retry_base_delay=0.05, task_store=store)
+        attempts = {"save": 0, "empty": 0}
+
+        def save_fails():
+            attempts["save"] += 1
+            return SimpleNamespace(success=False, error_message="保存原始数据失败")
+
+        def api_empty():
+            attempts["empty"] += 1
+            return SimpleNamespace(success=False, error_message="API返回空数据", retryable=False)
+
+        manager.register_handler("save_fails", save_fails)
+        manager.register_handler("api_empty", api_empty)
+        manager.start()
+        try:
+            save = manager.add_task("save", handler="save_fails", max_retries=1)
+            empty = manager.add_task("empty", handler="api_empty", max_retries=3)
+
+            assert wait_until(lambda: save.done() and empty.done())
+            assert save.status == "failed" and attempts["save"] == 2
+            assert empty.status == "failed" and attempts["empty"] == 1
+            assert manager.get_task_status("save")["result"]["error"] == "保存原始数据失败"
+            assert _status_counts(store) == {"failed": 2}
+        finally:
+            manager.stop(timeout=2)
+
+    def test_unserializable_arguments_are_not_persisted(self, tmp_path):
+        from core.task_store import SQLiteTaskStore
+
+        store = SQLiteTaskStore(str(tmp_path / "tasks.db"))
+        assert not store.record_enqueue("obj", "echo", (object(),), {}, 0, 3, ())
+        assert store.load_unfinished() == []
+        store.close()
+
+
+class TestTaskSource:
+    """测试惰性任务源与背压"""
+
+    def test_source_materializes_tasks_as_capacity_frees(self):
+        manager = SystemManager(max_workers=2, health_check_interval=60)
+        state = {"generated": 0, "max_tasks": 0}
+        lock = threading.Lock()
+
+        def specs():
+            for i in range(30):
+                state["generated"] += 1
+                yield {"name": f"lazy_{i}", "func": lambda: time.sleep(0.01)}
+
+        def track():
+            with lock:
+                state["max_tasks"] = max(state["max_tasks"],
+                                         len(manager.tasks) - manager.get_system_status()["tasks"]["completed"])
+
+        manager.start()
+        try:
+            assert manager.add_task_source("lazy", specs(), max_pending=4)
+            assert not manager.add_task_source("lazy", iter(()))
+            assert wait_until(lambda: (track() or True)
+                              and manager.get_system_status()["task_sources"]["lazy"]["exhausted"], timeout=10)
+            assert wait_until(lambda: manager.get_system_status()["tasks"]["completed"] == 30)
+            assert state["generated"] == 30
+            assert state["max_tasks"] <= 4
+            assert manager.get_system_status()["task_sources"]["lazy"]["produced"] == 30
+        finally:
+            manager.stop(timeout=2)
+
+    def test_source_waits_for_capacity_before_pulling(self):
+        manager = SystemManager(max_workers=1, health_check_interval=60)
+        pulled = []
+
+        def specs():
+            for i in range(10):
+                pulled.append(i)
+                yield {"name": f"held_{i}", "func": lambda: None}
+
+        # 系统未启动，任务不会结束，供给线程在达到上限后停止取数
+        assert manager.add_task_source("held", specs(), max_pending=3)
+        assert wait_until(lambda: len(manager.tasks) == 3)
+        time.sleep(0.1)
+        assert len(pulled) == 3
+        assert manager.cancel_task("held_0")
+        assert wait_until(lambda: len(manager.tasks) == 4)
+
+        manager.start()
+        manager.stop(timeout=2)
+
+
+class TestCompactTaskRecords:
+    """测试紧凑任务记录与结果摘要"""
+
+    def test_task_uses_slots_and_shared_locks(self):
+        task = Task("compact", lambda: None)
+        other = Task("compact", lambda: None)
+
+        assert not hasattr(task, "__dict__")
+        assert task.lock is other.lock
+        assert task.status == TaskStatus.PENDING and task.status.label == "pending"
+        assert task.kwargs == {}
+
+    def test_results_are_summarized_and_payloads_bounded(self):
+        from dataclasses import dataclass
+
+        @dataclass
+        class Payload:
+            success: bool
+            saved_count: int
+            rows: list
+
+        manager = SystemManager(max_workers=2, health_check_interval=60, result_cache_size=1)
+        manager.start()
+        try:
+            manager.add_task("first", lambda: Payload(True, 3, [1, 2, 3]))
+            assert wait_until(lambda: manager.get_system_status()["tasks"]["completed"] == 1)
+            manager.add_task("second", lambda: list(range(1000)))
+            assert wait_until(lambda: manager.get_system_status()["tasks"]["completed"] == 2)
+
+            # 完整返回值只保留最近一个，较早的任务退化为摘要
+            assert manager.get_task_status("first")["result"]["data"] == {"success": True, "saved_count": 3}
+            assert manager.get_task_status("second")["result"]["data"] == list(range(1000))
+            assert manager.results["second"].data == {"type": "list", "length": 1000}
+            assert manager.get_task_status("second")["last_run"] is not None
+        finally:
+            manager.stop(timeout=2)
+
+
+class TestTaskRegistry:
+    """测试任务索引"""
+
+    def test_status_counts_follow_transitions(self):
+        from core.system_manager import TaskRegistry
+
+        registry = TaskRegistry()
+        task = Task("process_balance_C001_2025-01", lambda: None)
+        assert registry.add(task)
+        assert not registry.add(Task("process_balance_C001_2025-01", lambda: None))
+        assert registry.counts()["pending"] == 1
+
+        registry.set_status(task, TaskStatus.RUNNING)
+        registry.set_status(task, TaskStatus.COMPLETED)
+        counts = registry.counts()
+        assert counts["pending"] == 0 and counts["running"] == 0 and counts["completed"] == 1
+        assert registry.with_status(TaskStatus.COMPLETED) == [task]
+
+        assert registry.has_prefix("process_balance")
+        assert registry.has_prefix("process_balance_C001_2025-01")
+        assert not registry.has_prefix("process_bal")
+
+        registry.remove(task.name)
+        assert len(registry) == 0
+        assert registry.counts()["completed"] == 0
+        assert not registry.has_prefix("process")
+
+    def test_manager_status_uses_registry(self):
+        manager = SystemManager(max_workers=1, health_check_interval=60)
+        manager.add_task("crawler_org_crawler", lambda: None)
+        manager.add_task("other", lambda: None)
+        assert manager.has_task_prefix("crawler_org_crawler")
+        assert not manager.has_task_prefix("crawler_flow_crawler")
+        assert manager.cancel_task("other")
+
+        tasks = manager.get_system_status()["tasks"]
+        assert tasks["total"] == 2 and tasks["pending"] == 1 and tasks["cancelled"] == 1
+
+    def test_never_started_finished_tasks_are_cleared(self):
+        manager = SystemManager(max_workers=1, health_check_interval=60)
+        manager.add_task("cancelled", lambda: None)
+        manager.add_task("child", lambda: None, depends_on=("cancelled",))
+        manager.add_task("pending", lambda: None)
+        assert manager.cancel_task("cancelled")
+        assert manager.tasks["child"].status == TaskStatus.FAILED
+
+        assert manager.clear_completed_tasks(older_than_hours=0) == 2
+        assert "cancelled" not in manager.tasks and "child" not in manager.tasks
+        assert "pending" in manager.tasks
+
+
+class TestTaskHandles:
+    """测试任务句柄与状态事件"""
+
+    def test_handle_result_and_callbacks(self):
+        from core.system_manager import TaskFailedError, as_completed
+
+        manager = SystemManager(max_workers=3, health_check_interval=60, retry_base_delay=0.01)
+        events = manager.subscribe()
+        called = []
+        manager.start()
+        try:
+            slow = manager.add_task("slow", lambda: time.sleep(0.3) or "slow")
+            fast = manager.add_task("fast", lambda: "fast")
+            failing = manager.add_task("failing", lambda: 1 / 0, max_retries=1)
+            assert slow and fast and failing
+            slow.add_done_callback(lambda handle: called.append(handle.name))
+
+            order = [handle.name for handle in as_completed([slow, fast], timeout=5)]
+            assert order == ["fast", "slow"]
+            assert slow.result(timeout=1) == "slow"
+            assert wait_until(lambda: called == ["slow"])
+            try:
+                failing.result(timeout=5)
+                assert False, "expected TaskFailedError"
+            except TaskFailedError as e:
+                assert "division" in e.error
+            # 任务结束后获取的句柄立即可用
+            assert manager.get_task_handle("fast").result(timeout=0) == "fast"
+        finally:
+            manager.stop(timeout=2)
+
+        transitions = []
+        while not events.empty():
+            event = events.get_nowait()
+            if event.name == "failing":
+                transitions.append((event.previous, event.status))
+        assert transitions[0] == (None, "pending")
+        assert ("failed", "retry") in transitions
+        assert transitions[-1][1] == "failed"
+
+    def test_cancelled_handle(self):
+        from concurrent.futures import CancelledError
+
+        manager = SystemManager(max_workers=1, health_check_interval=60)
+        handle = manager.add_task("later", lambda: None)
+        assert handle.cancel()
+        assert handle.done()
+        try:
+            handle.result(timeout=0)
+            assert False, "expected CancelledError"
+        except CancelledError:
+            pass
+
+
+class TestTaskDependencies:
+    """测试任务依赖"""
+
+    def test_dependents_wait_and_failures_cascade(self):
+        manager = SystemManager(max_workers=3, health_check_interval=60)
+        order = []
+
+        def step(name, delay=0.0):
+            time.sleep(delay)
+            order.append(name)
+
+        manager.start()
+        try:
+            base = manager.add_task("base", step, args=("base", 0.2))
+            bundle = manager.add_task("bundle", step, args=("bundle",), priority=10, depends_on=("base", "absent"))
+            broken = manager.add_task("broken", lambda: 1 / 0, max_retries=0)
+            child = manager.add_task("child", step, args=("child",), depends_on=("broken",))
+            grandchild = manager.add_task("grandchild", step, args=("grandchild",), depends_on=("child",))
+
+            assert bundle.result(timeout=5) is None
+            assert order.index("base") < order.index("bundle")
+            assert wait_until(lambda: grandchild.done())
+            assert child.status == "failed" and grandchild.status == "failed"
+            assert "child" not in order and "grandchild" not in order
+            assert manager.get_task_status("grandchild")["result"]["error"] == "Dependency 'child' failed"
+
+            # 前置任务已完成后再添加的任务直接就绪
+            late = manager.add_task("late", lambda: "late", depends_on=("base",))
+            assert late.result(timeout=5) == "late"
+            assert base.done() and broken.done()
+        finally:
+            manager.stop(timeout=2)
+
+    def test_unsuccessful_result_does_not_release_dependents(self):
+        from types import SimpleNamespace
+
+        manager = SystemManager(max_workers=2, health_check_interval=60)
+        ran = []
+
+        manager.start()
+        try:
+            yearly = manager.add_task("yearly", lambda: SimpleNamespace(success=False, error_message="保存失败"),
+                                      max_retries=0)
+            bundle = manager.add_task("bundle", lambda: ran.append("bundle"), depends_on=("yearly",))
+
+            assert wait_until(lambda: bundle.done())
+            assert yearly.status == "failed" and bundle.status == "failed"
+            assert ran == []
+            assert manager.get_task_status("bundle")["result"]["error"] == "Dependency 'yearly' failed"
+        finally:
+            manager.stop(timeout=2)
@@ -0,0 +1,144 @@
+"""
+CPU 密集型纯函数的进程池卸载工具
+
+大报表矩阵的 JSON 序列化、HTML 表格解析、批量插入前的行数据准备都是纯 CPU 计算，
+在线程中执行会被 GIL 串行化。这里维护一个进程级共享、惰性创建的 ProcessPoolExecutor，
+输入规模达到阈值时把函数提交到进程池执行，否则在当前线程直接执行。
+
+提交的函数必须是模块级函数，参数与返回值必须可 pickle；进程池不可用（配置为 0、创建失败
+或工作进程异常退出）时自动回退为当前线程执行，调用方无需区分两种情况。
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from common.config import config_manager
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool_workers() -> int:
+    """进程池大小，默认 CPU 核数；配置为 0 时不使用进程池"""
+    workers = config_manager.get('system.process_pool_workers', None)
+    if workers is None:
+        return os.cpu_count() or 1
+    return max(0, int(workers))
+
+
+def get_offload_min_size() -> int:
+    """输入规模（行数、单元格数或字符数）达到该值时才提交到进程池，较小的输入进程间传输开销大于收益"""
+    return int(config_manager.get('system.process_pool_min_size', 20000) or 0)
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """获取共享进程池，首次调用时创建；不可用时返回 None"""
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            workers = get_process_pool_workers()
+            if workers <= 0:
+                return None
+            # 调用方进程是多线程的，不使用 fork 启动工作进程，避免复制其他线程持有的锁
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            try:
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+                logger.info(f"CPU 密集型任务进程池已创建: {workers} 个工作进程")
+            except Exception as e:
+                logger.warning(f"创建进程池失败，CPU 密集型任务将在当前线程执行: {e}")
+                return None
+        return _pool
+
+
+def _discard_broken_pool(pool: ProcessPoolExecutor) -> None:
+    """工作进程异常退出后丢弃进程池，下次提交时重新创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    try:
+        pool.shutdown(wait=False, cancel_futures=True)
+    except Exception:
+        pass
+
+
+def _run_inline(func: Callable, *args, **kwargs) -> Future:
+    future = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except BaseException as e:
+        future.set_exception(e)
+    return future
+
+
+def submit_cpu_bound(func: Callable, *args, size: int = None, **kwargs) -> Future:
+    """
+    提交 CPU 密集型纯函数
+
+    Args:
+        func: 模块级函数
+        size: 输入规模，小于阈值时直接在当前线程执行；None 表示总是尝试使用进程池
+        *args, **kwargs: 可 pickle 的参数
+
+    Returns:
+        Future: 函数结果；进程池执行失败时结果来自当前线程的重新执行
+    """
+    if size is not None and size < get_offload_min_size():
+        return _run_inline(func, *args, **kwargs)
+
+    pool = get_process_pool()
+    if pool is None:
+        return _run_inline(func, *args, **kwargs)
+
+    try:
+        pool_future = pool.submit(func, *args, **kwargs)
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.warning(f"进程池不可用，改为当前线程执行 {getattr(func, '__name__', func)}: {e}")
+        _discard_broken_pool(pool)
+        return _run_inline(func, *args, **kwargs)
+
+    result = Future()
+
+    def _on_done(done: Future):
+        try:
+            result.set_result(done.result())
+        except BrokenProcessPool as e:
+            logger.warning(f"进程池工作进程异常退出，改为当前线程执行 {getattr(func, '__name__', func)}: {e}")
+            _discard_broken_pool(pool)
+            fallback = _run_inline(func, *args, **kwargs)
+            if fallback.exception() is not None:
+                result.set_exception(fallback.exception())
+            else:
+                result.set_result(fallback.result())
+        except BaseException as e:
+            result.set_exception(e)
+
+    pool_future.add_done_callback(_on_done)
+    return result
+
+
+def run_cpu_bound(func: Callable, *args, size: int = None, **kwargs) -> Any:
+    """submit_cpu_bound 的同步版本，等待并返回函数结果"""
+    return submit_cpu_bound(func, *args, size=size, **kwargs).result()
+
+
+def shutdown_process_pool(wait: bool = True) -> None:
+    """关闭共享进程池，可重复调用"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown_process_pool)